@@ -1,5 +1,6 @@
 from bayesinator.core import *
 from bayesinator.language import english_model
+from solvertools.util import lru_cache
 import logging
 import math
 import solvertools.wordlist as wordlist
@@ -11,22 +12,15 @@ logger = logging.getLogger(__name__)
 wlist = wordlist.Google200K
 
 
-substr_freq = {}
-total_freq = 0
-
-logger.info("Hashing all substrings in wordlist %s" % wlist.filename)
-for word in wlist:
-    freq = wlist[word]
-    total_freq += freq
-    n = len(word)
-    for i in range(n):
-        for j in range(i+1, n+1):
-            substr = word[i:j]
-            if substr in substr_freq:
-                substr_freq[substr] += freq
-            else:
-                substr_freq[substr] = freq
-logger.info("Done hashing substrings")
+@lru_cache()
+def substr_freq(substr):
+    """
+    The total frequency of the words in the wordlist that contain a
+    string. This uses the wordlist's substring index, instead of hashing
+    every substring of every word up front.
+    """
+    words = wlist.words_containing(substr)
+    return int(wlist.get_many(words, canonical=True).sum())
 
 
 def superstring_entropy(s, substr):
@@ -38,6 +32,6 @@ def superstring_entropy(s, substr):
     substr = wlist.convert(substr)
     idx = s.find(substr)
     assert idx != -1, "Contract violated: substring not actually contained in superstring."
-    if substr in substr_freq and s in wlist:
-        return math.log(substr_freq[substr], 2) - math.log(wlist[s], 2)
+    if s in wlist:
+        return math.log(substr_freq(substr), 2) - math.log(wlist[s], 2)
     return english_model(s[:idx]) + english_model(s[(idx+len(substr)):])
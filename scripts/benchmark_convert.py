@@ -0,0 +1,37 @@
+"""
+Measure how long the wordlist convert functions take per call, on ASCII
+words, accented words, and phrases. Each function is timed with its cache
+(on a repeated word, the way a search asks about the same strings over and
+over) and without it (on the first call for each word).
+
+    python scripts/benchmark_convert.py [repetitions]
+"""
+from solvertools.wordlist import case_insensitive, case_insensitive_ascii, \
+     alphanumeric_only, alphanumeric_with_spaces, letters_only, \
+     letters_and_spaces
+import sys, timeit
+
+CONVERTERS = [case_insensitive, case_insensitive_ascii, alphanumeric_only,
+              alphanumeric_with_spaces, letters_only, letters_and_spaces]
+
+SAMPLES = [
+    ('ascii word', 'reliquary'),
+    ('ascii phrase', u"The Empire Strikes Back (1980)"),
+    ('accented', u'Z\xfcrich'),
+]
+
+def time_call(func, text, number):
+    "Get the time for one call of `func(text)`, in microseconds."
+    timer = timeit.Timer(lambda: func(text))
+    return min(timer.repeat(3, number)) / number * 1e6
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print "%-26s %-14s %10s %10s" % ('function', 'input', 'uncached',
+                                     'cached')
+    for func in CONVERTERS:
+        for label, text in SAMPLES:
+            uncached = time_call(func.__wrapped__, text, number)
+            cached = time_call(func, text, number)
+            print "%-26s %-14s %8.2fus %8.2fus" % (func.__name__, label,
+                                                  uncached, cached)
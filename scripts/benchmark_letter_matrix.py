@@ -0,0 +1,71 @@
+"""
+Compare how long pair and wildcard searches take over the whole, dense letter
+matrix and over a :class:`LetterMatrix`, whose rows are grouped by length.
+The matrix is built from the alphagrams of a wordlist, and each search is
+checked to find the same results both ways.
+
+    python scripts/benchmark_letter_matrix.py [wordlist] [repetitions]
+"""
+from solvertools.wordlist import Wordlist, letters_only, with_frequency, \
+     alphagram
+from solvertools.anagram.letter_matrix import letters_to_vec, top_pairs, \
+     top_wildcard, write_compact, LetterMatrix
+import numpy as np
+import os, shutil, sys, tempfile, timeit
+
+PAIRS = ['silent night', 'high ninja block move', 'the empire strikes back',
+         'massachusetts institute of technology']
+
+WILDCARDS = [('silent ni', 2), ('the empire strikes bac', 1),
+             ('the empire strikes ba', 2)]
+
+def build_matrix(wordlist):
+    "Get the sorted matrix and ranks of the alphagrams of a wordlist."
+    ranks = {}
+    for word, freq in wordlist.iteritems():
+        alpha = alphagram(word)
+        if alpha and alpha not in ranks:
+            ranks[alpha] = freq
+    alphas = sorted(ranks)
+    matrix = np.vstack([letters_to_vec(alpha) for alpha in alphas])
+    ranks = np.array([ranks[alpha] for alpha in alphas])
+    order = np.lexsort(matrix.T[::-1])
+    return matrix[order], ranks[order]
+
+def time_call(func, number):
+    "Get the time for one call of `func()`, in milliseconds."
+    timer = timeit.Timer(func)
+    return min(timer.repeat(3, number)) / number * 1e3
+
+def letters(text):
+    "Get the alphagram of the letters in a text."
+    return alphagram(''.join(char for char in text.upper() if char.isalpha()))
+
+if __name__ == '__main__':
+    name = sys.argv[1] if len(sys.argv) > 1 else 'google200K'
+    number = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    matrix, ranks = build_matrix(Wordlist(name, letters_only, with_frequency))
+    tempdir = tempfile.mkdtemp()
+    try:
+        write_compact(os.path.join(tempdir, 'matrix'), matrix, ranks)
+        grouped = LetterMatrix(os.path.join(tempdir, 'matrix'))
+        matrix, ranks, keys = grouped.dense()
+        print "%d rows" % len(matrix)
+        print "%-40s %10s %10s" % ('search', 'dense', 'grouped')
+        for text in PAIRS:
+            vec = letters_to_vec(letters(text))
+            dense = lambda: top_pairs(matrix, ranks, vec, 40, keys)
+            by_length = lambda: grouped.top_pairs(vec, 40)
+            assert dense() == by_length()
+            print "%-40s %8.2fms %8.2fms" % (text, time_call(dense, number),
+                                             time_call(by_length, number))
+        for text, nblanks in WILDCARDS:
+            vec = letters_to_vec(letters(text))
+            dense = lambda: top_wildcard(matrix, ranks, vec, nblanks, 20)
+            by_length = lambda: grouped.top_wildcard(vec, nblanks, 20)
+            assert dense() == by_length()
+            print "%-40s %8.2fms %8.2fms" % (text + '?' * nblanks,
+                                             time_call(dense, number),
+                                             time_call(by_length, number))
+    finally:
+        shutil.rmtree(tempdir)
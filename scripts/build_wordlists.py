@@ -0,0 +1,19 @@
+"""
+Rebuild the tables and Regulus indexes for all the wordlists in
+`solvertools.wordlist`, in parallel. Run this after refreshing the
+dictionaries in `data/dict`.
+
+    python scripts/build_wordlists.py [--force] [processes]
+"""
+from solvertools.wordlist import build_all
+import logging, sys
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    args = sys.argv[1:]
+    force = '--force' in args
+    args = [arg for arg in args if arg != '--force']
+    processes = int(args[0]) if args else None
+    timings = build_all(processes=processes, force=force)
+    for name, seconds in timings:
+        print "%-64s %8.1fs" % (name, seconds)
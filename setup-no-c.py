@@ -29,7 +29,8 @@ setup(name='solvertools',
       package_data={
         # Unfortunately, you have to update this if you add a new kind of data
         '': ['data/dict/*.txt', 'data/pickle/*.pickle',
-             'data/pickle/*.regulus',
+             'data/pickle/*.regulus', 'data/pickle/*.table',
+             'data/pickle/*.mapping', 'data/pickle/*.manifest',
              'data/db/*.npy',
              'data/corpora/answers/*.dat',
              'data/test/*', 'data/codes/*.txt']
@@ -30,6 +30,7 @@ setup(name='solvertools',
      package_data={
        # Unfortunately, you have to update this if you add a new kind of data
        'data': ['dict/*.txt', 'pickle/*.pickle', 'pickle/*.regulus',
+            'pickle/*.table', 'pickle/*.mapping', 'pickle/*.manifest',
             'corpora/answers/*.dat',
             'test/*', 'codes/*.txt',
             'array/*.npy', 'array/*.labels']
@@ -15,12 +15,14 @@ contain. For longer phrases, common letters do not appear if they are
 infrequent; for example, "e" is not in the anahash of
 "supercalifragilisticexpialidocious", because two Es in 34 letters is not very
 many.
+
+The words and phrases come from the local
+:data:`solvertools.anagram.index.ANAGRAMS` index.
 """
 from solvertools.letter_stats import compare_letter_distribution
 from solvertools.alphabet import ENGLISH
 from solvertools.wordlist import alphagram
-from solvertools.anagram.mixmaster import letter_diff
-from solvertools.puzzlebase.mongo import DB
+from solvertools.anagram.index import ANAGRAMS
 import math
 import numpy as np
 
@@ -56,9 +58,8 @@ def parallel(a, b):
     return a*b/(a+b)
 
 def anagram1(text):
-    alpha = alphagram(text)
-    for entry in DB.alphagrams.find({'alphagram': alpha}).sort([('goodness', -1)]):
-        yield entry['text'], entry['freq']
+    for text, freq in ANAGRAMS.anagrams(text):
+        yield text, freq
 
 def anagram2(text):
     """
@@ -68,8 +69,8 @@ def anagram2(text):
     alpha = alphagram(text)
     ana = anahash(text)
     nailed_it = False
-    for entry in DB.alphagrams.find({'alphagram': alpha}).sort([('goodness', -1)]):
-        yield entry['text'], entry['freq']
+    for result in ANAGRAMS.anagrams(alpha):
+        yield result
         nailed_it = True
     for result in anagram1(alpha):
         yield result
@@ -79,20 +80,20 @@ def anagram2(text):
 def _anagram_search(alpha, ana, possible):
     first_result = True
     if ana:
-        for entry in DB.alphagrams.find({'anahash': {'$gte': ana}}).limit(20):
-            if entry['anahash'] != ana:
-                if first_result and not entry['anahash'].startswith(ana):
+        for entry in ANAGRAMS.from_anahash(ana, 20):
+            if entry.anahash != ana:
+                if first_result and not entry.anahash.startswith(ana):
                     return
                 else:
                     break
             first_result = False
-            diff = sorted_diff(alpha, entry['alphagram'])
+            diff = sorted_diff(alpha, entry.alphagram)
             if diff is not None:
                 if diff == '':
-                    yield entry['text'], entry['freq']
+                    yield entry.text, entry.freq
                 else:
                     for other_piece, other_freq in anagram1(diff):
-                        yield entry['text'] + ' ' + other_piece, parallel(entry['freq'], other_freq)
+                        yield entry.text + ' ' + other_piece, parallel(entry.freq, other_freq)
                         break
     for pos in xrange(len(possible)):
         for result in _anagram_search(alpha, ana+possible[pos], possible[pos+1:]):
@@ -116,26 +117,26 @@ def anagram_breadth_first(text):
         elif ana:
             first_result = True
             limit = max(int(100 / (0-min(score, -1))), 1)
-            for entry in DB.alphagrams.find({'anahash': {'$gte': ana}}).limit(limit):
-                if entry['anahash'] != ana:
-                    if first_result and not entry['anahash'].startswith(ana):
+            for entry in ANAGRAMS.from_anahash(ana, limit):
+                if entry.anahash != ana:
+                    if first_result and not entry.anahash.startswith(ana):
                         dead_end = True
                     break
-                newscore = score + entry['goodness'] - MAX_FREQ
+                newscore = score + entry.goodness - MAX_FREQ
                 if len(queue) > 1000 and newscore < queue[-1000][0]:
                     continue
                 first_result = False
-                diff = sorted_diff(alpha, entry['alphagram'])
+                diff = sorted_diff(alpha, entry.alphagram)
                 if diff is not None:
-                    print '\t', len(queue), '(%s)' % ana, sofar, '/', entry['text'], diff.lower(), newscore
+                    print '\t', len(queue), '(%s)' % ana, sofar, '/', entry.text, diff.lower(), newscore
                     for text, freq in anagram1(diff):
                         newnewscore = newscore + log2(freq) - MAX_FREQ
-                        yield sofar + (entry['text'], text), newscore
+                        yield sofar + (entry.text, text), newscore
                         break
                     else:
                         if len(queue) < 10000:
                             queue.append((newscore, diff, '', anahash(diff),
-                                          sofar+(entry['text'],)))
+                                          sofar+(entry.text,)))
 
         if rest and not dead_end:
             for pos in xrange(len(rest)):
@@ -1,4 +1,4 @@
-from letter_matrix import letters_to_vec
+from letter_matrix import letters_to_vec, write_compact
 import numpy as np
 from solvertools.puzzlebase.mongo import DB
 from solvertools.util import get_datafile
@@ -24,8 +24,7 @@ def build_matrix():
 
 def run():
     matrix, ranks = build_matrix()
-    np.save(get_datafile('db/anagram_vectors.npy'), matrix)
-    np.save(get_datafile('db/anagram_ranks.npy'), ranks)
+    write_compact(get_datafile('db/anagram_matrix'), matrix, ranks)
     return matrix, ranks
 
 if __name__ == '__main__':
@@ -1,6 +1,9 @@
-from solvertools.puzzlebase.mongo import DB
+"""
+Looks up the words and phrases that anagram to an alphagram, in the local
+:data:`solvertools.anagram.index.ANAGRAMS` index.
+"""
+from solvertools.anagram.index import ANAGRAMS
 
 def get_anagrams(alphagram):
-    for entry in DB.wordplay.find({'alphagram': alphagram}):
-        yield entry['text'], entry['freq']
-
+    for text, freq in ANAGRAMS.anagrams(alphagram):
+        yield text, freq
@@ -0,0 +1,200 @@
+"""
+`solvertools.anagram.index` finds anagrams in a local index of a
+:class:`Wordlist`, so that anagramming doesn't need the Puzzlebase.
+
+An :class:`AnagramIndex` is two mapping files in the pickle directory, built
+from a wordlist the first time they're needed and memory-mapped after that.
+One maps each alphagram to the words and phrases that have it, and the other
+does the same for anahashes (see :mod:`solvertools.anagram.anahash`). The
+values of each key are sorted by their "goodness", best first, as the
+Puzzlebase sorted them:
+
+    >>> from solvertools.wordlist import Wordlist, with_frequency
+    >>> words = Wordlist('testwords', reader=with_frequency, pickle=False)
+    >>> index = AnagramIndex(words)
+    >>> index.anagrams('HET')
+    [(u'THE', 4)]
+    >>> index.anagrams('CHORUZ')
+    []
+"""
+
+from __future__ import with_statement
+from collections import namedtuple
+from solvertools.wordlist import COMBINED_WORDY, WordMapping, \
+                                 alphanumeric_only, alphagram
+from solvertools.wordtable import MappingTable, build_mapping
+from solvertools.manifest import code_fingerprint, is_fresh, stamp_sources, \
+                                 write_manifest
+from solvertools.util import get_picklefile, file_exists
+import numpy as np
+import logging, os, shutil, tempfile
+logger = logging.getLogger(__name__)
+
+AnagramEntry = namedtuple('AnagramEntry',
+                          'anahash alphagram text freq goodness')
+
+def alphagram_key(text):
+    "Get the alphagram that a text is indexed under."
+    return alphagram(alphanumeric_only(text))
+
+def _goodness(freqs, lengths):
+    """
+    How good some words and phrases are as anagrams, given their frequencies
+    and lengths: the log of the frequency, plus the length.
+    """
+    return np.log2(np.maximum(freqs, 1)) + lengths
+
+class AnagramIndex(object):
+    """
+    A lazily-loaded index of the anagrams in a :class:`Wordlist`.
+
+    Like a wordlist's table, the index is rebuilt when it's out of date with
+    the wordlist's `.txt` file or the code that builds it. If the wordlist
+    has `pickle=False`, the index is built in a temporary directory instead
+    of being saved.
+    """
+    version = 1
+    def __init__(self, wordlist):
+        if isinstance(wordlist, WordMapping):
+            raise TypeError("Can't index the anagrams of a WordMapping")
+        self.wordlist = wordlist
+        self.alphagrams = None
+        self.anahashes = None
+
+    def index_name(self, kind):
+        """
+        The filename of one of this index's mapping files, named after the
+        wordlist's table.
+        """
+        table = self.wordlist.table_name().rsplit('.', 1)[0]
+        return '%s.%s.%s.mapping' % (table, kind, self.version)
+
+    def fingerprint(self):
+        "A fingerprint of the code that builds this index."
+        from solvertools.anagram.anahash import anahash
+        return '%s:%s' % (self.version,
+                          code_fingerprint(self.wordlist.convert,
+                                           self.wordlist.reader,
+                                           alphagram_key, anahash,
+                                           _goodness))
+
+    def is_cached(self):
+        "Have this index's files been built, and are they up to date?"
+        if not self.wordlist.pickle:
+            return False
+        sources = [self.wordlist.source_file()]
+        code = self.fingerprint()
+        return all(is_fresh(get_picklefile(self.index_name(kind)), sources,
+                            code)
+                   for kind in ('alphagrams', 'anahashes'))
+
+    def load(self):
+        "Force this index to be loaded, building it if necessary."
+        if self.is_cached():
+            try:
+                return self._load_tables()
+            except IOError:
+                logger.warn("Rebuilding %s" % self.index_name('alphagrams'))
+        if not self.wordlist.pickle:
+            return self._build_temporary()
+        stamps = None
+        if file_exists(self.wordlist.source_file()):
+            stamps = stamp_sources([self.wordlist.source_file()])
+        for kind in ('alphagrams', 'anahashes'):
+            filename = get_picklefile(self.index_name(kind))
+            logger.info("Saving %s" % self.index_name(kind))
+            self._build(kind, filename)
+            if stamps is not None:
+                write_manifest(filename, stamps, self.fingerprint())
+        self._load_tables()
+
+    def _load_tables(self):
+        "Memory-map this index from its mapping files."
+        logger.info("Loading %s" % self.index_name('alphagrams'))
+        self.alphagrams = MappingTable(
+            get_picklefile(self.index_name('alphagrams')))
+        self.anahashes = MappingTable(
+            get_picklefile(self.index_name('anahashes')))
+
+    def _build_temporary(self):
+        """
+        Build this index in a temporary directory, which is removed once its
+        files are mapped into memory.
+        """
+        tempdir = tempfile.mkdtemp(prefix='anagrams')
+        try:
+            tables = []
+            for kind in ('alphagrams', 'anahashes'):
+                filename = os.path.join(tempdir, self.index_name(kind))
+                self._build(kind, filename)
+                tables.append(MappingTable(filename))
+            self.alphagrams, self.anahashes = tables
+        finally:
+            shutil.rmtree(tempdir, ignore_errors=True)
+
+    def _ranked_entries(self):
+        """
+        Yield the (text, frequency, goodness) of every entry of the wordlist,
+        in descending order of goodness. A mapping file keeps each key's
+        values in the order they came in, so this puts them in that order.
+        """
+        if self.wordlist.words is None:
+            self.wordlist.load()
+        table = self.wordlist.words
+        lengths = np.zeros((len(table),), dtype=np.int64)
+        for length in xrange(table.max_length + 1):
+            start = int(table.length_starts[length])
+            end = int(table.length_starts[length+1])
+            lengths[table.by_length[start:end]] = length
+        goodness = _goodness(table.freqs, lengths)
+        # Sorting stably leaves ties in alphabetical order.
+        order = np.argsort(-goodness, kind='mergesort')
+        for index in order.tolist():
+            yield table.key(index), int(table.freqs[index]), \
+                  float(goodness[index])
+
+    def _build(self, kind, filename):
+        "Build one of this index's mapping files."
+        from solvertools.anagram.anahash import anahash
+        def entries():
+            for text, freq, goodness in self._ranked_entries():
+                alpha = alphagram_key(text)
+                if not alpha:
+                    continue
+                if kind == 'alphagrams':
+                    yield alpha, (text, freq)
+                else:
+                    yield anahash(alpha), (alpha, text, freq, goodness)
+        build_mapping(filename, entries())
+
+    def anagrams(self, text):
+        """
+        Get the words and phrases that are anagrams of a text, as (text,
+        frequency) pairs, best first.
+        """
+        if self.alphagrams is None:
+            self.load()
+        return self.alphagrams.get(alphagram_key(text), [])
+
+    def from_anahash(self, ana, limit):
+        """
+        Get at most `limit` :class:`AnagramEntry` records, in order of their
+        anahashes and then best first, starting with the first anahash that
+        isn't less than `ana`.
+        """
+        if self.anahashes is None:
+            self.load()
+        found = []
+        index = self.anahashes.bisect(ana)
+        while index < len(self.anahashes) and len(found) < limit:
+            key = self.anahashes.raw_key(index)
+            for alpha, text, freq, goodness in \
+              self.anahashes.values_at(index)[:limit - len(found)]:
+                found.append(AnagramEntry(key, alpha, text, freq, goodness))
+            index += 1
+        return found
+
+    def __repr__(self):
+        return 'AnagramIndex(%r)' % (self.wordlist,)
+
+ANAGRAMS = AnagramIndex(COMBINED_WORDY)
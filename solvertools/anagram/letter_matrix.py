@@ -1,5 +1,19 @@
+"""
+`solvertools.anagram.letter_matrix` searches a matrix of letter counts, with a
+row for each alphagram that can be made into words and a parallel vector of
+`ranks` saying how good each row is as an anagram.
+
+The search functions take the whole matrix, sorted by its columns. On disk it
+is kept in a compact form, a :class:`LetterMatrix`, that stores each row as
+its alphagram instead of 26 counts, and is only read when it's used. Its rows
+are grouped by their number of letters, so its own searches for pairs and
+wildcards only look at the rows that are the right length.
+"""
+
+from __future__ import with_statement
 import numpy as np
-import heapq
+import heapq, logging, os, threading
+logger = logging.getLogger(__name__)
 
 unigram_freq = np.array([.08167, .01492, .02782, .04253, .12702, .02228,
 .02015, .06094, .06966, .00153, .00772, .04025, .02406, .06749, .07507, .01929,
@@ -51,23 +65,35 @@ def vec_goodness(vec):
     anomaly = vec_anomaly(vec)
     return np.sum(np.log(unigram_freq) * np.max(anomaly, 0))
 
-def find_pairs(matrix, ranks, vec):
+def pack_vectors(vecs):
+    """
+    Pack vectors of letter counts into fixed-width byte strings, one per
+    vector, which sort in the same order as the rows of a sorted matrix.
+    Each count is stored as a byte one greater than it, so that no byte is
+    a null, which NumPy would strip from the end of a string.
+    """
+    vecs = np.asarray(vecs)
+    packed = np.ascontiguousarray(vecs.astype(np.uint8) + 1)
+    return packed.view('S%d' % vecs.shape[-1]).reshape(vecs.shape[:-1])
+
+def find_pairs(matrix, ranks, vec, keys=None):
     """
     Given the data (a matrix of letter counts, and a vector `ranks` saying
     how good the various rows are as anagrams), find all pairs of rows that
     combine to the given `vec` of letters.
+
+    `keys` are the rows of the matrix as packed by :func:`pack_vectors`.
+    Pass them in to avoid packing the matrix again on every call.
     """
     diffs = vec - matrix
     margin = np.min(diffs, axis=-1)
     good_rows = np.where(margin >= 0)[0]
-    for row in good_rows:
-        diff = diffs[row]
-        rank1 = ranks[row]
-        rank2 = find_vector(matrix, ranks, diff)
-        if rank2 > 0:
-            part1 = vec_to_letters(matrix[row])
-            part2 = vec_to_letters(diff)
-            yield parallel(rank1, rank2), part1, part2
+    ranks2 = find_vectors(matrix, ranks, diffs[good_rows], keys)
+    found = np.flatnonzero(ranks2 > 0)
+    for row, rank2 in zip(good_rows[found].tolist(), ranks2[found].tolist()):
+        part1 = vec_to_letters(matrix[row])
+        part2 = vec_to_letters(diffs[row])
+        yield parallel(ranks[row], rank2), part1, part2
 
 def find_wildcard(matrix, ranks, vec, nblanks):
     sums = np.sum(matrix, axis=-1)
@@ -83,52 +109,470 @@ def find_wildcard(matrix, ranks, vec, nblanks):
             yield rank1, text
 
 
-def find_vector(matrix, ranks, vec):
+def find_vector(matrix, ranks, vec, keys=None):
     """
     Tests whether this vector exists in the sorted matrix. Returns its value
     in `ranks` if it is there, and 0 if it is not.
     """
-    # binary search
-    start = 0
-    end = matrix.shape[0]
-    while start < end:
-        split = (start+end)/2
-        diff = vec - matrix[split]
-        if np.all(diff == 0):
-            return ranks[split]
-        else:
-            dir = diff[np.nonzero(diff)[0][0]]
-            if dir > 0:
-                start = split+1
-            else:
-                end = split
-    return 0
+    return find_vectors(matrix, ranks, np.asarray(vec)[np.newaxis], keys)[0]
 
-def top_wildcard(matrix, ranks, vec, nblanks, n):
+def find_vectors(matrix, ranks, vecs, keys=None):
+    """
+    Looks up each row of `vecs` in the sorted matrix at once, returning an
+    array of their values in `ranks`, with 0 for the rows that aren't
+    there. The rows are packed into keys and found with one binary search.
+    """
+    if keys is None:
+        keys = pack_vectors(matrix)
+    result = np.zeros((len(vecs),), dtype=np.asarray(ranks).dtype)
+    found = find_rows(keys, vecs)
+    present = found >= 0
+    result[present] = ranks[found[present]]
+    return result
+
+def find_rows(keys, vecs):
+    """
+    Finds the index of each row of `vecs` among the sorted, packed `keys`,
+    or -1 for the rows that aren't there.
+    """
+    if len(vecs) == 0 or len(keys) == 0:
+        return -np.ones((len(vecs),), dtype=np.int64)
+    wanted = pack_vectors(vecs)
+    found = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+    return np.where(keys[found] == wanted, found, -1)
+
+def _top(results, n):
+    "Use a heap to filter some results for the `n` highest-ranked ones."
     heap = []
     found = 0
-    for rank, part1 in find_wildcard(matrix, ranks, vec, nblanks):
+    for result in results:
         found += 1
-        heapq.heappush(heap, (rank, part1))
+        heapq.heappush(heap, result)
         if found > n:
             heapq.heappop(heap)
     heap.sort()
     heap.reverse()
     return heap
 
-def top_pairs(matrix, ranks, vec, n):
+def top_wildcard(matrix, ranks, vec, nblanks, n):
+    return _top(find_wildcard(matrix, ranks, vec, nblanks), n)
+
+def top_pairs(matrix, ranks, vec, n, keys=None):
     """
     Like find_pairs, but uses a heap to filter for the `n` highest-ranked
     pairs.
     """
-    heap = []
-    found = 0
-    for rank, part1, part2 in find_pairs(matrix, ranks, vec):
-        found += 1
-        heapq.heappush(heap, (rank, part1, part2))
-        if found > n:
-            heapq.heappop(heap)
-    heap.sort()
-    heap.reverse()
-    return heap
+    return _top(find_pairs(matrix, ranks, vec, keys), n)
+
+
+def top_multi(matrix, ranks, vec, n, max_parts=4, keys=None,
+              max_frontier=100000):
+    """
+    Finds the `n` best ways to split `vec` into at most `max_parts` rows of
+    the sorted matrix, as (score, parts) pairs, best first. `parts` is a
+    tuple of the rows' letters, in the order of the matrix.
+
+    The score of a split is `1/(1/rank1 + 1/rank2 + ...)`, which is what
+    :func:`parallel` gives for two parts, so a split is only as good as its
+    worst parts allow.
+
+    Only the rows that fit in `vec` are searched. Some part of a split has
+    to use the letter that the fewest of them have, so a partial split only
+    branches on those rows. Partial splits are expanded best first, by an
+    upper bound on the score of any split they can lead to: the parts so
+    far plus one more part that is as good as any that still fits. Once `n`
+    splits are found, nothing whose bound is worse than all of them is
+    expanded. The last part of a split is found by looking up what's left
+    in the packed `keys`, all at once.
+
+    At most `max_frontier` partial splits are kept. When there are more, the
+    worse half is dropped, so a search that hits the limit may miss some
+    splits.
+    """
+    vec = np.asarray(vec)
+    if vec.sum() == 0:
+        return []
+    if keys is None:
+        keys = pack_vectors(matrix)
+    fits = np.flatnonzero(np.all(matrix <= vec, axis=1) &
+                          np.any(matrix > 0, axis=1) & (ranks > 0))
+    rows = matrix[fits]
+    row_keys = keys[fits]
+    costs = 1.0 / ranks[fits]
+    with_letter = [np.flatnonzero(rows[:, letter] > 0)
+                   for letter in xrange(rows.shape[1])]
+
+    # Splits are compared by their cost, the sum of 1/rank over their
+    # parts, which is lowest for the best split. `found` is a heap of the
+    # best splits so far, with the worst on top. A split can be reached in
+    # more than one way, so `seen` keeps it from being counted twice.
+    found = []
+    seen = set()
+    def worst():
+        if len(found) < n:
+            return np.inf
+        return -found[0][0]
+    def record(cost, parts):
+        parts = tuple(sorted(parts))
+        if cost < worst() and parts not in seen:
+            seen.add(parts)
+            heapq.heappush(found, (-cost, parts))
+            if len(found) > n:
+                heapq.heappop(found)
+
+    # Each partial split is (bound, tiebreak, remaining letters, cost so
+    # far, parts so far).
+    frontier = [(0.0, 0, vec, 0.0, ())]
+    pushed = 1
+    while frontier:
+        bound, _, left, cost, parts = heapq.heappop(frontier)
+        if bound >= worst():
+            break
+        letters = np.flatnonzero(left)
+        pivot = min(letters, key=lambda letter: len(with_letter[letter]))
+        branch = with_letter[pivot]
+        branch = branch[np.all(rows[branch] <= left, axis=1)]
+        if len(branch) == 0:
+            continue
+        diffs = left - rows[branch]
+        complete = ~np.any(diffs, axis=1)
+        for row in branch[complete].tolist():
+            record(cost + costs[row], parts + (row,))
+        partial = branch[~complete]
+        diffs = diffs[~complete]
+        if len(parts) + 2 == max_parts:
+            # one more part has to be all that's left
+            rest = find_rows(row_keys, diffs)
+            usable = rest >= 0
+            for row, other in zip(partial[usable].tolist(),
+                                  rest[usable].tolist()):
+                record(cost + costs[row] + costs[other],
+                       parts + (row, other))
+        elif len(parts) + 2 < max_parts and len(partial):
+            # The rest needs at least one more part, which fits in what's
+            # left now.
+            best_next = costs[np.all(rows <= left, axis=1)].min()
+            bounds = cost + costs[partial] + best_next
+            for i in np.flatnonzero(bounds < worst()).tolist():
+                heapq.heappush(frontier, (bounds[i], pushed, diffs[i],
+                                          cost + costs[partial[i]],
+                                          parts + (partial[i],)))
+                pushed += 1
+            if len(frontier) > max_frontier:
+                frontier = heapq.nsmallest(max_frontier // 2, frontier)
+
+    found.sort(reverse=True)
+    return [(int(1.0 / -negcost),
+             tuple(vec_to_letters(rows[row]) for row in parts))
+            for negcost, parts in found]
+
+def _save_array(filename, array):
+    "Save an array as a `.npy` file, replacing the file all at once."
+    # Name the temporary file after the thread too, so that threads writing
+    # the same array don't write to the same temporary file.
+    tempname = filename + '.%d.%d.tmp' % (os.getpid(),
+                                          threading.current_thread().ident)
+    with open(tempname, 'wb') as out:
+        np.save(out, array)
+    os.rename(tempname, filename)
+
+# how many letters _fitting checks a column at a time before checking the
+# rows that are left all at once
+NARROWING_LETTERS = 8
+
+def _fitting(counts, vec):
+    """
+    Find the rows of a matrix of letter counts that fit in `vec`, checking
+    one letter at a time and starting with the letters that `vec` has the
+    fewest of, which rule out the most rows.
+    """
+    letters = np.argsort(vec, kind='mergesort')
+    fits = counts[:, letters[0]] <= vec[letters[0]]
+    for letter in letters[1:NARROWING_LETTERS].tolist():
+        fits &= counts[:, letter] <= vec[letter]
+    rows = np.flatnonzero(fits)
+    rest = letters[NARROWING_LETTERS:]
+    return rows[np.all(counts[rows][:, rest] <= vec[rest], axis=1)]
+
+def _alphagram_letters(vecs, length):
+    """
+    Spell vectors of letter counts that all have `length` letters as their
+    alphagrams, in a matrix with a row of letter codes for each vector.
+    """
+    vecs = np.asarray(vecs)
+    letters = np.repeat(np.tile(np.arange(ord('A'), ord('Z') + 1,
+                                          dtype=np.uint8), len(vecs)),
+                        vecs.astype(np.int64).ravel())
+    return letters.reshape(len(vecs), length)
+
+def vecs_to_alphagrams(vecs, length):
+    """
+    Convert vectors of letter counts that all have `length` letters to an
+    array of their alphagrams, as byte strings.
+    """
+    if length == 0:
+        return np.zeros((len(vecs),), dtype='S1')
+    letters = np.ascontiguousarray(_alphagram_letters(vecs, length))
+    return letters.view('S%d' % length).reshape(len(vecs))
+
+def write_compact(prefix, matrix, ranks):
+    """
+    Save a matrix of letter counts and its ranks in the format that a
+    :class:`LetterMatrix` reads: three `.npy` files whose names start with
+    `prefix`.
+
+    The rows are grouped by their number of letters, and each group is
+    sorted by alphagram. `letters` has the alphagrams of every row end to
+    end, `ranks` has their ranks, and `starts` says which row each length
+    starts at.
+    """
+    matrix = np.asarray(matrix)
+    ranks = np.asarray(ranks)
+    lengths = matrix.sum(axis=-1).astype(np.int64)
+    max_length = int(lengths.max()) if len(lengths) else 0
+    letters, row_ranks, starts = [], [], [0]
+    for length in xrange(max_length + 1):
+        rows = np.flatnonzero(lengths == length)
+        alphas = _alphagram_letters(matrix[rows], length)
+        if length:
+            order = np.lexsort(alphas.T[::-1])
+            alphas, rows = alphas[order], rows[order]
+        letters.append(alphas.ravel())
+        row_ranks.append(ranks[rows])
+        starts.append(starts[-1] + len(rows))
+    row_ranks = np.concatenate(row_ranks)
+    if len(row_ranks) == 0 or (row_ranks.min() >= 0 and
+                               row_ranks.max() < 2**32):
+        row_ranks = row_ranks.astype(np.uint32)
+    _save_array(prefix + '.letters.npy', np.concatenate(letters))
+    _save_array(prefix + '.ranks.npy', row_ranks)
+    _save_array(prefix + '.starts.npy', np.array(starts, dtype=np.int64))
+
+class LetterMatrix(object):
+    """
+    A matrix of letter counts and its ranks, as saved by
+    :func:`write_compact`. Its files are memory-mapped the first time it's
+    used, so making one is free.
+
+    `source` is an optional pair of `.npy` files with the matrix and ranks
+    in their full, dense form, which the compact files are written from if
+    they don't exist yet.
+
+    A LetterMatrix can be shared between threads; the first one to use it
+    loads it.
+    """
+    def __init__(self, prefix, source=None):
+        self.prefix = prefix
+        self.source = source
+        self.letters = None
+        self.ranks = None
+        self.starts = None
+        self._groups = {}
+        self._dense = None
+        self._lock = threading.RLock()
+
+    def filename(self, part):
+        "The filename of one of this matrix's `.npy` files."
+        return '%s.%s.npy' % (self.prefix, part)
+
+    def is_cached(self):
+        "Have this matrix's compact files been written?"
+        return all(os.path.exists(self.filename(part))
+                   for part in ('letters', 'ranks', 'starts'))
+
+    def load(self):
+        """
+        Map this matrix's files into memory, writing them from the dense
+        source first if necessary.
+        """
+        with self._lock:
+            if not self.is_cached() and self.source is not None:
+                logger.info("Compacting %s" % self.source[0])
+                vectors, ranks = self.source
+                write_compact(self.prefix, np.load(vectors), np.load(ranks))
+            starts = np.load(self.filename('starts'), mmap_mode='r')
+            sizes = np.diff(starts) * np.arange(len(starts) - 1)
+            self.letters = np.load(self.filename('letters'), mmap_mode='r')
+            self.ranks = np.load(self.filename('ranks'), mmap_mode='r')
+            self.letter_starts = np.concatenate([[0], np.cumsum(sizes)])
+            self.max_length = len(starts) - 2
+            # `starts` is what _loaded checks, so it's set last, once the
+            # rest is ready to use
+            self.starts = starts
+
+    def _loaded(self):
+        if self.starts is None:
+            with self._lock:
+                if self.starts is None:
+                    self.load()
+
+    def __len__(self):
+        self._loaded()
+        return int(self.starts[-1])
+
+    def alphagrams(self, length):
+        """
+        Get the alphagrams with a given number of letters, as a sorted array
+        of byte strings that is read straight from the file.
+        """
+        self._loaded()
+        if length == 0 and self.max_length >= 0:
+            return np.zeros((int(self.starts[1]),), dtype='S1')
+        if not 0 < length <= self.max_length:
+            return np.zeros((0,), dtype='S1')
+        start = int(self.letter_starts[length])
+        end = int(self.letter_starts[length+1])
+        return self.letters[start:end].view('S%d' % length)
+
+    def group(self, length):
+        """
+        Get the rows with a given number of letters, as a matrix of letter
+        counts and an array of their ranks, in the order of their
+        alphagrams. Each group is built the first time it's needed.
+        """
+        self._loaded()
+        if length not in self._groups:
+            start, end, offset = 0, 0, 0
+            if 0 <= length <= self.max_length:
+                start = int(self.starts[length])
+                end = int(self.starts[length+1])
+                offset = int(self.letter_starts[length])
+            size = end - start
+            letters = np.asarray(self.letters[offset:offset + size*length],
+                                 dtype=np.int64) - ord('A')
+            cells = (np.arange(size)[:, np.newaxis] * 26 +
+                     letters.reshape(size, length)).ravel()
+            counts = np.bincount(cells, minlength=size * 26)
+            # stored by column, which is how _fitting reads them
+            counts = np.asfortranarray(counts.reshape(size, 26), np.int8)
+            self._groups[length] = (counts, np.asarray(self.ranks[start:end]))
+        return self._groups[length]
+
+    def rank(self, alpha):
+        "Get the rank of an alphagram, or 0 if it isn't in the matrix."
+        # comparing Unicode to the byte strings would convert all of them
+        alpha = str(alpha)
+        alphas = self.alphagrams(len(alpha))
+        index = int(np.searchsorted(alphas, alpha))
+        if index < len(alphas) and alphas[index] == alpha:
+            return int(self.ranks[int(self.starts[len(alpha)]) + index])
+        return 0
+
+    def _fitting_rows(self, length, vec):
+        """
+        Find the rows with a given number of letters that fit in `vec` and
+        have a rank, as their indices in their group.
+        """
+        counts, ranks = self.group(length)
+        if len(counts) == 0:
+            return np.zeros((0,), dtype=np.int64)
+        rows = _fitting(counts, vec)
+        return rows[ranks[rows] > 0]
+
+    def _complements(self, length, rows, vec, other):
+        """
+        Look up what's left of `vec` after each of some rows with `length`
+        letters in the group with `other` letters. Returns the rows whose
+        complements are there, and the indices of those complements.
+        """
+        counts = self.group(length)[0]
+        others = self.alphagrams(other)
+        wanted = vecs_to_alphagrams(vec - counts[rows], other)
+        found = np.minimum(np.searchsorted(others, wanted), len(others) - 1)
+        present = (others[found] == wanted) & (self.group(other)[1][found] > 0)
+        return rows[present], found[present]
+
+    def find_pairs(self, vec):
+        """
+        Like :func:`find_pairs`, but only looks at the rows that are no
+        longer than `vec`, a group at a time. For each pair of lengths that
+        add up to the length of `vec`, the complements of the rows that fit
+        on the side that has fewer of them are looked up on the other side.
+        """
+        vec = np.asarray(vec)
+        total = int(vec.sum())
+        self._loaded()
+        for length in xrange(min(total // 2, self.max_length) + 1):
+            other = total - length
+            if other > self.max_length:
+                continue
+            rows1 = self._fitting_rows(length, vec)
+            rows2 = self._fitting_rows(other, vec)
+            if len(rows1) == 0 or len(rows2) == 0:
+                continue
+            if len(rows1) <= len(rows2):
+                found1, found2 = self._complements(length, rows1, vec, other)
+            else:
+                found2, found1 = self._complements(other, rows2, vec, length)
+            ranks1, ranks2 = self.group(length)[1], self.group(other)[1]
+            parts1, parts2 = self.alphagrams(length), self.alphagrams(other)
+            for row1, row2 in zip(found1.tolist(), found2.tolist()):
+                rank = parallel(ranks1[row1], ranks2[row2])
+                yield rank, parts1[row1], parts2[row2]
+                if length != other:
+                    yield rank, parts2[row2], parts1[row1]
+
+    def find_wildcard(self, vec, nblanks):
+        """
+        Like :func:`find_wildcard`, but only looks at the rows that have
+        exactly as many letters as `vec` and its blanks.
+        """
+        vec = np.asarray(vec)
+        counts, ranks = self.group(int(vec.sum()) + nblanks)
+        rows = np.flatnonzero(np.all(counts >= vec, axis=1))
+        parts = self.alphagrams(int(vec.sum()) + nblanks)
+        for row in rows.tolist():
+            yield ranks[row], parts[row]
+
+    def top_multi(self, vec, n, max_parts=4, max_frontier=100000):
+        """
+        Find the `n` best splits of `vec` into at most `max_parts` rows,
+        like :func:`top_multi`. Only the rows that fit in `vec` can be part
+        of a split, so they're taken from the groups that are no longer
+        than `vec`, and searched as a small matrix of their own.
+        """
+        vec = np.asarray(vec)
+        self._loaded()
+        parts = []
+        for length in xrange(1, min(int(vec.sum()), self.max_length) + 1):
+            counts, ranks = self.group(length)
+            if len(counts):
+                rows = _fitting(counts, vec)
+                parts.append((counts[rows], ranks[rows]))
+        if not parts:
+            return []
+        matrix = np.vstack([counts for counts, ranks in parts])
+        ranks = np.concatenate([ranks for counts, ranks in parts])
+        order = np.lexsort(matrix.T[::-1])
+        matrix, ranks = matrix[order], ranks[order]
+        return top_multi(matrix, ranks, vec, n, max_parts,
+                         pack_vectors(matrix), max_frontier)
+
+    def top_pairs(self, vec, n):
+        "Find the `n` highest-ranked pairs, like :func:`top_pairs`."
+        return _top(self.find_pairs(vec), n)
+
+    def top_wildcard(self, vec, nblanks, n):
+        "Find the `n` highest-ranked rows, like :func:`top_wildcard`."
+        return _top(self.find_wildcard(vec, nblanks), n)
+
+    def dense(self):
+        """
+        Get the whole matrix in the form the search functions take, as a
+        tuple of the sorted matrix, its ranks, and its packed keys. This is
+        built the first time it's needed, and takes more memory than the
+        dense files did, so the searches of this class don't use it.
+        """
+        if self._dense is None:
+            self._loaded()
+            groups = [self.group(length)
+                      for length in xrange(self.max_length + 1)]
+            matrix = np.vstack([counts for counts, ranks in groups])
+            ranks = np.concatenate([ranks for counts, ranks in groups])
+            order = np.lexsort(matrix.T[::-1])
+            matrix, ranks = matrix[order], ranks[order]
+            self._dense = (matrix, ranks, pack_vectors(matrix))
+        return self._dense
 
+    def __repr__(self):
+        return 'LetterMatrix(%r)' % (self.prefix,)
@@ -1,14 +1,17 @@
-import numpy as np
 from solvertools.anagram.db_lookup import get_anagrams
+from solvertools.anagram.index import ANAGRAMS
 from solvertools.wordlist import alphagram
-from solvertools.anagram.letter_matrix import letters_to_vec, top_pairs, parallel
+from solvertools.anagram.letter_matrix import letters_to_vec, parallel, \
+     LetterMatrix
 from solvertools.wordlist import alphanumeric_only, alphanumeric_with_spaces
 from solvertools.anagram.permute import swap_distance
 from solvertools.util import get_datafile
 import heapq, string
 
-matrix = np.load(get_datafile('db/anagram_vectors.npy'))
-ranks = np.load(get_datafile('db/anagram_ranks.npy'))
+# The letter matrix is only read the first time an anagram is looked for.
+LETTERS = LetterMatrix(get_datafile('db/anagram_matrix'),
+                       source=(get_datafile('db/anagram_vectors.npy'),
+                               get_datafile('db/anagram_ranks.npy')))
 
 def make_alpha(text):
     return alphagram(alphanumeric_only(text))
@@ -48,7 +51,7 @@ def multi_anagram(text, num=30):
         if score > 0:
             heapq.heappush(heap, (score, first_text))
             used.add(first_text)
-    for value, alpha1, alpha2 in top_pairs(matrix, ranks, vec, num*2):
+    for value, alpha1, alpha2 in LETTERS.top_pairs(vec, num*2):
         for text1, rank1 in get_anagrams(alpha1):
             for text2, rank2 in get_anagrams(alpha2):
                 combined_text = text1+' '+text2
@@ -69,6 +72,31 @@ def multi_anagram(text, num=30):
     heap.reverse()
     return [(text, val) for (val, text) in heap]
 
+def multi_part_anagram(text, num=20, max_parts=4, letters=None, index=None):
+    """
+    Finds anagrams of the text that take up to `max_parts` cached chunks,
+    using the best text for each chunk. The chunks come from the
+    :class:`LetterMatrix` `letters` and are spelled with the
+    :class:`AnagramIndex` `index`, which default to the ones the rest of
+    this module uses.
+    """
+    if letters is None:
+        letters = LETTERS
+    if index is None:
+        index = ANAGRAMS
+    vec = letters_to_vec(make_alpha(text))
+    results = []
+    for value, alphas in letters.top_multi(vec, num, max_parts):
+        texts = []
+        for alpha in alphas:
+            anagrams = index.anagrams(alpha)
+            if not anagrams:
+                break
+            texts.append(anagrams[0][0])
+        else:
+            results.append((' '.join(texts), value))
+    return results
+
 def differentness(text, previous):
     result = min([trigram_goodness(prev, text) for prev in previous])
     return result
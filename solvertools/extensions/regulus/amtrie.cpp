@@ -31,26 +31,41 @@
 # POSSIBILITY OF SUCH DAMAGE.
 */
 
+#include <algorithm>
 #include <string.h>
 #include "amtrie.h"
 
 
-const char* AMTrie::MAGIC_STR = "AMTrie1.";
+const char* AMTrie::MAGIC_STR = "AMTrie4.";
 
-uint32_t AMTrie::AMTrie_helper(const DynTrie &that, uint32_t dpos, uint32_t* trie, uint32_t offset, uint32_t &last_node) {
+uint32_t AMTrie::AMTrie_helper(const DynTrie &that, const std::vector<uint64_t> &weights, uint32_t dpos, uint32_t* trie, uint32_t offset, uint32_t &last_node) {
   uint32_t offset0 = offset;
-  uint32_t head = 0;
-  uint32_t next[32];
+  SymbolSet head = 0;
+  uint32_t next[NUM_SYMBOLS];
   int p = 0;
-  for(int i = 0; i < 26; ++i){
-    if(that.slab[dpos].next[i]){
-      head |= 1 << i;
-      offset += AMTrie_helper(that, that.slab[dpos].next[i], trie, offset, next[p++]);
+  for(uint32_t child = that.slab[dpos].child; child; child = that.slab[child].sibling){
+    head |= symbolBit(that.slab[child].symbol);
+    offset += AMTrie_helper(that, weights, child, trie, offset, next[p++]);
+  }
+  uint32_t best = that.slab[dpos].data;
+  uint32_t shallowest = that.slab[dpos].data ? 0 : 0xFFFF;
+  uint32_t deepest = 0;
+  for(int i = 0; i < p; ++i){
+    uint32_t below = trie[next[i] + 3]; // the best data under the child
+    if(weights[below] > weights[best] ||
+       (weights[below] == weights[best] && below < best)) {
+      best = below;
     }
+    uint32_t depths = trie[next[i] + 4];
+    shallowest = std::min(shallowest, (depths & 0xFFFF) + 1);
+    deepest = std::max(deepest, (depths >> 16) + 1);
   }
   uint32_t here = offset;
-  trie[offset++] = head;
+  trie[offset++] = (uint32_t) head;
+  trie[offset++] = (uint32_t) (head >> 32);
   trie[offset++] = that.slab[dpos].data;
+  trie[offset++] = best;
+  trie[offset++] = shallowest | (deepest << 16);
   for(int i = 0; i < p; ++i){
     trie[offset++] = next[i];
   }
@@ -60,47 +75,67 @@ uint32_t AMTrie::AMTrie_helper(const DynTrie &that, uint32_t dpos, uint32_t* tri
 
 AMTrie::AMTrie() {
   size = 0;
-  trie = new uint32_t [size];
+  trie = NULL;
   root = 0;
 }
 
-AMTrie::AMTrie(const DynTrie &that) {
-  size = 3*that.nodes()-1;
-  trie = new uint32_t [size];
-  AMTrie_helper(that, 0, trie, 0, root);
+AMTrie::AMTrie(const DynTrie &that, const std::vector<uint64_t> &weights) {
+  size = (HEADER_WORDS+1)*that.nodes()-1;
+  storage.resize(size);
+  own();
+  AMTrie_helper(that, weights, 0, &storage[0], 0, root);
+}
+
+AMTrie::AMTrie(const uint32_t* array, size_t size_in, uint32_t root_in) {
+  size = size_in;
+  trie = array;
+  root = root_in;
 }
 
 AMTrie::AMTrie(const AMTrie &that) {
   size = that.size;
   root = that.root;
-  trie = new uint32_t [size];
-  memcpy(trie, that.trie, size*sizeof(uint32_t));
+  storage = that.storage;
+  if(!that.storage.empty() && that.trie == &that.storage[0]) {
+    own();
+  } else {
+    trie = that.trie;
+  }
 }
 
 AMTrie &AMTrie::operator =(const AMTrie &that) {
-  delete[] trie;
+  if(this == &that) return(*this);
 
   size = that.size;
   root = that.root;
-  trie = new uint32_t [size];
-  memcpy(trie, that.trie, size*sizeof(uint32_t));
+  storage = that.storage;
+  if(!that.storage.empty() && that.trie == &that.storage[0]) {
+    own();
+  } else {
+    trie = that.trie;
+  }
 
   return(*this);
 }
 
 AMTrie::~AMTrie() {
-  delete[] trie;
+  ;
+}
+
+void AMTrie::own() {
+  trie = storage.empty() ? NULL : &storage[0];
 }
 
 uint32_t AMTrie::lookup(const char* s) const {
   uint32_t p = root;
   while(*s != '\0') {
-    int index = *s - 'A';
-    if(!(trie[p] & (1 << index))) return(0);
-    p = trie[p + 2 + __builtin_popcount(trie[p] & (~((~0) << index)))];
+    int symbol = symbolIndex(*s);
+    SymbolSet edges = getEdges(p);
+    if(symbol < 0 || !(edges & symbolBit(symbol))) return(0);
+    p = getChild(p, edges, symbol);
     ++s;
   }
-  return(trie[p+1]);
+  return(getData(p));
 }
 
 bool AMTrie::read(FILE* fin) {
@@ -112,9 +147,9 @@ bool AMTrie::read(FILE* fin) {
   fread(&size, sizeof(size), 1, fin);
   fread(&root, sizeof(root), 1, fin);
   if(feof(fin) || ferror(fin)) return(false);
-  delete[] trie;
-  trie = new uint32_t [size];
-  fread(trie, sizeof(uint32_t), size, fin);
+  storage.resize(size);
+  own();
+  if(size > 0) fread(&storage[0], sizeof(uint32_t), size, fin);
   return(!ferror(fin) && !feof(fin));
 }
 
@@ -37,11 +37,17 @@
 #include <cstdio>
 #include <stdint.h>
 #include <stdlib.h>
+#include <vector>
 #include "dyntrie.h"
+#include "symbols.h"
 
 
 /** A space-efficient implementation of a trie. The character set is
-    the capital letters.
+    the symbols of \c symbols.h: the capital letters, and the extra
+    symbols.
+
+    The whole trie is one flat array, so an AMTrie can also search an
+    array that it doesn't own, such as one in a memory-mapped file.
  */
 class AMTrie {
 private:
@@ -49,21 +55,29 @@ private:
       uint32_t words contains the nodes of the trie in a very special
       format. Each node has a variable size, depending on the number
       of exiting edges. If a node has \a k outgoing edges, then the
-      node comprises \a k+2 words. These words have the following
+      node comprises \a k+5 words. These words have the following
       format:
 
-      - word 0: a 32-bit fingerprint specifying which outgoing edges are
-        present. For each of A-Z, the corresponding bit 0-25 is set if
-        that edge is present. Bits 26-31 are unused.
-      - word 1: 32-bit data
-      - words 2-?: for each outgoing edge present, a 32-bit integer
+      - words 0-1: a 64-bit fingerprint specifying which outgoing
+        edges are present, as a \c SymbolSet, low word first.
+      - word 2: 32-bit data
+      - word 3: the data of highest weight at this node or any node
+        below it, with ties going to the lowest data. A Dict uses the
+        word frequencies as weights, so this is the most frequent
+        word that starts with the node's prefix.
+      - word 4: the depths below this node at which there is data, as
+        the shallowest in bits 0-15 and the deepest in bits 16-31. A
+        node with data has 0 as its shallowest depth.
+      - words 5-?: for each outgoing edge present, a 32-bit integer
         specifying the index in the array of the target node of the
-        edge. The edges are listed in alphabetical order.
+        edge. The edges are listed in order of their symbols.
    */
-  uint32_t* trie;
+  const uint32_t* trie;
   size_t size; ///< The length of the \c trie array.
   uint32_t root; ///< The index in the \c trie array of the first word
 		 ///of the root node.
+  std::vector<uint32_t> storage; ///< The \c trie array, if the AMTrie
+				 ///owns it.
 
 protected:
   static const char* MAGIC_STR; ///< The "magic string" to written to
@@ -74,10 +88,36 @@ protected:
 
 public:
 
+  static const uint32_t HEADER_WORDS = 5; ///< The number of words in
+					  ///a node before its edges.
+
   /// Returns the index of the root node.
   inline uint32_t getRoot() const {
     return root;
   }
+  /// Returns the symbols of the edges leaving the node at a specified
+  /// index.
+  inline SymbolSet getEdges(uint32_t node) const {
+    return trie[node] | ((SymbolSet) trie[node + 1] << 32);
+  }
+  /// Returns the index of the node that the edge for \c symbol leads
+  /// to, from the node at index \c node with edges \c edges.
+  inline uint32_t getChild(uint32_t node, SymbolSet edges, int symbol) const {
+    return trie[node + HEADER_WORDS + symbolRank(edges, symbol)];
+  }
+  /// Returns the data of the node at a specified index.
+  inline uint32_t getData(uint32_t node) const {
+    return trie[node + 2];
+  }
+  /// Returns the best data at or below the node at a specified index.
+  inline uint32_t getBest(uint32_t node) const {
+    return trie[node + 3];
+  }
+  /// Returns the shallowest and deepest depths of data below the node
+  /// at a specified index, packed as in the node's word 4.
+  inline uint32_t getDepths(uint32_t node) const {
+    return trie[node + 4];
+  }
   /// Returns the word at a specified 32-bit index.
   inline uint32_t getPos(uint32_t i) const {
     return trie[i];
@@ -86,9 +126,27 @@ public:
   inline size_t getSize() const {
     return size;
   }
+  /// Returns the array containing the data for the trie.
+  inline const uint32_t* getArray() const {
+    return trie;
+  }
 
   AMTrie();
-  AMTrie(const DynTrie &that);
+
+  /**
+     Builds an AMTrie from a DynTrie. \c weights gives the weight of
+     each value of data, for finding the best data under each node.
+   */
+  AMTrie(const DynTrie &that, const std::vector<uint64_t> &weights);
+
+  /**
+     Makes an AMTrie that searches the array of another one, as given
+     by \c getArray, \c getSize and \c getRoot, without copying it.
+     The array must outlive the AMTrie and any copies of it.
+   */
+  AMTrie(const uint32_t* array, size_t size, uint32_t root);
+
+  /// Copies a trie's array, unless the trie doesn't own it.
   AMTrie(const AMTrie &that);
 
   AMTrie &operator =(const AMTrie &that);
@@ -99,7 +157,7 @@ public:
      Finds the data associated with a given string.
 
      @requires \c suffix is a pointer to a null-terminated C string
-     comprising only uppercase letters.
+     comprising only symbols.
 
      @returns The data at the resulting node, or 0 if the node is not
      in the trie.
@@ -123,7 +181,10 @@ public:
 
 private:
 
-  static uint32_t AMTrie_helper(const DynTrie &that, uint32_t dpos, uint32_t* trie, uint32_t offset, uint32_t &last_node);
+  /// Points \c trie at \c storage.
+  void own();
+
+  static uint32_t AMTrie_helper(const DynTrie &that, const std::vector<uint64_t> &weights, uint32_t dpos, uint32_t* trie, uint32_t offset, uint32_t &last_node);
 };
 
 
@@ -31,8 +31,11 @@
 # POSSIBILITY OF SUCH DAMAGE.
 */
 
+#include <algorithm>
 #include <assert.h>
+#include <deque>
 #include <iostream>
+#include <map>
 #include <math.h>
 #include <sstream>
 #include <string.h>
@@ -51,9 +54,9 @@ Automaton::Node::Node() :
 
 Automaton::Node Automaton::transformNode(const Node &v, size_t a, size_t b) {
   Node w = v;
-  for(int i = 0; i < 26; ++i) {
-    if(w.fingerprint & (1 << i))
-      w.letterEdge[i].dest = a * w.letterEdge[i].dest + b;
+  for(SymbolSet edges = w.fingerprint; edges; edges &= edges - 1) {
+    int i = lowestSymbol(edges);
+    w.letterEdge[i].dest = a * w.letterEdge[i].dest + b;
   }
   for(size_t i = 0; i < w.epsilonEdges.size(); ++i) {
     w.epsilonEdges[i].dest = a * w.epsilonEdges[i].dest + b;
@@ -67,13 +70,12 @@ Automaton::Node Automaton::translateNode(size_t offset, const Node &v) {
 
 Automaton::Node Automaton::mapNode(const std::vector<long> &mapsTo, const Node &v) {
   Node w = v;
-  for(uint_fast8_t i = 0; i < 26; ++i) {
-    if(w.fingerprint & (1 << i)) {
-      if(mapsTo[w.letterEdge[i].dest] == -1) {
-	w.fingerprint &= ~(1 << i);
-      } else {
-	w.letterEdge[i].dest = mapsTo[w.letterEdge[i].dest];
-      }
+  for(SymbolSet edges = v.fingerprint; edges; edges &= edges - 1) {
+    int i = lowestSymbol(edges);
+    if(mapsTo[w.letterEdge[i].dest] == -1) {
+      w.fingerprint &= ~symbolBit(i);
+    } else {
+      w.letterEdge[i].dest = mapsTo[w.letterEdge[i].dest];
     }
   }
   w.epsilonEdges = std::vector<Edge>();
@@ -224,25 +226,26 @@ Automaton Automaton::automatonFromBracketExpression(const char* regex) throw (Sp
   v.startState = 0;
   v.acceptState = 1;
   v.nodes = std::vector<Node>(2);
-  char last = 'A';
+  int last = 0;
   bool dash = false;
   for(; *regex && *regex != ']'; ++regex) {
     char c = *regex;
     if('a' <= c && c <= 'z') {
       c += 'A' - 'a';
     }
-    if('A' <= c && c <= 'Z') {
+    int symbol = symbolIndex(c);
+    if(symbol >= 0) {
+      // a range of symbols goes in the order of symbolIndex
       if(dash) {
-	for(; last < c; ++last) {
-	  assert('A' <= last && last <= 'Z');
-	  v.nodes[0].fingerprint |= 1 << (last - 'A');
-	  v.nodes[0].letterEdge[last - 'A'] = Edge(v.acceptState);
+	for(; last < symbol; ++last) {
+	  v.nodes[0].fingerprint |= symbolBit(last);
+	  v.nodes[0].letterEdge[last] = Edge(v.acceptState);
 	}
 	dash = false;
       }
-      v.nodes[0].fingerprint |= 1 << (c - 'A');
-      v.nodes[0].letterEdge[c - 'A'] = Edge(v.acceptState);
-      last = c;
+      v.nodes[0].fingerprint |= symbolBit(symbol);
+      v.nodes[0].letterEdge[symbol] = Edge(v.acceptState);
+      last = symbol;
     } else if(c == '-') {
       dash = true;
     } else {
@@ -254,10 +257,9 @@ Automaton Automaton::automatonFromBracketExpression(const char* regex) throw (Sp
     }
   }
   if(dash) {
-    for(; last <= 'Z'; ++last) {
-      assert('A' <= last && last <= 'Z');
-      v.nodes[0].fingerprint |= 1 << (last - 'A');
-      v.nodes[0].letterEdge[last - 'A'] = Edge(v.acceptState);
+    for(; last < NUM_SYMBOLS; ++last) {
+      v.nodes[0].fingerprint |= symbolBit(last);
+      v.nodes[0].letterEdge[last] = Edge(v.acceptState);
     }
   }
   return(v);
@@ -267,18 +269,19 @@ Automaton::Automaton(char c) throw (SpecException) {
   if('a' <= c && c <= 'z') {
     c += 'A' - 'a';
   }
-  if('A' <= c && c <= 'Z') {
+  int symbol = symbolIndex(c);
+  if(symbol >= 0) {
     startState = 0;
     acceptState = 1;
     nodes = std::vector<Node>(2);
-    nodes[0].fingerprint = 1 << (c - 'A');
-    nodes[0].letterEdge[c - 'A'] = Edge(acceptState);
+    nodes[0].fingerprint = symbolBit(symbol);
+    nodes[0].letterEdge[symbol] = Edge(acceptState);
   } else if(c == '.') {
     startState = 0;
     acceptState = 1;
     nodes = std::vector<Node>(2);
-    for(int i = 0; i < 26; ++i) {
-      nodes[0].fingerprint |= 1 << i;
+    nodes[0].fingerprint = ALL_SYMBOLS;
+    for(int i = 0; i < NUM_SYMBOLS; ++i) {
       nodes[0].letterEdge[i] = Edge(acceptState);
     }
   } else {
@@ -297,11 +300,9 @@ bool Automaton::checkRep() const {
   if(acceptState < 0 || acceptState >= nodes.size()) return(false);
   for(size_t i = 0; i < nodes.size(); ++i) {
     const Node &v = nodes[i];
-    for(uint_fast8_t j = 0; j < 26; ++j) {
-      if(v.fingerprint & (1<<j)) {
-	if(!checkEdge(v.letterEdge[j]))
-	  return(false);
-      }
+    for(SymbolSet edges = v.fingerprint; edges; edges &= edges - 1) {
+      if(!checkEdge(v.letterEdge[lowestSymbol(edges)]))
+	return(false);
     }
     for(size_t j = 0; j < v.epsilonEdges.size(); ++j) {
       if(!checkEdge(v.epsilonEdges[j]))
@@ -387,12 +388,10 @@ Automaton Automaton::simplifyDeadEnds() const {
   std::vector<std::vector<size_t> > in(n), out(n);
 
   for(size_t i = 0; i < n; ++i) {
-    for(uint_fast8_t k = 0; k < 26; ++k) {
-      if(nodes[i].fingerprint & (1<<k)) {
-	size_t j = nodes[i].letterEdge[k].dest;
-	out[i].push_back(j);
-	in[j].push_back(i);
-      }
+    for(SymbolSet edges = nodes[i].fingerprint; edges; edges &= edges - 1) {
+      size_t j = nodes[i].letterEdge[lowestSymbol(edges)].dest;
+      out[i].push_back(j);
+      in[j].push_back(i);
     }
     for(size_t k = 0; k < nodes[i].epsilonEdges.size(); ++k) {
       size_t j = nodes[i].epsilonEdges[k].dest;
@@ -494,12 +493,10 @@ bool Automaton::accepts(const char* s) const {
 	int k;
 	if('a' <= *s && *s <= 'z') {
 	  k = *s - 'a';
-	} else if('A' <= *s && *s <= 'Z') {
-	  k = *s - 'A';
-	} else {
+	} else if((k = symbolIndex(*s)) < 0) {
 	  return(false);
 	}
-	if(!(v.fingerprint & (1<<k))) continue;
+	if(!(v.fingerprint & symbolBit(k))) continue;
 	dpp[v.letterEdge[k].dest] = true;
       }
       dp = dpp;
@@ -531,6 +528,262 @@ bool Automaton::accepts(const std::string &s) const {
   return(accepts(s.c_str()));
 }
 
+void Automaton::epsilonClosure(std::vector<uint_fast32_t> &states) const {
+  std::vector<bool> seen(nodes.size(), false);
+  for(size_t i = 0; i < states.size(); ++i) {
+    seen[states[i]] = true;
+  }
+  for(size_t i = 0; i < states.size(); ++i) {
+    const Node &v = nodes[states[i]];
+    for(size_t k = 0; k < v.epsilonEdges.size(); ++k) {
+      size_t j = v.epsilonEdges[k].dest;
+      if(seen[j]) continue;
+      seen[j] = true;
+      states.push_back(j);
+    }
+  }
+  std::sort(states.begin(), states.end());
+  states.erase(std::unique(states.begin(), states.end()), states.end());
+}
+
+Automaton Automaton::deterministic(size_t maxStates) const {
+  typedef std::vector<uint_fast32_t> StateSet;
+
+  bool hasEpsilonEdges = false;
+  for(size_t i = 0; i < nodes.size(); ++i) {
+    hasEpsilonEdges |= !nodes[i].epsilonEdges.empty();
+  }
+  if(!hasEpsilonEdges) {
+    // there's only ever one state to follow already
+    return(*this);
+  }
+
+  // Only the symbols that some edge uses need to be looked at.
+  SymbolSet used = 0;
+  for(size_t i = 0; i < nodes.size(); ++i) {
+    used |= nodes[i].fingerprint;
+  }
+  std::vector<int> symbols;
+  for(SymbolSet edges = used; edges; edges &= edges - 1) {
+    symbols.push_back(lowestSymbol(edges));
+  }
+  const size_t numSymbols = symbols.size();
+
+  // Subset construction: each state of the deterministic automaton is
+  // the set of states this one could be in.
+  std::map<StateSet, size_t> ids;
+  std::vector<StateSet> sets(1, StateSet(1, startState));
+  std::vector<std::vector<long> > next;
+  std::vector<bool> accepting;
+  epsilonClosure(sets[0]);
+  ids[sets[0]] = 0;
+  for(size_t d = 0; d < sets.size(); ++d) {
+    StateSet current = sets[d];
+    next.push_back(std::vector<long>(numSymbols, -1));
+    accepting.push_back(std::binary_search(current.begin(), current.end(),
+					   acceptState));
+    for(size_t k = 0; k < numSymbols; ++k) {
+      StateSet moved;
+      for(size_t i = 0; i < current.size(); ++i) {
+	const Node &v = nodes[current[i]];
+	if(v.fingerprint & symbolBit(symbols[k])) {
+	  moved.push_back(v.letterEdge[symbols[k]].dest);
+	}
+      }
+      if(moved.empty()) continue;
+      epsilonClosure(moved);
+      std::map<StateSet, size_t>::iterator found = ids.find(moved);
+      if(found == ids.end()) {
+	if(sets.size() >= maxStates) return(*this);
+	found = ids.insert(std::make_pair(moved, sets.size())).first;
+	sets.push_back(moved);
+      }
+      next[d][k] = found->second;
+    }
+  }
+
+  // Hopcroft's algorithm: split the states into blocks that behave the
+  // same. A missing edge goes to a dead state, which is dropped at the
+  // end along with every state that behaves like it.
+  const size_t n = sets.size();
+  const size_t dead = n;
+  std::vector<std::vector<std::vector<size_t> > > into(numSymbols);
+  for(size_t k = 0; k < numSymbols; ++k) {
+    into[k].resize(n+1);
+    into[k][dead].push_back(dead);
+    for(size_t d = 0; d < n; ++d) {
+      into[k][next[d][k] < 0 ? dead : next[d][k]].push_back(d);
+    }
+  }
+
+  std::vector<std::vector<size_t> > blocks(2);
+  std::vector<size_t> block(n+1);
+  for(size_t d = 0; d <= n; ++d) {
+    block[d] = (d < n && accepting[d]) ? 0 : 1;
+    blocks[block[d]].push_back(d);
+  }
+  if(blocks[0].empty()) {
+    // nothing is accepted
+    return(simplifyDeadEnds());
+  }
+  std::vector<size_t> waiting;
+  std::vector<bool> isWaiting(2, true);
+  waiting.push_back(0);
+  waiting.push_back(1);
+  std::vector<bool> marked(n+1, false);
+
+  while(!waiting.empty()) {
+    size_t a = waiting.back();
+    waiting.pop_back();
+    isWaiting[a] = false;
+    std::vector<size_t> splitter = blocks[a];
+    for(size_t k = 0; k < numSymbols; ++k) {
+      // the states with a k edge into the splitter, by block
+      std::map<size_t, std::vector<size_t> > hit;
+      for(size_t i = 0; i < splitter.size(); ++i) {
+	const std::vector<size_t> &from = into[k][splitter[i]];
+	for(size_t j = 0; j < from.size(); ++j) {
+	  hit[block[from[j]]].push_back(from[j]);
+	}
+      }
+      for(std::map<size_t, std::vector<size_t> >::iterator h = hit.begin();
+	  h != hit.end(); ++h) {
+	size_t b = h->first;
+	const std::vector<size_t> &in = h->second;
+	if(in.size() == blocks[b].size()) continue;
+	// split the states that were hit off into a new block
+	size_t nb = blocks.size();
+	for(size_t i = 0; i < in.size(); ++i) {
+	  marked[in[i]] = true;
+	  block[in[i]] = nb;
+	}
+	std::vector<size_t> rest;
+	for(size_t i = 0; i < blocks[b].size(); ++i) {
+	  if(!marked[blocks[b][i]]) rest.push_back(blocks[b][i]);
+	}
+	for(size_t i = 0; i < in.size(); ++i) {
+	  marked[in[i]] = false;
+	}
+	blocks[b] = rest;
+	blocks.push_back(in);
+	if(isWaiting[b] || in.size() <= rest.size()) {
+	  waiting.push_back(nb);
+	  isWaiting.push_back(true);
+	} else {
+	  waiting.push_back(b);
+	  isWaiting[b] = true;
+	  isWaiting.push_back(false);
+	}
+      }
+    }
+  }
+
+  // Build the automaton, with a state for each block but the dead one.
+  std::vector<long> mapsTo(blocks.size(), -1);
+  size_t m = 0;
+  size_t numAccepting = 0;
+  for(size_t b = 0; b < blocks.size(); ++b) {
+    if(b == block[dead]) continue;
+    mapsTo[b] = m++;
+    if(accepting[blocks[b][0]]) ++numAccepting;
+  }
+  if(mapsTo[block[0]] == -1) {
+    // the start state can't reach an accepting state
+    return(simplifyDeadEnds());
+  }
+  Automaton bob;
+  bob.nodes = std::vector<Node>(numAccepting == 1 ? m : m + 1);
+  bob.startState = mapsTo[block[0]];
+  bob.acceptState = m;
+  for(size_t b = 0; b < blocks.size(); ++b) {
+    if(mapsTo[b] == -1) continue;
+    size_t d = blocks[b][0];
+    Node &v = bob.nodes[mapsTo[b]];
+    for(size_t k = 0; k < numSymbols; ++k) {
+      if(next[d][k] < 0 || mapsTo[block[next[d][k]]] == -1) continue;
+      v.fingerprint |= symbolBit(symbols[k]);
+      v.letterEdge[symbols[k]] = Edge(mapsTo[block[next[d][k]]]);
+    }
+    if(!accepting[d]) continue;
+    if(numAccepting == 1) {
+      bob.acceptState = mapsTo[b];
+    } else {
+      v.epsilonEdges.push_back(Edge(m));
+    }
+  }
+
+  assert(bob.checkRep());
+  return(bob);
+}
+
+const uint32_t Automaton::UNBOUNDED;
+
+std::vector<uint32_t> Automaton::remainingLengths() const {
+  const size_t n = nodes.size();
+  std::vector<std::vector<std::pair<size_t, uint32_t> > > in(n);
+  std::vector<size_t> outDegree(n, 0);
+
+  for(size_t i = 0; i < n; ++i) {
+    for(SymbolSet edges = nodes[i].fingerprint; edges; edges &= edges - 1) {
+      in[nodes[i].letterEdge[lowestSymbol(edges)].dest].push_back(std::make_pair(i, 1));
+      ++outDegree[i];
+    }
+    for(size_t k = 0; k < nodes[i].epsilonEdges.size(); ++k) {
+      in[nodes[i].epsilonEdges[k].dest].push_back(std::make_pair(i, 0));
+      ++outDegree[i];
+    }
+  }
+
+  // The fewest letters, by a breadth-first search back from the accept
+  // state in which epsilon edges go to the front of the queue.
+  std::vector<uint32_t> shortest(n, UNBOUNDED);
+  std::deque<size_t> queue;
+  shortest[acceptState] = 0;
+  queue.push_back(acceptState);
+  while(!queue.empty()) {
+    size_t p = queue.front();
+    queue.pop_front();
+    for(size_t k = 0; k < in[p].size(); ++k) {
+      size_t q = in[p][k].first;
+      uint32_t length = shortest[p] + in[p][k].second;
+      if(length >= shortest[q]) continue;
+      shortest[q] = length;
+      if(in[p][k].second) {
+	queue.push_back(q);
+      } else {
+	queue.push_front(q);
+      }
+    }
+  }
+
+  // The most letters, working back from the states with no edges out.
+  // States that are never reached this way are on a cycle or can reach
+  // one.
+  std::vector<uint32_t> longest(n, UNBOUNDED);
+  std::vector<size_t> stack;
+  std::vector<uint32_t> below(n, 0);
+  for(size_t i = 0; i < n; ++i) {
+    if(outDegree[i] == 0) stack.push_back(i);
+  }
+  while(!stack.empty()) {
+    size_t p = stack.back();
+    stack.pop_back();
+    longest[p] = below[p];
+    for(size_t k = 0; k < in[p].size(); ++k) {
+      size_t q = in[p][k].first;
+      below[q] = std::max(below[q], std::min(below[p] + in[p][k].second,
+					     UNBOUNDED));
+      if(--outDegree[q] == 0) stack.push_back(q);
+    }
+  }
+
+  std::vector<uint32_t> lengths(n);
+  for(size_t i = 0; i < n; ++i) {
+    lengths[i] = shortest[i] | (longest[i] << 16);
+  }
+  return(lengths);
+}
+
 Automaton Automaton::concat(const Automaton &that) const {
   Automaton result = *this;
   size_t offset = nodes.size();
@@ -621,7 +874,8 @@ Automaton Automaton::tensorProduct(const Automaton &that) const {
     for(size_t j = 0; j < m; ++j) {
       size_t p = i*m+j;
       bob.nodes[p].fingerprint = nodes[i].fingerprint & that.nodes[j].fingerprint;
-      for(uint_fast8_t k = 0; k < 26; ++k) {
+      for(SymbolSet edges = bob.nodes[p].fingerprint; edges; edges &= edges - 1) {
+	int k = lowestSymbol(edges);
 	bob.nodes[p].letterEdge[k] = Edge(nodes[i].letterEdge[k].dest * m + that.nodes[j].letterEdge[k].dest);
       }
       for(size_t k = 0; k < nodes[i].epsilonEdges.size(); ++k) {
@@ -705,20 +959,20 @@ std::string Automaton::dotGraph() const {
   // Add edges
   for(size_t i = 0; i < nodes.size(); ++i) {
     Node v = nodes[i];
-    std::vector<bool> r(26,false);
-    for(uint_fast8_t j = 0; j < 26; ++j) {
-      if(!(v.fingerprint & (1 << j))) continue;
+    std::vector<bool> r(NUM_SYMBOLS,false);
+    for(int j = 0; j < NUM_SYMBOLS; ++j) {
+      if(!(v.fingerprint & symbolBit(j))) continue;
       if(r[j]) continue;
       size_t dest = v.letterEdge[j].dest;
       std::string label;
       { // Aggregate edge label
-	label.push_back((char)('A'+j));
-	for(uint_fast8_t k = j+1; k < 26; ++k) {
-	  if(!(v.fingerprint & (1 << k))) continue;
+	label.push_back(symbolChar(j));
+	for(int k = j+1; k < NUM_SYMBOLS; ++k) {
+	  if(!(v.fingerprint & symbolBit(k))) continue;
 	  if(v.letterEdge[k].dest != dest) continue;
 	  if(r[k]) continue;
 	  r[k] = true;
-	  label.push_back((char)('A'+k));
+	  label.push_back(symbolChar(k));
 	}
       }
       { // Compress edge label
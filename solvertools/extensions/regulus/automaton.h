@@ -39,16 +39,17 @@
 #include <stdint.h>
 #include <string>
 #include <vector>
+#include "symbols.h"
 
 
 /**
    A class representing an immutable finite state machine.
 
-   The automaton works with the language A-Z and SPACE, where SPACE
-   represents a word break. The automaton is nondeterministic in that
-   each node may have any number of \a epsilon edges, which consume no
-   input. Each non-epsilon edge leaving a node must consume a distinct
-   character A-Z or SPACE.
+   The automaton works with the symbols of \c symbols.h: the letters
+   A-Z and the extra symbols. The automaton is nondeterministic in
+   that each node may have any number of \a epsilon edges, which
+   consume no input. Each non-epsilon edge leaving a node must consume
+   a distinct symbol.
 
    @invariant <tt>nodes.size() >= 1</tt>
    @invariant <tt>0 <= startState < nodes.size()</tt>
@@ -63,9 +64,9 @@ private:
    */
   struct Edge {
   public:
-    uint_fast32_t dest;
+    uint32_t dest;
 
-    Edge(uint_fast32_t dest_in=-1) :
+    Edge(uint32_t dest_in=-1) :
       dest(dest_in) {;}
   };
 
@@ -82,12 +83,12 @@ public:
   struct Node {
     friend class Automaton;
   private:
-    uint32_t fingerprint;
-    Edge letterEdge[26];
+    SymbolSet fingerprint;
+    Edge letterEdge[NUM_SYMBOLS];
     std::vector<Edge> epsilonEdges;
   public:
     Node();
-    inline uint32_t getFingerprint() const {
+    inline SymbolSet getFingerprint() const {
       return fingerprint;
     }
     inline uint_fast32_t getLetterDest(uint_fast32_t i) const {
@@ -141,6 +142,12 @@ private:
    */
   bool checkRep() const;
 
+  /**
+     Adds the states reachable through epsilon edges to a set of
+     states, and sorts it.
+   */
+  void epsilonClosure(std::vector<uint_fast32_t> &states) const;
+
   /**
      Constructs a hopefully simpler Automaton representing the same
      language.
@@ -185,10 +192,12 @@ public:
      Creates an Automaton matching a single character.
      
      If the character is 'A'-'Z' or 'a'-'z', only matches that
-     specific letter (case insensitive).  If the character is '.',
-     matches any single letter.
+     specific letter (case insensitive), and if it's the byte for an
+     extra symbol, only matches that symbol.  If the character is '.',
+     matches any single symbol.
 
-     @throws \c SpecException if \c c is not 'A'-'Z', 'a'-'z', or '.'.
+     @throws \c SpecException if \c c is not 'A'-'Z', 'a'-'z', an
+     extra symbol, or '.'.
    */
   Automaton(char c) throw (SpecException);
 
@@ -226,11 +235,34 @@ public:
   /**
      Returns true if the string \c s is accepted by the unweighted
      version of the automaton. String \c s should consist of spaces
-     and letters (case insensitive).
+     and symbols (with letters case insensitive).
    */
   bool accepts(const char* s) const;
   bool accepts(const std::string &s) const;
 
+  /**
+     Returns an equivalent Automaton with as few states as possible,
+     in which there is only ever one state to follow: no state has
+     epsilon edges, except that when several states accept they lead
+     to a new accept state through epsilon edges. If that would take
+     more than \c maxStates states along the way, or if this Automaton
+     has no epsilon edges already, returns a copy of it instead.
+   */
+  Automaton deterministic(size_t maxStates) const;
+
+  /// The length used by \c remainingLengths for paths that can be as
+  /// long as you like, or that can't reach the accept state at all.
+  static const uint32_t UNBOUNDED = 0xFFFF;
+
+  /**
+     Returns, for each state, the fewest letters in its low 16 bits
+     and the most letters in its high 16 bits that can take it to the
+     accept state. A state on a cycle, or that can reach one, has \c
+     UNBOUNDED as its most letters, and a state that can't reach the
+     accept state has \c UNBOUNDED as its fewest.
+   */
+  std::vector<uint32_t> remainingLengths() const;
+
   /**
      Returns an Automaton matching the concatenation \f$A \circ B\f$
      of languages \f$A\f$ and \f$B\f$.
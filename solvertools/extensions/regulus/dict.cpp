@@ -33,23 +33,124 @@
 
 #include <algorithm>
 #include <assert.h>
+#include <set>
 #include <string>
 #include <string.h>
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
 
 #include "dict.h"
 #include "dyntrie.h"
 
 
 
-const char* Dict::MAGIC_STR = "Dict1.";
+const char* Dict::MAGIC_STR = "Dict3.\0";
 
 
-Dict::Dict() throw () {
-  ;
+AutomatonCache::AutomatonCache(size_t capacity_in, size_t maxDfaStates_in) :
+  capacity(capacity_in), maxDfaStates(maxDfaStates_in), hits(0), misses(0) {
+  pthread_mutex_init(&mutex, NULL);
 }
 
 
-Dict::Dict(const char* filename) throw (std::ios_base::failure) {
+AutomatonCache::AutomatonCache(const AutomatonCache &that) :
+  capacity(that.capacity), maxDfaStates(that.maxDfaStates), hits(0), misses(0) {
+  pthread_mutex_init(&mutex, NULL);
+}
+
+
+AutomatonCache &AutomatonCache::operator =(const AutomatonCache &that) {
+  if(this != &that) {
+    setCapacity(that.capacity);
+    setMaxDfaStates(that.maxDfaStates);
+  }
+  return(*this);
+}
+
+
+AutomatonCache::~AutomatonCache() {
+  pthread_mutex_destroy(&mutex);
+}
+
+
+Automaton AutomatonCache::get(const std::string &regex) throw (Automaton::SpecException) {
+  size_t states;
+  {
+    Lock lock(mutex);
+    std::map<std::string, EntryList::iterator>::iterator found = index.find(regex);
+    if(found != index.end()) {
+      ++hits;
+      entries.splice(entries.begin(), entries, found->second);
+      return(found->second->second);
+    }
+    ++misses;
+    states = maxDfaStates;
+  }
+
+  // Compile without holding the lock, so other threads can use the
+  // cache meanwhile.
+  Automaton automaton(regex);
+  if(states > 0) {
+    automaton = automaton.deterministic(states);
+  }
+  Lock lock(mutex);
+  // don't keep it if the DFA setting changed while it was compiling
+  if(capacity > 0 && states == maxDfaStates &&
+     index.find(regex) == index.end()) {
+    entries.push_front(std::make_pair(regex, automaton));
+    index[regex] = entries.begin();
+    shrink();
+  }
+  return(automaton);
+}
+
+
+void AutomatonCache::setCapacity(size_t capacity_in) {
+  Lock lock(mutex);
+  capacity = capacity_in;
+  shrink();
+}
+
+
+void AutomatonCache::setMaxDfaStates(size_t maxDfaStates_in) {
+  Lock lock(mutex);
+  maxDfaStates = maxDfaStates_in;
+  entries.clear();
+  index.clear();
+}
+
+
+size_t AutomatonCache::getHits() const {
+  Lock lock(mutex);
+  return(hits);
+}
+
+
+size_t AutomatonCache::getMisses() const {
+  Lock lock(mutex);
+  return(misses);
+}
+
+
+void AutomatonCache::shrink() {
+  while(entries.size() > capacity) {
+    index.erase(entries.back().first);
+    entries.pop_back();
+  }
+}
+
+
+Dict::Dict() throw () :
+  mapping(NULL) {
+  build(std::vector<DictEntry>());
+}
+
+
+Dict::Dict(const char* filename) throw (std::ios_base::failure) :
+  mapping(NULL) {
+  build(std::vector<DictEntry>());
   bool success = read(filename);
   if(!success) {
     throw new std::ios_base::failure("Input failure while constructing Dict object from file.");
@@ -57,7 +158,8 @@ Dict::Dict(const char* filename) throw (std::ios_base::failure) {
 }
 
 
-Dict::Dict(std::vector<DictEntry> entries) throw () {
+Dict::Dict(std::vector<DictEntry> entries, const std::string &symbols_in) throw () :
+  symbols(symbols_in), mapping(NULL) {
   for(size_t i = 0; i < entries.size(); ++i) {
     for(size_t j = 0; j < entries[i].word.length(); ++j) {
       if('a' <= entries[i].word[j] && entries[i].word[j] <= 'z') {
@@ -80,19 +182,159 @@ Dict::Dict(std::vector<DictEntry> entries) throw () {
     entries.resize(p+1);
   }
 
-  words.push_back(DictEntry());
+  build(entries);
+}
+
+
+Dict::Dict(const Dict &that) :
+  automata(that.automata), mapping(NULL) {
+  image.assign(padded(that.dataSize) / sizeof(uint64_t), 0);
+  memcpy(&image[0], that.data, that.dataSize);
+  Sections sections;
+  find_sections((const char*) &image[0], that.dataSize, sections);
+  attach((const char*) &image[0], that.dataSize, sections);
+}
+
+
+Dict &Dict::operator =(const Dict &that) {
+  if(this == &that) return(*this);
+  std::vector<uint64_t> copy(padded(that.dataSize) / sizeof(uint64_t), 0);
+  memcpy(&copy[0], that.data, that.dataSize);
+  release();
+  image.swap(copy);
+  Sections sections;
+  find_sections((const char*) &image[0], that.dataSize, sections);
+  attach((const char*) &image[0], that.dataSize, sections);
+  automata = that.automata;
+  return(*this);
+}
+
+
+Dict::~Dict() {
+  release();
+}
+
+
+void Dict::build(const std::vector<DictEntry> &entries) {
+  std::vector<freq_t> weights;
+  weights.push_back(0);
   DynTrie dyn;
+  uint64_t textSize = 0;
   for(size_t i = 0; i < entries.size(); ++i) {
     dyn.insert(entries[i].word.c_str(), i+1);
-    words.push_back(DictEntry(entries[i]));
+    weights.push_back(entries[i].freq);
+    textSize += entries[i].word.length();
+  }
+  AMTrie built(dyn, weights);
+
+  FileHeader header;
+  memcpy(header.magic, MAGIC_STR, MAGIC_LEN);
+  header.numWords = weights.size();
+  header.textSize = textSize;
+  header.symbolsSize = symbols.length();
+  header.trieSize = built.getSize();
+  header.trieRoot = built.getRoot();
+  size_t size = file_size(header);
+
+  std::vector<uint64_t> laidOut(size / sizeof(uint64_t), 0);
+  char* p = (char*) &laidOut[0];
+  memcpy(p, &header, sizeof(header));
+  p += padded(sizeof(FileHeader));
+  memcpy(p, &weights[0], header.numWords * sizeof(freq_t));
+  p += padded(header.numWords * sizeof(freq_t));
+  uint64_t* starts = (uint64_t*) p;
+  p += padded((header.numWords + 1) * sizeof(uint64_t));
+  starts[0] = starts[1] = 0;
+  for(size_t i = 0; i < entries.size(); ++i) {
+    memcpy(p + starts[i+1], entries[i].word.data(), entries[i].word.length());
+    starts[i+2] = starts[i+1] + entries[i].word.length();
+  }
+  p += padded(header.textSize);
+  memcpy(p, symbols.data(), header.symbolsSize);
+  p += padded(header.symbolsSize);
+  memcpy(p, built.getArray(), header.trieSize * sizeof(uint32_t));
+
+  release();
+  image.swap(laidOut);
+  Sections sections;
+  find_sections((const char*) &image[0], size, sections);
+  attach((const char*) &image[0], size, sections);
+}
+
+
+uint64_t Dict::file_size(const FileHeader &header) {
+  return(padded(sizeof(FileHeader)) +
+	 padded(header.numWords * sizeof(freq_t)) +
+	 padded((header.numWords + 1) * sizeof(uint64_t)) +
+	 padded(header.textSize) + padded(header.symbolsSize) +
+	 padded(header.trieSize * sizeof(uint32_t)));
+}
+
+
+bool Dict::valid_header(const FileHeader &header, uint64_t maxSize) {
+  if(memcmp(header.magic, MAGIC_STR, MAGIC_LEN) != 0) return(false);
+  // Check each count against the size first, so that the size of the
+  // file can't overflow.
+  if(header.numWords < 1 || header.numWords > maxSize ||
+     header.textSize > maxSize || header.symbolsSize > maxSize ||
+     header.trieSize > maxSize || header.trieRoot >= header.trieSize) {
+    return(false);
   }
-  trie = AMTrie(dyn);
+  return(file_size(header) <= maxSize);
+}
+
+
+bool Dict::find_sections(const char* start, size_t size, Sections &sections) {
+  if(size < sizeof(FileHeader)) return(false);
+  const FileHeader* header = (const FileHeader*) start;
+  if(!valid_header(*header, size)) return(false);
+  uint64_t offset = padded(sizeof(FileHeader));
+  sections.header = header;
+  sections.freqs = (const freq_t*) (start + offset);
+  offset += padded(header->numWords * sizeof(freq_t));
+  sections.wordStarts = (const uint64_t*) (start + offset);
+  offset += padded((header->numWords + 1) * sizeof(uint64_t));
+  sections.wordText = start + offset;
+  offset += padded(header->textSize);
+  sections.symbols = start + offset;
+  offset += padded(header->symbolsSize);
+  sections.trie = (const uint32_t*) (start + offset);
+  return(sections.wordStarts[header->numWords] == header->textSize);
+}
+
+
+void Dict::attach(const char* start, size_t size, const Sections &sections) {
+  data = start;
+  dataSize = size;
+  numWords = sections.header->numWords;
+  freqs = sections.freqs;
+  wordStarts = sections.wordStarts;
+  wordText = sections.wordText;
+  symbols.assign(sections.symbols, sections.header->symbolsSize);
+  trie = AMTrie(sections.trie, sections.header->trieSize,
+		sections.header->trieRoot);
 }
 
 
-Dict::WordFitVec Dict::fit_words(const Automaton &automaton) const {
+void Dict::release() {
+  if(mapping != NULL) {
+    munmap(mapping, dataSize);
+    mapping = NULL;
+  }
+  std::vector<uint64_t>().swap(image);
+}
+
+
+std::string Dict::get_symbols() const {
+  return(symbols);
+}
+
+
+Dict::WordFitVec Dict::fit_words(const Automaton &automaton,
+				 SymbolSet firstLetters) const {
 
   WordFitVec fit;
+  std::vector<uint32_t> lengths = automaton.remainingLengths();
 
   std::vector<FitWordsState> stack;
   stack.push_back(FitWordsState(automaton.getStartState(), trie.getRoot()));
@@ -100,11 +342,18 @@ Dict::WordFitVec Dict::fit_words(const Automaton &automaton) const {
   while(!stack.empty()) {
     FitWordsState pos = stack.back();
     stack.pop_back();
+    // skip positions where none of the words are the right length
+    if(!can_fit(lengths[pos.graphNode], trie.getDepths(pos.trieNode))) continue;
     const Automaton::Node &s = automaton.getNode(pos.graphNode);
-    uint32_t graphEdges = s.getFingerprint();
-    uint32_t trieEdges  = trie.getPos(pos.trieNode);
-    uint32_t wordID     = trie.getPos(pos.trieNode+1);
-    uint32_t edges      = graphEdges & trieEdges;
+    SymbolSet graphEdges = s.getFingerprint();
+    SymbolSet trieEdges  = trie.getEdges(pos.trieNode);
+    uint32_t wordID      = trie.getData(pos.trieNode);
+    SymbolSet edges      = graphEdges & trieEdges;
+
+    if(pos.trieNode == trie.getRoot()) {
+      edges &= firstLetters;
+      if(!(firstLetters & 1)) wordID = 0;
+    }
 
     if(wordID && pos.graphNode == automaton.getAcceptState()) {
       // it's a word!
@@ -112,13 +361,10 @@ Dict::WordFitVec Dict::fit_words(const Automaton &automaton) const {
     }
 
     // handle letter edges
-    uint32_t head = pos.trieNode + 2;
-    while(edges) {
-      uint_fast32_t index = __builtin_ctz(edges);
-      uint32_t dictPos2 = head + __builtin_popcount(trieEdges & (~((~0) << index)));
+    for(; edges; edges &= edges - 1) {
+      int index = lowestSymbol(edges);
       stack.push_back(FitWordsState(s.getLetterDest(index),
-				    trie.getPos(dictPos2)));
-      edges &= ~(1 << index);
+				    trie.getChild(pos.trieNode, trieEdges, index)));
     }
 
     // handle epsilon edges
@@ -146,142 +392,521 @@ Dict::WordFitVec Dict::fit_words(const Automaton &automaton) const {
 }
 
 
+Automaton Dict::compile(const std::string &regex) const {
+  return(automata.get(regex));
+}
+
+
+std::vector<Automaton> Dict::compile_many(const std::vector<std::string> &regexes) const {
+  std::vector<Automaton> result;
+  result.reserve(regexes.size());
+  for(size_t i = 0; i < regexes.size(); ++i) {
+    result.push_back(compile(regexes[i]));
+  }
+  return(result);
+}
+
+
+size_t Dict::cache_hits() const {
+  return(automata.getHits());
+}
+
+
+size_t Dict::cache_misses() const {
+  return(automata.getMisses());
+}
+
+
+void Dict::set_cache_size(size_t size) {
+  automata.setCapacity(size);
+}
+
+
+void Dict::set_dfa_states(size_t states) {
+  automata.setMaxDfaStates(states);
+}
+
+
+/*
+  Searches the trie once for all of the automata. Each position in the
+  trie carries the (automaton, state) pairs that can reach it, so a
+  prefix that several automata share is only walked once.
+
+  When only the best word for each automaton is wanted, an automaton's
+  states are dropped at positions that can't hold a better word than
+  the best it has found.
+ */
+std::vector<Dict::WordFitVec> Dict::fit_words_many(const std::vector<Automaton> &automata,
+						   bool bestOnly) const {
+
+  std::vector<WordFitVec> fits(automata.size());
+  WordFitVec best(automata.size(), 0);
+  std::vector<ActiveState> states;
+  std::vector<ActiveState> byLetter[NUM_SYMBOLS];
+  std::vector<FitManyState> stack;
+  std::vector<std::vector<uint32_t> > lengths(automata.size());
+
+  for(uint32_t p = 0; p < automata.size(); ++p) {
+    states.push_back(ActiveState(p, automata[p].getStartState()));
+    lengths[p] = automata[p].remainingLengths();
+  }
+  stack.push_back(FitManyState(trie.getRoot(), 0, states.size()));
+
+  while(!stack.empty()) {
+    FitManyState pos = stack.back();
+    stack.pop_back();
+    // Anything above this position's states belonged to positions that
+    // have been searched already.
+    states.resize(pos.end);
+
+    SymbolSet trieEdges = trie.getEdges(pos.trieNode);
+    uint32_t wordID     = trie.getData(pos.trieNode);
+    uint32_t depths     = trie.getDepths(pos.trieNode);
+    SymbolSet letters   = 0;
+    BoundState bound(0, pos.trieNode, trie.getBest(pos.trieNode), 0);
+    if(bestOnly) bound.bound = freqs[bound.best];
+
+    // handle epsilon edges, which add more states at this position, and
+    // keep the states that are still worth following
+    size_t kept = pos.begin;
+    for(size_t i = pos.begin; i < states.size(); ++i) {
+      ActiveState a = states[i];
+      if(!can_fit(lengths[a.pattern][a.graphNode], depths)) continue;
+      if(bestOnly && !bound.beats(best[a.pattern], freqs[best[a.pattern]])) {
+	continue;
+      }
+      states[kept++] = a;
+      const Automaton &automaton = automata[a.pattern];
+      const Automaton::Node &s = automaton.getNode(a.graphNode);
+      if(wordID && a.graphNode == automaton.getAcceptState()) {
+	// it's a word!
+	if(!bestOnly) {
+	  fits[a.pattern].push_back(wordID);
+	} else if(freqs[wordID] > freqs[best[a.pattern]] ||
+		  (freqs[wordID] == freqs[best[a.pattern]] &&
+		   wordID < best[a.pattern])) {
+	  best[a.pattern] = wordID;
+	}
+      }
+      letters |= s.getFingerprint();
+      for(uint_fast32_t j = 0; j < s.getNumEpsilonEdges(); ++j) {
+	states.push_back(ActiveState(a.pattern, s.getEpsilonDest(j)));
+      }
+    }
+    states.resize(kept);
+    pos.end = kept;
+
+    // handle letter edges, sorting them out by letter so that each
+    // letter's destinations get their own position on the stack
+    SymbolSet edges = letters & trieEdges;
+    for(size_t i = pos.begin; i < pos.end; ++i) {
+      const Automaton::Node &s = automata[states[i].pattern].getNode(states[i].graphNode);
+      for(SymbolSet stateEdges = s.getFingerprint() & edges; stateEdges;
+	  stateEdges &= stateEdges - 1) {
+	int index = lowestSymbol(stateEdges);
+	byLetter[index].push_back(ActiveState(states[i].pattern,
+					      s.getLetterDest(index)));
+      }
+    }
+    for(; edges; edges &= edges - 1) {
+      int index = lowestSymbol(edges);
+      std::vector<ActiveState> &next = byLetter[index];
+      size_t begin = states.size();
+      states.insert(states.end(), next.begin(), next.end());
+      next.clear();
+      stack.push_back(FitManyState(trie.getChild(pos.trieNode, trieEdges, index),
+				   begin, states.size()));
+    }
+  }
+
+  if(bestOnly) {
+    for(size_t p = 0; p < fits.size(); ++p) {
+      if(best[p]) fits[p].push_back(best[p]);
+    }
+    return(fits);
+  }
+  // A word can be reached more than once by the same automaton.
+  for(size_t p = 0; p < fits.size(); ++p) {
+    sort(fits[p].begin(), fits[p].end());
+    fits[p].erase(unique(fits[p].begin(), fits[p].end()), fits[p].end());
+  }
+  return(fits);
+}
+
+
+std::vector<std::vector<DictEntry> > Dict::grep_many(const std::vector<std::string> &regexes) const {
+  std::vector<WordFitVec> fits = fit_words_many(compile_many(regexes));
+  std::vector<WordList> results(fits.size());
+  for(size_t p = 0; p < fits.size(); ++p) {
+    results[p].reserve(fits[p].size());
+    for(size_t i = 0; i < fits[p].size(); ++i) {
+      results[p].push_back(entry(fits[p][i]));
+    }
+  }
+  return(results);
+}
+
+
+std::vector<DictEntry> Dict::best_match_many(const std::vector<std::string> &regexes) const {
+  std::vector<WordFitVec> fits = fit_words_many(compile_many(regexes), true);
+  WordList results;
+  results.reserve(fits.size());
+  for(size_t p = 0; p < fits.size(); ++p) {
+    results.push_back(entry(fits[p].empty() ? 0 : fits[p][0]));
+  }
+  return(results);
+}
+
+
+/*
+  Searches the trie depth-first, skipping the positions whose best word
+  couldn't be among the \c k best found so far.
+ */
+Dict::WordFitVec Dict::best_fits(const Automaton &automaton, size_t k,
+				 SymbolSet firstLetters) const {
+
+  freq_cmp better(this);
+  WordFitVec heap; // The best words so far, with the worst on top.
+  std::set<WordFit> found;
+  if(k == 0) return(heap);
+
+  // Looking up the frequency of the best word under a position is
+  // slow, so it's only done once there are k words to compare it to.
+  const freq_t UNKNOWN = (freq_t) -1;
+  std::vector<uint32_t> lengths = automaton.remainingLengths();
+  std::vector<BoundState> stack;
+  stack.push_back(BoundState(automaton.getStartState(), trie.getRoot(),
+			     trie.getBest(trie.getRoot()), UNKNOWN));
+  // The worst of the k best words so far, once there are k of them.
+  WordFit worst = 0;
+  freq_t worstFreq = 0;
+
+  while(!stack.empty()) {
+    BoundState pos = stack.back();
+    stack.pop_back();
+    if(!can_fit(lengths[pos.graphNode], trie.getDepths(pos.trieNode))) continue;
+    if(heap.size() == k) {
+      if(pos.bound == UNKNOWN) pos.bound = freqs[pos.best];
+      if(!pos.beats(worst, worstFreq)) continue;
+    }
+    const Automaton::Node &s = automaton.getNode(pos.graphNode);
+    SymbolSet graphEdges = s.getFingerprint();
+    SymbolSet trieEdges  = trie.getEdges(pos.trieNode);
+    uint32_t wordID      = trie.getData(pos.trieNode);
+    SymbolSet edges      = graphEdges & trieEdges;
+
+    if(pos.trieNode == trie.getRoot()) {
+      edges &= firstLetters;
+      if(!(firstLetters & 1)) wordID = 0;
+    }
+
+    if(wordID && pos.graphNode == automaton.getAcceptState() &&
+       (heap.size() < k || better(wordID, heap.front())) &&
+       found.insert(wordID).second) {
+      // it's a word!
+      if(heap.size() == k) {
+	pop_heap(heap.begin(), heap.end(), better);
+	heap.pop_back();
+      }
+      heap.push_back(wordID);
+      push_heap(heap.begin(), heap.end(), better);
+      worst = heap.front();
+      worstFreq = freqs[worst];
+    }
+
+    // handle letter edges
+    for(; edges; edges &= edges - 1) {
+      int index = lowestSymbol(edges);
+      uint32_t child = trie.getChild(pos.trieNode, trieEdges, index);
+      stack.push_back(BoundState(s.getLetterDest(index), child,
+				 trie.getBest(child), UNKNOWN));
+    }
+
+    // handle epsilon edges
+    for(uint_fast32_t i = 0; i < s.getNumEpsilonEdges(); ++i) {
+      stack.push_back(BoundState(s.getEpsilonDest(i), pos.trieNode,
+				 pos.best, pos.bound));
+    }
+  }
+
+  sort_heap(heap.begin(), heap.end(), better);
+  return(heap);
+}
+
+
 std::vector<DictEntry> Dict::grep(std::string regex) const {
-  WordFitVec fit = fit_words(Automaton(regex));
+  WordFitVec fit = fit_words(compile(regex));
   WordList result;
   result.reserve(fit.size());
   for(size_t i = 0; i < fit.size(); ++i) {
-    result.push_back(words[fit[i]]);
+    result.push_back(entry(fit[i]));
+  }
+  return(result);
+}
+
+
+SymbolSet Dict::letter_range(char first, char last) {
+  int lo = symbolIndex(first);
+  int hi = symbolIndex(last);
+  if(lo < 0) lo = 0;
+  if(hi < 0) hi = NUM_SYMBOLS - 1;
+  SymbolSet letters = 0;
+  for(int i = lo; i <= hi; ++i) {
+    letters |= symbolBit(i);
+  }
+  return(letters);
+}
+
+
+std::vector<DictEntry> Dict::grep_range(std::string regex, char first, char last) const {
+  WordFitVec fit = fit_words(compile(regex), letter_range(first, last));
+  WordList result;
+  result.reserve(fit.size());
+  for(size_t i = 0; i < fit.size(); ++i) {
+    result.push_back(entry(fit[i]));
+  }
+  return(result);
+}
+
+
+std::vector<size_t> Dict::first_letter_counts() const {
+  std::vector<size_t> counts(NUM_SYMBOLS, 0);
+  for(size_t i = 1; i < numWords; ++i) {
+    bool empty = wordStarts[i] == wordStarts[i + 1];
+    int symbol = empty ? -1 : symbolIndex(wordText[wordStarts[i]]);
+    if(symbol >= 0) {
+      ++counts[symbol];
+    }
+  }
+  return(counts);
+}
+
+
+std::vector<DictEntry> Dict::grep_limit(std::string regex, size_t limit, size_t offset,
+				        bool byFreq, char first, char last) const {
+  WordList result;
+
+  if(!byFreq) {
+    GrepCursor cursor(*this, regex, letter_range(first, last));
+    uint32_t wordID;
+    for(size_t i = 0; i < offset; ++i) {
+      if(!cursor.nextWord()) return(result);
+    }
+    while(result.size() < limit && (wordID = cursor.nextWord())) {
+      result.push_back(entry(wordID));
+    }
+    return(result);
+  }
+
+  WordFitVec fit;
+  size_t keep = (offset + limit < limit) ? (size_t) -1 : offset + limit;
+  if(keep < numWords) {
+    fit = best_fits(compile(regex), keep, letter_range(first, last));
+  } else {
+    // Every match is wanted, so there's nothing to prune.
+    fit = fit_words(compile(regex), letter_range(first, last));
+    sort(fit.begin(), fit.end(), freq_cmp(this));
+  }
+  for(size_t i = offset; i < fit.size() && i < keep; ++i) {
+    result.push_back(entry(fit[i]));
   }
   return(result);
 }
 
 
 std::vector<DictEntry> Dict::grep_freq_sorted(std::string regex) const {
-  WordFitVec fit = fit_words(Automaton(regex));
+  WordFitVec fit = fit_words(compile(regex));
   sort(fit.begin(), fit.end(), freq_cmp(this));
   WordList result;
   result.reserve(fit.size());
   for(size_t i = 0; i < fit.size(); ++i) {
-    result.push_back(words[fit[i]]);
+    result.push_back(entry(fit[i]));
   }
   return(result);  
 }
 
 
 freq_t Dict::total_freq(std::string regex) const {
-  WordFitVec fit = fit_words(Automaton(regex));
+  WordFitVec fit = fit_words(compile(regex));
   freq_t total = 0;
   for(size_t i = 0; i < fit.size(); ++i) {
-    total += words[fit[i]].freq;
+    total += freqs[fit[i]];
   }
   return(total);
 }
 
 
 DictEntry Dict::best_match(std::string regex) const {
+  WordFitVec fit = best_fits(compile(regex), 1);
+  if(fit.empty() || freqs[fit[0]] == 0) {
+    return(entry(0));
+  }
+  return(entry(fit[0]));
+}
 
-  Automaton automaton(regex);
-  uint32_t best = 0;
 
-  std::vector<FitWordsState> stack;
-  stack.push_back(FitWordsState(automaton.getStartState(), trie.getRoot()));
+GrepCursor::GrepCursor(const Dict &dict_in, std::string regex, SymbolSet firstLetters_in)
+  throw (Automaton::SpecException) :
+  dict(dict_in), automaton(dict_in.compile(regex)),
+  lengths(automaton.remainingLengths()), firstLetters(firstLetters_in),
+  seen(automaton.getNumNodes(), 0), stamp(1) {
+  addState(automaton.getStartState());
+  stack.push_back(Position(dict.trie.getRoot(), 0, states.size()));
+}
+
+
+void GrepCursor::addState(uint_fast32_t graphNode) {
+  if(seen[graphNode] == stamp) return;
+  size_t first = states.size();
+  seen[graphNode] = stamp;
+  states.push_back(graphNode);
+  for(size_t k = first; k < states.size(); ++k) {
+    const Automaton::Node &s = automaton.getNode(states[k]);
+    for(uint_fast32_t i = 0; i < s.getNumEpsilonEdges(); ++i) {
+      uint_fast32_t dest = s.getEpsilonDest(i);
+      if(seen[dest] != stamp) {
+	seen[dest] = stamp;
+	states.push_back(dest);
+      }
+    }
+  }
+}
 
+
+uint32_t GrepCursor::nextWord() {
   while(!stack.empty()) {
-    FitWordsState pos = stack.back();
+    Position pos = stack.back();
     stack.pop_back();
-    const Automaton::Node &s = automaton.getNode(pos.graphNode);
-    uint32_t graphEdges = s.getFingerprint();
-    uint32_t trieEdges  = trie.getPos(pos.trieNode);
-    uint32_t wordID     = trie.getPos(pos.trieNode+1);
-    uint32_t edges      = graphEdges & trieEdges;
-
-    if(wordID && pos.graphNode == automaton.getAcceptState()) {
-      if(words[best].freq < words[wordID].freq) {
-	best = wordID;
+    // Anything above this position's states belonged to positions that
+    // have been searched already.
+    states.resize(pos.end);
+
+    SymbolSet trieEdges = dict.trie.getEdges(pos.trieNode);
+    uint32_t wordID     = dict.trie.getData(pos.trieNode);
+    uint32_t depths     = dict.trie.getDepths(pos.trieNode);
+    SymbolSet letters   = 0;
+    bool accepted       = false;
+    // keep only the states that could still reach a word from here
+    size_t kept = pos.begin;
+    for(size_t i = pos.begin; i < pos.end; ++i) {
+      if(!Dict::can_fit(lengths[states[i]], depths)) continue;
+      states[kept++] = states[i];
+      if(states[i] == automaton.getAcceptState()) {
+	accepted = true;
       }
+      letters |= automaton.getNode(states[i]).getFingerprint();
     }
+    states.resize(kept);
+    pos.end = kept;
 
-    // handle letter edges
-    uint32_t head = pos.trieNode + 2;
+    SymbolSet edges = letters & trieEdges;
+    if(pos.trieNode == dict.trie.getRoot()) {
+      edges &= firstLetters;
+      if(!(firstLetters & 1)) wordID = 0;
+    }
+
+    // Push the edges in reverse order, so that they come off the stack
+    // in alphabetical order.
     while(edges) {
-      uint_fast32_t index = __builtin_ctz(edges);
-      uint32_t dictPos2 = head + __builtin_popcount(trieEdges & (~((~0) << index)));
-      stack.push_back(FitWordsState(s.getLetterDest(index),
-				    trie.getPos(dictPos2)));
-      edges &= ~(1 << index);
+      int index = highestSymbol(edges);
+      ++stamp;
+      size_t begin = states.size();
+      for(size_t i = pos.begin; i < pos.end; ++i) {
+	const Automaton::Node &s = automaton.getNode(states[i]);
+	if(s.getFingerprint() & symbolBit(index)) {
+	  addState(s.getLetterDest(index));
+	}
+      }
+      stack.push_back(Position(dict.trie.getChild(pos.trieNode, trieEdges, index),
+			       begin, states.size()));
+      edges &= ~symbolBit(index);
     }
 
-    // handle epsilon edges
-    for(uint_fast32_t i = 0; i < s.getNumEpsilonEdges(); ++i) {
-      stack.push_back(FitWordsState(s.getEpsilonDest(i),
-				    pos.trieNode));
+    if(wordID && accepted) {
+      // it's a word!
+      return(wordID);
     }
   }
+  return(0);
+}
+
 
-  return(words[best]);
+std::vector<DictEntry> GrepCursor::next(size_t n) {
+  std::vector<DictEntry> result;
+  uint32_t wordID;
+  while(result.size() < n && (wordID = nextWord())) {
+    result.push_back(dict.entry(wordID));
+  }
+  return(result);
 }
 
 
 bool Dict::read(FILE* fin) {
   if(feof(fin) || ferror(fin)) return(false);
-  char buf[MAGIC_LEN];
-  fread(buf, 1, MAGIC_LEN, fin);
-  if(feof(fin) || ferror(fin)) return(false);
-  if(memcmp(buf, MAGIC_STR, MAGIC_LEN) != 0) return(false);
-  size_t n;
-  fread(&n, sizeof(n), 1, fin);
+  FileHeader header;
+  fread(&header, sizeof(header), 1, fin);
   if(feof(fin) || ferror(fin)) return(false);
-  words.clear();
-  words.reserve(n);
-  for(size_t i = 0; i < n; ++i) {
-    size_t len;
-    fread(&len, sizeof(len), 1, fin);
-    if(feof(fin) || ferror(fin)) return(false);
-    char* buf = new char [len+1];
-    fread(buf, sizeof(char), len, fin);
-    buf[len] = '\0';
-    std::string word(buf);
-    delete[] buf;
-    if(feof(fin) || ferror(fin)) return(false);
-    freq_t freq;
-    fread(&freq, sizeof(freq), 1, fin);
-    if(feof(fin) || ferror(fin)) return(false);
-    words.push_back(DictEntry(word, freq));
-  }
-  return(trie.read(fin));
+  if(!valid_header(header, (size_t) -1 >> 8)) return(false);
+  size_t size = file_size(header);
+  std::vector<uint64_t> contents(size / sizeof(uint64_t), 0);
+  char* start = (char*) &contents[0];
+  memcpy(start, &header, sizeof(header));
+  size_t rest = size - padded(sizeof(FileHeader));
+  if(fread(start + padded(sizeof(FileHeader)), 1, rest, fin) != rest) {
+    return(false);
+  }
+  Sections sections;
+  if(!find_sections(start, size, sections)) return(false);
+  release();
+  image.swap(contents);
+  attach((const char*) &image[0], size, sections);
+  return(true);
 }
 
 
 bool Dict::read(const char* filename) {
-  FILE* fin = fopen(filename, "rb");
-  if(fin == NULL) return false;
-  bool result = read(fin);
-  fclose(fin);
-  return result;
+  int fd = open(filename, O_RDONLY);
+  if(fd < 0) return(false);
+  struct stat info;
+  if(fstat(fd, &info) != 0 || info.st_size <= 0) {
+    close(fd);
+    return(false);
+  }
+  size_t size = info.st_size;
+  void* mapped = mmap(NULL, size, PROT_READ, MAP_SHARED, fd, 0);
+  // The mapping holds on to the file by itself.
+  close(fd);
+  if(mapped == MAP_FAILED) return(false);
+  Sections sections;
+  if(!find_sections((const char*) mapped, size, sections)) {
+    munmap(mapped, size);
+    return(false);
+  }
+  release();
+  mapping = mapped;
+  attach((const char*) mapped, size, sections);
+  return(true);
 }
 
 
 bool Dict::write(FILE* fout) const {
   if(ferror(fout)) return(false);
-  fwrite(MAGIC_STR, 1, MAGIC_LEN, fout);
-  size_t n = words.size();
-  fwrite(&n, sizeof(n), 1, fout);
-  for(size_t i = 0; i < n; ++i) {
-    size_t len = words[i].word.length();
-    fwrite(&len, sizeof(len), 1, fout);
-    fwrite(words[i].word.c_str(), sizeof(char), len, fout);
-    fwrite(&words[i].freq, sizeof(words[i].freq), 1, fout);
-  }
-
-  return(!ferror(fout) && trie.write(fout));
+  fwrite(data, 1, dataSize, fout);
+  return(!ferror(fout));
 }
 
 
 bool Dict::write(const char* filename) const {
-  FILE* fout = fopen(filename, "wb");
+  char tempname[32];
+  snprintf(tempname, sizeof(tempname), ".%d.tmp", (int) getpid());
+  std::string temp = std::string(filename) + tempname;
+  FILE* fout = fopen(temp.c_str(), "wb");
   if(fout == NULL) return false;
   bool result = write(fout);
-  fclose(fout);
-  return result;
+  result = (fclose(fout) == 0) && result;
+  if(!result || rename(temp.c_str(), filename) != 0) {
+    remove(temp.c_str());
+    return false;
+  }
+  return true;
 }
@@ -35,16 +35,90 @@
 #define __DICT_DOT_H_INCLUDED__
 
 #include <iostream>
+#include <list>
+#include <map>
+#include <pthread.h>
 #include <stdint.h>
 #include <string>
 #include <vector>
 #include "amtrie.h"
 #include "automaton.h"
+#include "symbols.h"
 
 
 typedef uint64_t freq_t;
 
 
+/**
+   A cache of the automata compiled from the most recently used
+   regular expressions, so that searching for a pattern again doesn't
+   compile it again. It can be used from several threads at once.
+
+   Automata are made deterministic when they're compiled, unless that
+   would take more than a given number of states.
+ */
+class AutomatonCache {
+public:
+
+  static const size_t DEFAULT_CAPACITY = 1024;
+  static const size_t DEFAULT_DFA_STATES = 256;
+
+  explicit AutomatonCache(size_t capacity = DEFAULT_CAPACITY,
+			  size_t maxDfaStates = DEFAULT_DFA_STATES);
+
+  /// Copying a cache makes an empty cache with the same capacity.
+  AutomatonCache(const AutomatonCache &that);
+  AutomatonCache &operator =(const AutomatonCache &that);
+  ~AutomatonCache();
+
+  /**
+     Returns the automaton for a regular expression, compiling it if
+     it isn't in the cache.
+
+     @throws \c Automaton::SpecException if \c regex is invalid.
+   */
+  Automaton get(const std::string &regex) throw (Automaton::SpecException);
+
+  /**
+     Changes how many automata the cache holds, dropping the least
+     recently used ones if there are too many. A capacity of 0 turns
+     the cache off.
+   */
+  void setCapacity(size_t capacity);
+
+  /**
+     Changes how many states an automaton may take to be made
+     deterministic, emptying the cache. 0 turns it off.
+   */
+  void setMaxDfaStates(size_t maxDfaStates);
+
+  size_t getHits() const;
+  size_t getMisses() const;
+
+private:
+
+  typedef std::list<std::pair<std::string, Automaton> > EntryList;
+
+  EntryList entries; ///< The cached automata, most recently used first.
+  std::map<std::string, EntryList::iterator> index;
+  size_t capacity;
+  size_t maxDfaStates;
+  size_t hits;
+  size_t misses;
+  mutable pthread_mutex_t mutex;
+
+  /// Holds the cache's mutex for as long as it exists.
+  struct Lock {
+    pthread_mutex_t &mutex;
+    Lock(pthread_mutex_t &m) : mutex(m) { pthread_mutex_lock(&mutex); }
+    ~Lock() { pthread_mutex_unlock(&mutex); }
+  };
+
+  /// Drops the least recently used automata until there are few enough.
+  void shrink();
+};
+
+
 struct DictEntry {
   std::string word;
   freq_t freq;
@@ -64,7 +138,17 @@ inline bool operator <(const DictEntry &a, const DictEntry &b) {
 }
 
 
+/**
+   A dictionary of words and their frequencies, which can be searched
+   for regular expressions.
+
+   A Dict is kept in memory just as it's laid out in its file, so
+   reading a file maps it into memory instead of copying it, and
+   processes that read the same file share its pages.
+ */
 class Dict {
+  friend class GrepCursor;
+
 public:
 
   typedef std::string string;
@@ -74,17 +158,50 @@ public:
 protected:
   static const char* MAGIC_STR; ///< The "magic string" to written to
 				///a file at the start of an AMTrie.
-  static const size_t MAGIC_LEN = 6; ///< The length of the "magic
+  static const size_t MAGIC_LEN = 8; ///< The length of the "magic
                                      ///string".
 
 
 private:
 
+  /**
+     The start of a Dict's file. The header is followed by these
+     sections, each padded to a multiple of 8 bytes:
+
+     - the frequency of each word, indexed by its unique identifier,
+       as \c numWords \c freq_t values. Identifier 0 is the empty
+       word with frequency 0, which stands for no word.
+     - where each word starts in the text, as \c numWords+1 \c
+       uint64_t offsets, the last of which is \c textSize.
+     - the text of the words, one after another.
+     - the \c symbols string.
+     - the array of the trie, as \c trieSize \c uint32_t words.
+   */
+  struct FileHeader {
+    char magic[MAGIC_LEN];
+    uint64_t numWords;
+    uint64_t textSize;
+    uint64_t symbolsSize;
+    uint64_t trieSize;
+    uint64_t trieRoot;
+  };
+
   AMTrie trie; ///< A dictionary containing the known words. The data
 	       ///associated with each word is the word's unique
-	       ///identifier >= 1.
-  WordList words; ///< A vector mapping unique identifiers to words
-                  ///and their associated frequencies.
+	       ///identifier >= 1. It searches the array in \c data.
+  const freq_t* freqs; ///< The frequency of each word, apart from the
+		       ///word, so that searches that compare many
+		       ///frequencies stay in cache.
+  const uint64_t* wordStarts; ///< Where each word starts in \c wordText.
+  const char* wordText; ///< The words, one after another.
+  size_t numWords; ///< The number of words, counting the empty word.
+  std::string symbols; ///< What the extra symbols stand for.
+  mutable AutomatonCache automata; ///< The recently used patterns.
+
+  const char* data; ///< The Dict as it's laid out in a file.
+  size_t dataSize;  ///< The size of \c data in bytes.
+  std::vector<uint64_t> image; ///< Holds \c data, unless it's mapped.
+  void* mapping; ///< The mapped file holding \c data, or NULL.
 
 
 public:
@@ -102,8 +219,24 @@ public:
   /**
      Constructs a new dictionary from the given word->frequency map.
      Assumes that each word is given at most once.
+
+     Words are spelled in the symbols of \c symbols.h. \c symbols
+     says what the extra symbols stand for, in whatever form the
+     caller likes; it's kept with the Dict but isn't used to search
+     it.
+   */
+  Dict(std::vector<DictEntry> entries, const std::string &symbols = "") throw ();
+
+  /// Copies a dictionary into memory of its own.
+  Dict(const Dict &that);
+  Dict &operator =(const Dict &that);
+  ~Dict();
+
+  /**
+     Returns what the extra symbols stand for, as given when the Dict
+     was constructed.
    */
-  Dict(std::vector<DictEntry> entries) throw ();
+  std::string get_symbols() const;
 
   /**
      Returns a list of all words matching the given regular
@@ -111,6 +244,41 @@ public:
    */
   std::vector<DictEntry> grep(std::string regex) const;
 
+  /**
+     Returns the words matching the given regular expression whose
+     first letter is between \c first and \c last, inclusive, sorted
+     alphabetically. The symbols go in the order of \c symbolIndex,
+     with the extra symbols after 'Z', and the empty word counts as
+     coming before 'A'.
+
+     Only the part of the dictionary that starts with those letters is
+     searched, so a large search can be split into ranges of letters
+     and run in several threads at once.
+   */
+  std::vector<DictEntry> grep_range(std::string regex, char first, char last) const;
+
+  /**
+     Returns the number of words that start with each symbol, for
+     dividing the dictionary into ranges of about the same size.
+   */
+  std::vector<size_t> first_letter_counts() const;
+
+  /**
+     Returns the words matching the given regular expression, skipping
+     the first \c offset of them and returning at most \c limit. If
+     \c byFreq is true, the words are in the order that \c
+     grep_freq_sorted gives, and otherwise they are in alphabetical
+     order. Only words whose first letter is between \c first and \c
+     last are searched, as in \c grep_range.
+
+     In alphabetical order, the search stops as soon as it has enough
+     words. In frequency order, it skips the parts of the dictionary
+     that can't contain any better words than the ones it has found.
+   */
+  std::vector<DictEntry> grep_limit(std::string regex, size_t limit, size_t offset,
+				    bool byFreq, char first = 'A',
+				    char last = LAST_SYMBOL) const;
+
   /**
      Returns a list of all words matching the given regular
      expression, sorted by word frequency.
@@ -129,18 +297,63 @@ public:
      equal frequencies, returns the word which comes first
      alphabetically.  If no words in the dictionary match the regular
      expression, returns DictEntry("", 0).
+
+     Each position in the trie knows its most frequent word, so the
+     search skips the positions that couldn't hold a better word than
+     the one it has found.
    */
   DictEntry best_match(std::string regex) const;
 
   /**
-     Reads a binary representation of a dictionary from a file.
+     Runs \c grep on each of several regular expressions. All of the
+     expressions are compiled first, and then the dictionary is
+     searched once for all of them together, which is much faster than
+     searching it once for each expression when there are many of them.
+   */
+  std::vector<std::vector<DictEntry> > grep_many(const std::vector<std::string> &regexes) const;
+
+  /**
+     Runs \c best_match on each of several regular expressions,
+     compiling all of them first.
+   */
+  std::vector<DictEntry> best_match_many(const std::vector<std::string> &regexes) const;
+
+  /**
+     Returns how many times a pattern was found in, or missing from,
+     the cache of compiled patterns.
+   */
+  size_t cache_hits() const;
+  size_t cache_misses() const;
+
+  /**
+     Sets how many compiled patterns are cached. 0 turns the cache
+     off.
+   */
+  void set_cache_size(size_t size);
+
+  /**
+     Sets how many states a pattern's automaton may take to be made
+     deterministic, so that a search only follows one state of it at a
+     time. Patterns that would take more are searched as they are. 0
+     turns this off.
+   */
+  void set_dfa_states(size_t states);
+
+  /**
+     Reads a binary representation of a dictionary from a file. A file
+     given by name is mapped into memory rather than read, so it must
+     not be changed while the Dict uses it; \c write replaces a file
+     instead of changing it. If the file can't be read, the Dict is
+     left as it was.
      @returns \c true if the Dict was successfully read.
   */
   bool read(FILE* fin);
   bool read(const char* filename);
 
   /**
-     Writes a binary representation of a dictionary to a file.
+     Writes a binary representation of a dictionary to a file. A file
+     given by name is written under a temporary name and then renamed,
+     so that Dicts that have the old file mapped keep seeing it whole.
      @returns \c true if the Dict was successfully written.
   */
   bool write(FILE* fout) const;
@@ -149,6 +362,56 @@ public:
 
 private:
 
+  /// Where the sections of a Dict's file are, as found by \c find_sections.
+  struct Sections {
+    const FileHeader* header;
+    const freq_t* freqs;
+    const uint64_t* wordStarts;
+    const char* wordText;
+    const char* symbols;
+    const uint32_t* trie;
+  };
+
+  /// Rounds a section size up to a multiple of 8 bytes.
+  static inline uint64_t padded(uint64_t bytes) {
+    return (bytes + 7) & ~(uint64_t) 7;
+  }
+
+  /// Returns the size of the file that a header starts.
+  static uint64_t file_size(const FileHeader &header);
+
+  /**
+     Returns \c true if a header could start a Dict's file of at most
+     \c maxSize bytes.
+   */
+  static bool valid_header(const FileHeader &header, uint64_t maxSize);
+
+  /**
+     Finds the sections of a Dict's file in \c size bytes at \c
+     start, which must be 8-byte aligned.
+     @returns \c false if they aren't a whole, valid Dict.
+   */
+  static bool find_sections(const char* start, size_t size, Sections &sections);
+
+  /**
+     Makes the Dict search the file laid out at \c start, which is
+     held by \c image or by \c mapping.
+   */
+  void attach(const char* start, size_t size, const Sections &sections);
+
+  /// Lets go of the memory the Dict is searching.
+  void release();
+
+  /// Lays a Dict out in \c image from sorted words, and attaches it.
+  void build(const std::vector<DictEntry> &entries);
+
+  /// Returns the word with a given unique identifier.
+  inline DictEntry entry(uint32_t wordID) const {
+    return DictEntry(std::string(wordText + wordStarts[wordID],
+				 wordStarts[wordID + 1] - wordStarts[wordID]),
+		     freqs[wordID]);
+  }
+
   struct FitWordsState {
     uint_fast32_t graphNode; //< The state of the automaton.
     uint32_t trieNode;       //< The position in the dictionary trie.
@@ -161,13 +424,40 @@ private:
   typedef uint32_t WordFit;
   typedef std::vector<WordFit> WordFitVec;
 
+  /**
+     A state of one of the automata being searched for at once, in
+     \c fit_words_many.
+   */
+  struct ActiveState {
+    uint32_t pattern;        //< Which automaton this is a state of.
+    uint_fast32_t graphNode; //< The state of that automaton.
+
+    inline ActiveState() {}
+    inline ActiveState(uint32_t p, uint_fast32_t gn) :
+      pattern(p), graphNode(gn) {;}
+  };
+
+  /**
+     A position in the dictionary trie, and the range of the shared
+     state stack holding the automaton states that can be there.
+   */
+  struct FitManyState {
+    uint32_t trieNode;
+    size_t begin;
+    size_t end;
+
+    inline FitManyState() {}
+    inline FitManyState(uint32_t tn, size_t b, size_t e) :
+      trieNode(tn), begin(b), end(e) {;}
+  };
+
   struct freq_cmp {
     const Dict *dict;
     freq_cmp(const Dict *dict_ptr) :
       dict(dict_ptr) {;}
-    inline bool operator ()(const WordFit &a, const WordFit &b) {
-      freq_t f1 = dict->words[a].freq;
-      freq_t f2 = dict->words[b].freq;
+    inline bool operator ()(const WordFit &a, const WordFit &b) const {
+      freq_t f1 = dict->freqs[a];
+      freq_t f2 = dict->freqs[b];
       if (f1 != f2) {
 	return f1 > f2;
       } else {
@@ -176,8 +466,134 @@ private:
     }
   };
 
-  Dict::WordFitVec fit_words(const Automaton &automaton) const;
+  /**
+     A state of the automaton at a position in the trie, with the best
+     word at or below that position.
+   */
+  struct BoundState {
+    uint_fast32_t graphNode; //< The state of the automaton.
+    uint32_t trieNode;       //< The position in the dictionary trie.
+    WordFit best;            //< The best word under that position.
+    freq_t bound;            //< The frequency of that word.
+
+    inline BoundState() {}
+    inline BoundState(uint_fast32_t gn, uint32_t tn, WordFit b, freq_t f) :
+      graphNode(gn), trieNode(tn), best(b), bound(f) {;}
+
+    /// Returns true if this position could hold a better word than \c
+    /// word, which has frequency \c freq.
+    inline bool beats(WordFit word, freq_t freq) const {
+      return bound > freq || (bound == freq && best < word);
+    }
+  };
+
+  /**
+     Finds the \c k best words the automaton accepts, in the order of
+     \c freq_cmp, among the words whose first letter is in the bitmask
+     \c firstLetters.
+   */
+  Dict::WordFitVec best_fits(const Automaton &automaton, size_t k,
+			     SymbolSet firstLetters = ALL_SYMBOLS) const;
 
+  /**
+     Finds the words the automaton accepts, among the words whose
+     first letter is in the set \c firstLetters. The empty word is
+     only found when 'A' is in it.
+   */
+  Dict::WordFitVec fit_words(const Automaton &automaton,
+			     SymbolSet firstLetters = ALL_SYMBOLS) const;
+  std::vector<Dict::WordFitVec> fit_words_many(const std::vector<Automaton> &automata,
+					       bool bestOnly = false) const;
+  /**
+     Returns the automaton for a regular expression, from the cache
+     if it's there.
+   */
+  Automaton compile(const std::string &regex) const;
+  std::vector<Automaton> compile_many(const std::vector<std::string> &regexes) const;
+
+  /**
+     Returns the set of the symbols from \c first to \c last. A
+     character that isn't a symbol leaves that end of the range open.
+   */
+  static SymbolSet letter_range(char first, char last);
+
+  /**
+     Returns true if an automaton state whose remaining lengths are \c
+     lengths, as given by \c Automaton::remainingLengths, could accept
+     a word at a trie position whose words are \c depths further down,
+     as given by \c AMTrie::getDepths. The states a state reaches
+     through epsilon edges can't fit where it doesn't.
+   */
+  static inline bool can_fit(uint32_t lengths, uint32_t depths) {
+    return (lengths & 0xFFFF) <= (depths >> 16) &&
+      (lengths >> 16) >= (depths & 0xFFFF);
+  }
+
+};
+
+
+/**
+   An iterator over the words in a Dict that match a regular
+   expression, in alphabetical order. Matches are only searched for
+   as they are asked for, so a search can be stopped early.
+
+   The cursor walks the trie one position at a time, keeping the set
+   of automaton states that can be at each position. The Dict must
+   outlive the cursor.
+ */
+class GrepCursor {
+public:
+
+  /**
+     Starts a search of \c dict for words matching \c regex, among
+     the words whose first letter is in the bitmask \c firstLetters.
+   */
+  GrepCursor(const Dict &dict, std::string regex,
+	     SymbolSet firstLetters = ALL_SYMBOLS) throw (Automaton::SpecException);
+
+  /**
+     Returns the unique identifier of the next matching word, or 0 if
+     there are no more.
+   */
+  uint32_t nextWord();
+
+  /**
+     Returns up to \c n more matching words. Fewer words are returned
+     only when the search is finished.
+   */
+  std::vector<DictEntry> next(size_t n);
+
+private:
+
+  /**
+     A position in the dictionary trie, and the range of \c states
+     holding the automaton states that can be there.
+   */
+  struct Position {
+    uint32_t trieNode;
+    size_t begin;
+    size_t end;
+
+    inline Position() {}
+    inline Position(uint32_t tn, size_t b, size_t e) :
+      trieNode(tn), begin(b), end(e) {;}
+  };
+
+  const Dict &dict;
+  Automaton automaton;
+  std::vector<uint32_t> lengths; ///< The automaton's remainingLengths.
+  SymbolSet firstLetters;
+  std::vector<uint_fast32_t> states;
+  std::vector<Position> stack;
+  std::vector<uint32_t> seen; ///< seen[g] == stamp when state g has
+			      ///been added to the position being built.
+  uint32_t stamp;
+
+  /**
+     Adds a state to the end of \c states, followed by the states it
+     reaches through epsilon edges, unless it's already there.
+   */
+  void addState(uint_fast32_t graphNode);
 };
 
 
@@ -37,11 +37,9 @@
 #include "dyntrie.h"
 
 
-DynTrie::TrieNode::TrieNode(void) :
-  data(0) {
-  for(int i = 0; i < 26; ++i) {
-    next[i] = 0;
-  }
+DynTrie::TrieNode::TrieNode(uint8_t symbol_in, uint32_t sibling_in) :
+  data(0), child(0), sibling(sibling_in), symbol(symbol_in) {
+  ;
 }
 
 
@@ -58,12 +56,26 @@ void DynTrie::insert(const char* suffix, uint32_t data_in) {
       ++suffix;
       continue;
     }
-    CHECK('A' <= *suffix && *suffix <= 'Z');
-    if(slab[p].next[*suffix - 'A'] == 0) {
-      slab[p].next[*suffix - 'A'] = slab.size();
-      slab.push_back(TrieNode());
+    int symbol = symbolIndex(*suffix);
+    CHECK(symbol >= 0);
+    // find the child for this symbol, or the place to add it
+    uint32_t prev = 0;
+    uint32_t q = slab[p].child;
+    while(q != 0 && slab[q].symbol < symbol) {
+      prev = q;
+      q = slab[q].sibling;
+    }
+    if(q == 0 || slab[q].symbol != symbol) {
+      uint32_t added = slab.size();
+      slab.push_back(TrieNode(symbol, q));
+      if(prev == 0) {
+	slab[p].child = added;
+      } else {
+	slab[prev].sibling = added;
+      }
+      q = added;
     }
-    p = slab[p].next[*suffix - 'A'];
+    p = q;
     ++suffix;
   }
   CHECK(p < slab.size());
@@ -75,9 +87,14 @@ uint32_t DynTrie::lookup(const char* suffix) const {
   uint32_t p = 0;
   while(*suffix != '\0') {
     CHECK(p < slab.size());
-    CHECK('A' <= *suffix && *suffix <= 'Z');
-    if(slab[p].next[*suffix - 'A'] == 0) return 0;
-    p = slab[p].next[*suffix - 'A'];
+    int symbol = symbolIndex(*suffix);
+    CHECK(symbol >= 0);
+    uint32_t q = slab[p].child;
+    while(q != 0 && slab[q].symbol < symbol) {
+      q = slab[q].sibling;
+    }
+    if(q == 0 || slab[q].symbol != symbol) return 0;
+    p = q;
     ++suffix;
   }
   CHECK(p < slab.size());
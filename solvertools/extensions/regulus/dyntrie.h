@@ -36,23 +36,31 @@
 
 #include <vector>
 #include <stdint.h>
+#include "symbols.h"
 
 
 /**
    A space-inefficient implementation of a dynamic trie. The allowed
-   character set is A-Z (uppercase only). Each node stores a 32-bit
-   value.
+   character set is the symbols of \c symbols.h: uppercase A-Z and the
+   extra symbols. Spaces are skipped. Each node stores a 32-bit value.
  */
 class DynTrie {
   friend class AMTrie;
 private:
 
+  /**
+     A node, in the list of its parent's children. The children of a
+     node are kept in order of their symbols, since there can be as
+     many as 64 of them but there are usually only a few.
+   */
   class TrieNode {
   public:
     uint32_t data;
-    uint32_t next[26];
+    uint32_t child;   ///< The first child, or 0 if there are none.
+    uint32_t sibling; ///< The next child of the same parent, or 0.
+    uint8_t symbol;   ///< The symbol on the edge into this node.
 
-    TrieNode(void);
+    TrieNode(uint8_t symbol_in = 0, uint32_t sibling_in = 0);
   };
 
   std::vector<TrieNode> slab;
@@ -67,7 +75,7 @@ public:
      Finds the data associated with a given string.
 
      @requires \c suffix is a pointer to a null-terminated C string
-     comprising only uppercase letters.
+     comprising only symbols.
 
      @returns The data at the resulting node, or 0 if the node is not
      in the trie.
@@ -76,3 +76,16 @@ TEST(DynTrieTest, SimpleLookup) {
   EXPECT_EQ(0, trie.lookup("WITH"));
   EXPECT_EQ(0, trie.lookup("GUNS"));
 }
+
+TEST(DynTrieTest, ExtraSymbols) {
+  DynTrie trie;
+
+  trie.insert("NI\x80O", 5);
+  trie.insert("NINO", 6);
+  trie.insert("NI\x80", 7);
+
+  EXPECT_EQ(5, trie.lookup("NI\x80O"));
+  EXPECT_EQ(6, trie.lookup("NINO"));
+  EXPECT_EQ(7, trie.lookup("NI\x80"));
+  EXPECT_EQ(0, trie.lookup("NI\x81O"));
+}
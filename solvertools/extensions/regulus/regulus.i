@@ -22,6 +22,9 @@ typedef uint64_t freq_t;
 
 namespace std {
   %template(dictvector) vector<DictEntry>;
+  %template(dictvectorvector) vector<vector<DictEntry> >;
+  %template(stringvector) vector<string>;
+  %template(sizevector) vector<size_t>;
 };
 
 
@@ -37,6 +40,39 @@ namespace std {
     }
 }
 
+/*
+  Searching a Dict only reads it, so let other Python threads run while
+  a search is going on. A Dict must not be read into while it is being
+  searched.
+*/
+%define RELEASE_GIL(method)
+%exception method {
+    PyThreadState *_save = PyEval_SaveThread();
+    try {
+        $action
+    } catch(Automaton::SpecException &e) {
+        PyEval_RestoreThread(_save);
+        PyErr_SetString(PyExc_ValueError,e.what());
+        return NULL;
+    } catch(std::bad_alloc &) {
+        PyEval_RestoreThread(_save);
+        PyErr_NoMemory();
+        return NULL;
+    }
+    PyEval_RestoreThread(_save);
+}
+%enddef
+
+RELEASE_GIL(Dict::grep);
+RELEASE_GIL(Dict::grep_range);
+RELEASE_GIL(Dict::grep_freq_sorted);
+RELEASE_GIL(Dict::total_freq);
+RELEASE_GIL(Dict::best_match);
+RELEASE_GIL(Dict::grep_many);
+RELEASE_GIL(Dict::best_match_many);
+RELEASE_GIL(Dict::grep_limit);
+RELEASE_GIL(GrepCursor::next);
+
 /* automatically convert unicode to str */
 %typemap(in) std::string {
     char * ch = PyString_AsString($input);
@@ -71,14 +107,34 @@ class Dict {
 public:
 
   Dict() throw ();
-  Dict(std::vector<DictEntry> entries);
+  Dict(std::vector<DictEntry> entries, const std::string &symbols = "");
+  std::string get_symbols() const;
 
   bool read(const char* filename);
   bool write(const char* filename) const;
 
   std::vector<DictEntry> grep(std::string regex) const;
+  std::vector<DictEntry> grep_range(std::string regex, char first, char last) const;
+  std::vector<size_t> first_letter_counts() const;
+  std::vector<DictEntry> grep_limit(std::string regex, size_t limit, size_t offset,
+                                    bool byFreq, char first = 'A', char last = '\xa5') const;
   std::vector<DictEntry> grep_freq_sorted(std::string regex) const;
   freq_t total_freq(std::string regex) const;
   DictEntry best_match(std::string regex) const;
+  std::vector<std::vector<DictEntry> > grep_many(const std::vector<std::string> &regexes) const;
+  std::vector<DictEntry> best_match_many(const std::vector<std::string> &regexes) const;
+
+  size_t cache_hits() const;
+  size_t cache_misses() const;
+  void set_cache_size(size_t size);
+  void set_dfa_states(size_t states);
+
+};
+
+class GrepCursor {
+public:
+
+  GrepCursor(const Dict &dict, std::string regex);
+  std::vector<DictEntry> next(size_t n);
 
 };
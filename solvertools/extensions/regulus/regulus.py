@@ -0,0 +1,626 @@
+# This file was automatically generated by SWIG (https://www.swig.org).
+# Version 4.1.1
+#
+# Do not make changes to this file unless you know what you are doing - modify
+# the SWIG interface file instead.
+
+from sys import version_info as _swig_python_version_info
+# Import the low-level C/C++ module
+if __package__ or "." in __name__:
+    from . import _regulus
+else:
+    import _regulus
+
+try:
+    import builtins as __builtin__
+except ImportError:
+    import __builtin__
+
+def _swig_repr(self):
+    try:
+        strthis = "proxy of " + self.this.__repr__()
+    except __builtin__.Exception:
+        strthis = ""
+    return "<%s.%s; %s >" % (self.__class__.__module__, self.__class__.__name__, strthis,)
+
+
+def _swig_setattr_nondynamic_instance_variable(set):
+    def set_instance_attr(self, name, value):
+        if name == "this":
+            set(self, name, value)
+        elif name == "thisown":
+            self.this.own(value)
+        elif hasattr(self, name) and isinstance(getattr(type(self), name), property):
+            set(self, name, value)
+        else:
+            raise AttributeError("You cannot add instance attributes to %s" % self)
+    return set_instance_attr
+
+
+def _swig_setattr_nondynamic_class_variable(set):
+    def set_class_attr(cls, name, value):
+        if hasattr(cls, name) and not isinstance(getattr(cls, name), property):
+            set(cls, name, value)
+        else:
+            raise AttributeError("You cannot add class attributes to %s" % cls)
+    return set_class_attr
+
+
+def _swig_add_metaclass(metaclass):
+    """Class decorator for adding a metaclass to a SWIG wrapped class - a slimmed down version of six.add_metaclass"""
+    def wrapper(cls):
+        return metaclass(cls.__name__, cls.__bases__, cls.__dict__.copy())
+    return wrapper
+
+
+class _SwigNonDynamicMeta(type):
+    """Meta class to enforce nondynamic attributes (no new attributes) for a class"""
+    __setattr__ = _swig_setattr_nondynamic_class_variable(type.__setattr__)
+
+
+class SwigPyIterator(object):
+    thisown = property(lambda x: x.this.own(), lambda x, v: x.this.own(v), doc="The membership flag")
+
+    def __init__(self, *args, **kwargs):
+        raise AttributeError("No constructor defined - class is abstract")
+    __repr__ = _swig_repr
+    __swig_destroy__ = _regulus.delete_SwigPyIterator
+
+    def value(self):
+        return _regulus.SwigPyIterator_value(self)
+
+    def incr(self, n=1):
+        return _regulus.SwigPyIterator_incr(self, n)
+
+    def decr(self, n=1):
+        return _regulus.SwigPyIterator_decr(self, n)
+
+    def distance(self, x):
+        return _regulus.SwigPyIterator_distance(self, x)
+
+    def equal(self, x):
+        return _regulus.SwigPyIterator_equal(self, x)
+
+    def copy(self):
+        return _regulus.SwigPyIterator_copy(self)
+
+    def next(self):
+        return _regulus.SwigPyIterator_next(self)
+
+    def __next__(self):
+        return _regulus.SwigPyIterator___next__(self)
+
+    def previous(self):
+        return _regulus.SwigPyIterator_previous(self)
+
+    def advance(self, n):
+        return _regulus.SwigPyIterator_advance(self, n)
+
+    def __eq__(self, x):
+        return _regulus.SwigPyIterator___eq__(self, x)
+
+    def __ne__(self, x):
+        return _regulus.SwigPyIterator___ne__(self, x)
+
+    def __iadd__(self, n):
+        return _regulus.SwigPyIterator___iadd__(self, n)
+
+    def __isub__(self, n):
+        return _regulus.SwigPyIterator___isub__(self, n)
+
+    def __add__(self, n):
+        return _regulus.SwigPyIterator___add__(self, n)
+
+    def __sub__(self, *args):
+        return _regulus.SwigPyIterator___sub__(self, *args)
+    def __iter__(self):
+        return self
+
+# Register SwigPyIterator in _regulus:
+_regulus.SwigPyIterator_swigregister(SwigPyIterator)
+class dictvector(object):
+    thisown = property(lambda x: x.this.own(), lambda x, v: x.this.own(v), doc="The membership flag")
+    __repr__ = _swig_repr
+
+    def iterator(self):
+        return _regulus.dictvector_iterator(self)
+    def __iter__(self):
+        return self.iterator()
+
+    def __nonzero__(self):
+        return _regulus.dictvector___nonzero__(self)
+
+    def __bool__(self):
+        return _regulus.dictvector___bool__(self)
+
+    def __len__(self):
+        return _regulus.dictvector___len__(self)
+
+    def __getslice__(self, i, j):
+        return _regulus.dictvector___getslice__(self, i, j)
+
+    def __setslice__(self, *args):
+        return _regulus.dictvector___setslice__(self, *args)
+
+    def __delslice__(self, i, j):
+        return _regulus.dictvector___delslice__(self, i, j)
+
+    def __delitem__(self, *args):
+        return _regulus.dictvector___delitem__(self, *args)
+
+    def __getitem__(self, *args):
+        return _regulus.dictvector___getitem__(self, *args)
+
+    def __setitem__(self, *args):
+        return _regulus.dictvector___setitem__(self, *args)
+
+    def pop(self):
+        return _regulus.dictvector_pop(self)
+
+    def append(self, x):
+        return _regulus.dictvector_append(self, x)
+
+    def empty(self):
+        return _regulus.dictvector_empty(self)
+
+    def size(self):
+        return _regulus.dictvector_size(self)
+
+    def swap(self, v):
+        return _regulus.dictvector_swap(self, v)
+
+    def begin(self):
+        return _regulus.dictvector_begin(self)
+
+    def end(self):
+        return _regulus.dictvector_end(self)
+
+    def rbegin(self):
+        return _regulus.dictvector_rbegin(self)
+
+    def rend(self):
+        return _regulus.dictvector_rend(self)
+
+    def clear(self):
+        return _regulus.dictvector_clear(self)
+
+    def get_allocator(self):
+        return _regulus.dictvector_get_allocator(self)
+
+    def pop_back(self):
+        return _regulus.dictvector_pop_back(self)
+
+    def erase(self, *args):
+        return _regulus.dictvector_erase(self, *args)
+
+    def __init__(self, *args):
+        _regulus.dictvector_swiginit(self, _regulus.new_dictvector(*args))
+
+    def push_back(self, x):
+        return _regulus.dictvector_push_back(self, x)
+
+    def front(self):
+        return _regulus.dictvector_front(self)
+
+    def back(self):
+        return _regulus.dictvector_back(self)
+
+    def assign(self, n, x):
+        return _regulus.dictvector_assign(self, n, x)
+
+    def resize(self, *args):
+        return _regulus.dictvector_resize(self, *args)
+
+    def insert(self, *args):
+        return _regulus.dictvector_insert(self, *args)
+
+    def reserve(self, n):
+        return _regulus.dictvector_reserve(self, n)
+
+    def capacity(self):
+        return _regulus.dictvector_capacity(self)
+    __swig_destroy__ = _regulus.delete_dictvector
+
+# Register dictvector in _regulus:
+_regulus.dictvector_swigregister(dictvector)
+class dictvectorvector(object):
+    thisown = property(lambda x: x.this.own(), lambda x, v: x.this.own(v), doc="The membership flag")
+    __repr__ = _swig_repr
+
+    def iterator(self):
+        return _regulus.dictvectorvector_iterator(self)
+    def __iter__(self):
+        return self.iterator()
+
+    def __nonzero__(self):
+        return _regulus.dictvectorvector___nonzero__(self)
+
+    def __bool__(self):
+        return _regulus.dictvectorvector___bool__(self)
+
+    def __len__(self):
+        return _regulus.dictvectorvector___len__(self)
+
+    def __getslice__(self, i, j):
+        return _regulus.dictvectorvector___getslice__(self, i, j)
+
+    def __setslice__(self, *args):
+        return _regulus.dictvectorvector___setslice__(self, *args)
+
+    def __delslice__(self, i, j):
+        return _regulus.dictvectorvector___delslice__(self, i, j)
+
+    def __delitem__(self, *args):
+        return _regulus.dictvectorvector___delitem__(self, *args)
+
+    def __getitem__(self, *args):
+        return _regulus.dictvectorvector___getitem__(self, *args)
+
+    def __setitem__(self, *args):
+        return _regulus.dictvectorvector___setitem__(self, *args)
+
+    def pop(self):
+        return _regulus.dictvectorvector_pop(self)
+
+    def append(self, x):
+        return _regulus.dictvectorvector_append(self, x)
+
+    def empty(self):
+        return _regulus.dictvectorvector_empty(self)
+
+    def size(self):
+        return _regulus.dictvectorvector_size(self)
+
+    def swap(self, v):
+        return _regulus.dictvectorvector_swap(self, v)
+
+    def begin(self):
+        return _regulus.dictvectorvector_begin(self)
+
+    def end(self):
+        return _regulus.dictvectorvector_end(self)
+
+    def rbegin(self):
+        return _regulus.dictvectorvector_rbegin(self)
+
+    def rend(self):
+        return _regulus.dictvectorvector_rend(self)
+
+    def clear(self):
+        return _regulus.dictvectorvector_clear(self)
+
+    def get_allocator(self):
+        return _regulus.dictvectorvector_get_allocator(self)
+
+    def pop_back(self):
+        return _regulus.dictvectorvector_pop_back(self)
+
+    def erase(self, *args):
+        return _regulus.dictvectorvector_erase(self, *args)
+
+    def __init__(self, *args):
+        _regulus.dictvectorvector_swiginit(self, _regulus.new_dictvectorvector(*args))
+
+    def push_back(self, x):
+        return _regulus.dictvectorvector_push_back(self, x)
+
+    def front(self):
+        return _regulus.dictvectorvector_front(self)
+
+    def back(self):
+        return _regulus.dictvectorvector_back(self)
+
+    def assign(self, n, x):
+        return _regulus.dictvectorvector_assign(self, n, x)
+
+    def resize(self, *args):
+        return _regulus.dictvectorvector_resize(self, *args)
+
+    def insert(self, *args):
+        return _regulus.dictvectorvector_insert(self, *args)
+
+    def reserve(self, n):
+        return _regulus.dictvectorvector_reserve(self, n)
+
+    def capacity(self):
+        return _regulus.dictvectorvector_capacity(self)
+    __swig_destroy__ = _regulus.delete_dictvectorvector
+
+# Register dictvectorvector in _regulus:
+_regulus.dictvectorvector_swigregister(dictvectorvector)
+class stringvector(object):
+    thisown = property(lambda x: x.this.own(), lambda x, v: x.this.own(v), doc="The membership flag")
+    __repr__ = _swig_repr
+
+    def iterator(self):
+        return _regulus.stringvector_iterator(self)
+    def __iter__(self):
+        return self.iterator()
+
+    def __nonzero__(self):
+        return _regulus.stringvector___nonzero__(self)
+
+    def __bool__(self):
+        return _regulus.stringvector___bool__(self)
+
+    def __len__(self):
+        return _regulus.stringvector___len__(self)
+
+    def __getslice__(self, i, j):
+        return _regulus.stringvector___getslice__(self, i, j)
+
+    def __setslice__(self, *args):
+        return _regulus.stringvector___setslice__(self, *args)
+
+    def __delslice__(self, i, j):
+        return _regulus.stringvector___delslice__(self, i, j)
+
+    def __delitem__(self, *args):
+        return _regulus.stringvector___delitem__(self, *args)
+
+    def __getitem__(self, *args):
+        return _regulus.stringvector___getitem__(self, *args)
+
+    def __setitem__(self, *args):
+        return _regulus.stringvector___setitem__(self, *args)
+
+    def pop(self):
+        return _regulus.stringvector_pop(self)
+
+    def append(self, x):
+        return _regulus.stringvector_append(self, x)
+
+    def empty(self):
+        return _regulus.stringvector_empty(self)
+
+    def size(self):
+        return _regulus.stringvector_size(self)
+
+    def swap(self, v):
+        return _regulus.stringvector_swap(self, v)
+
+    def begin(self):
+        return _regulus.stringvector_begin(self)
+
+    def end(self):
+        return _regulus.stringvector_end(self)
+
+    def rbegin(self):
+        return _regulus.stringvector_rbegin(self)
+
+    def rend(self):
+        return _regulus.stringvector_rend(self)
+
+    def clear(self):
+        return _regulus.stringvector_clear(self)
+
+    def get_allocator(self):
+        return _regulus.stringvector_get_allocator(self)
+
+    def pop_back(self):
+        return _regulus.stringvector_pop_back(self)
+
+    def erase(self, *args):
+        return _regulus.stringvector_erase(self, *args)
+
+    def __init__(self, *args):
+        _regulus.stringvector_swiginit(self, _regulus.new_stringvector(*args))
+
+    def push_back(self, x):
+        return _regulus.stringvector_push_back(self, x)
+
+    def front(self):
+        return _regulus.stringvector_front(self)
+
+    def back(self):
+        return _regulus.stringvector_back(self)
+
+    def assign(self, n, x):
+        return _regulus.stringvector_assign(self, n, x)
+
+    def resize(self, *args):
+        return _regulus.stringvector_resize(self, *args)
+
+    def insert(self, *args):
+        return _regulus.stringvector_insert(self, *args)
+
+    def reserve(self, n):
+        return _regulus.stringvector_reserve(self, n)
+
+    def capacity(self):
+        return _regulus.stringvector_capacity(self)
+    __swig_destroy__ = _regulus.delete_stringvector
+
+# Register stringvector in _regulus:
+_regulus.stringvector_swigregister(stringvector)
+class sizevector(object):
+    thisown = property(lambda x: x.this.own(), lambda x, v: x.this.own(v), doc="The membership flag")
+    __repr__ = _swig_repr
+
+    def iterator(self):
+        return _regulus.sizevector_iterator(self)
+    def __iter__(self):
+        return self.iterator()
+
+    def __nonzero__(self):
+        return _regulus.sizevector___nonzero__(self)
+
+    def __bool__(self):
+        return _regulus.sizevector___bool__(self)
+
+    def __len__(self):
+        return _regulus.sizevector___len__(self)
+
+    def __getslice__(self, i, j):
+        return _regulus.sizevector___getslice__(self, i, j)
+
+    def __setslice__(self, *args):
+        return _regulus.sizevector___setslice__(self, *args)
+
+    def __delslice__(self, i, j):
+        return _regulus.sizevector___delslice__(self, i, j)
+
+    def __delitem__(self, *args):
+        return _regulus.sizevector___delitem__(self, *args)
+
+    def __getitem__(self, *args):
+        return _regulus.sizevector___getitem__(self, *args)
+
+    def __setitem__(self, *args):
+        return _regulus.sizevector___setitem__(self, *args)
+
+    def pop(self):
+        return _regulus.sizevector_pop(self)
+
+    def append(self, x):
+        return _regulus.sizevector_append(self, x)
+
+    def empty(self):
+        return _regulus.sizevector_empty(self)
+
+    def size(self):
+        return _regulus.sizevector_size(self)
+
+    def swap(self, v):
+        return _regulus.sizevector_swap(self, v)
+
+    def begin(self):
+        return _regulus.sizevector_begin(self)
+
+    def end(self):
+        return _regulus.sizevector_end(self)
+
+    def rbegin(self):
+        return _regulus.sizevector_rbegin(self)
+
+    def rend(self):
+        return _regulus.sizevector_rend(self)
+
+    def clear(self):
+        return _regulus.sizevector_clear(self)
+
+    def get_allocator(self):
+        return _regulus.sizevector_get_allocator(self)
+
+    def pop_back(self):
+        return _regulus.sizevector_pop_back(self)
+
+    def erase(self, *args):
+        return _regulus.sizevector_erase(self, *args)
+
+    def __init__(self, *args):
+        _regulus.sizevector_swiginit(self, _regulus.new_sizevector(*args))
+
+    def push_back(self, x):
+        return _regulus.sizevector_push_back(self, x)
+
+    def front(self):
+        return _regulus.sizevector_front(self)
+
+    def back(self):
+        return _regulus.sizevector_back(self)
+
+    def assign(self, n, x):
+        return _regulus.sizevector_assign(self, n, x)
+
+    def resize(self, *args):
+        return _regulus.sizevector_resize(self, *args)
+
+    def insert(self, *args):
+        return _regulus.sizevector_insert(self, *args)
+
+    def reserve(self, n):
+        return _regulus.sizevector_reserve(self, n)
+
+    def capacity(self):
+        return _regulus.sizevector_capacity(self)
+    __swig_destroy__ = _regulus.delete_sizevector
+
+# Register sizevector in _regulus:
+_regulus.sizevector_swigregister(sizevector)
+class DictEntry(object):
+    thisown = property(lambda x: x.this.own(), lambda x, v: x.this.own(v), doc="The membership flag")
+    word = property(_regulus.DictEntry_word_get, _regulus.DictEntry_word_set)
+    freq = property(_regulus.DictEntry_freq_get, _regulus.DictEntry_freq_set)
+
+    def __init__(self, *args):
+        _regulus.DictEntry_swiginit(self, _regulus.new_DictEntry(*args))
+
+    def __repr__(self):
+        return _regulus.DictEntry___repr__(self)
+    __swig_destroy__ = _regulus.delete_DictEntry
+
+# Register DictEntry in _regulus:
+_regulus.DictEntry_swigregister(DictEntry)
+class Dict(object):
+    thisown = property(lambda x: x.this.own(), lambda x, v: x.this.own(v), doc="The membership flag")
+    __repr__ = _swig_repr
+
+    def __init__(self, *args):
+        _regulus.Dict_swiginit(self, _regulus.new_Dict(*args))
+
+    def get_symbols(self):
+        return _regulus.Dict_get_symbols(self)
+
+    def read(self, filename):
+        return _regulus.Dict_read(self, filename)
+
+    def write(self, filename):
+        return _regulus.Dict_write(self, filename)
+
+    def grep(self, regex):
+        return _regulus.Dict_grep(self, regex)
+
+    def grep_range(self, regex, first, last):
+        return _regulus.Dict_grep_range(self, regex, first, last)
+
+    def first_letter_counts(self):
+        return _regulus.Dict_first_letter_counts(self)
+
+    def grep_limit(self, *args):
+        return _regulus.Dict_grep_limit(self, *args)
+
+    def grep_freq_sorted(self, regex):
+        return _regulus.Dict_grep_freq_sorted(self, regex)
+
+    def total_freq(self, regex):
+        return _regulus.Dict_total_freq(self, regex)
+
+    def best_match(self, regex):
+        return _regulus.Dict_best_match(self, regex)
+
+    def grep_many(self, regexes):
+        return _regulus.Dict_grep_many(self, regexes)
+
+    def best_match_many(self, regexes):
+        return _regulus.Dict_best_match_many(self, regexes)
+
+    def cache_hits(self):
+        return _regulus.Dict_cache_hits(self)
+
+    def cache_misses(self):
+        return _regulus.Dict_cache_misses(self)
+
+    def set_cache_size(self, size):
+        return _regulus.Dict_set_cache_size(self, size)
+
+    def set_dfa_states(self, states):
+        return _regulus.Dict_set_dfa_states(self, states)
+    __swig_destroy__ = _regulus.delete_Dict
+
+# Register Dict in _regulus:
+_regulus.Dict_swigregister(Dict)
+class GrepCursor(object):
+    thisown = property(lambda x: x.this.own(), lambda x, v: x.this.own(v), doc="The membership flag")
+    __repr__ = _swig_repr
+
+    def __init__(self, dict, regex):
+        _regulus.GrepCursor_swiginit(self, _regulus.new_GrepCursor(dict, regex))
+
+    def next(self, n):
+        return _regulus.GrepCursor_next(self, n)
+    __swig_destroy__ = _regulus.delete_GrepCursor
+
+# Register GrepCursor in _regulus:
+_regulus.GrepCursor_swigregister(GrepCursor)
+
@@ -0,0 +1,104 @@
+/*
+# Copyright (c) 2010, Alex Schwendner
+# All rights reserved.
+# 
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above
+#       copyright notice, this list of conditions and the following
+#       disclaimer in the documentation and/or other materials
+#       provided with the distribution.
+#     * Neither the name of the Manic Sages nor the names of its
+#       contributors may be used to endorse or promote products
+#       derived from this software without specific prior written
+#       permission.
+# 
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+*/
+
+#ifndef __SYMBOLS_DOT_H_INCLUDED__
+#define __SYMBOLS_DOT_H_INCLUDED__
+
+#include <stdint.h>
+
+
+/*
+  The alphabet that words and patterns are spelled in. It has the
+  letters A-Z, which are symbols 0-25, and up to 38 extra symbols,
+  which are the bytes 0x80-0xA5. What the extra symbols stand for is
+  up to whoever builds the Dict, which keeps a note of it (see \c
+  Dict::get_symbols), so that a wordlist in another alphabet can be
+  searched without turning it into A-Z first.
+
+  A set of symbols is a 64-bit mask, with bit \a i set for symbol \a
+  i.
+ */
+
+typedef uint64_t SymbolSet;
+
+static const int NUM_LETTERS = 26;  ///< The number of letters A-Z.
+static const int NUM_SYMBOLS = 64;  ///< The number of symbols.
+static const unsigned char FIRST_EXTRA_SYMBOL = 0x80; ///< The byte
+						      ///for symbol 26.
+
+/// The set of all the symbols.
+static const SymbolSet ALL_SYMBOLS = ~(SymbolSet) 0;
+
+/// The byte for the last symbol.
+static const char LAST_SYMBOL = (char) 0xA5;
+
+/// Returns the symbol for an uppercase letter or an extra symbol's
+/// byte, or -1 if the character isn't one.
+inline int symbolIndex(char c) {
+  unsigned char u = c;
+  if('A' <= u && u <= 'Z') return(u - 'A');
+  if(FIRST_EXTRA_SYMBOL <= u &&
+     u < FIRST_EXTRA_SYMBOL + NUM_SYMBOLS - NUM_LETTERS) {
+    return(u - FIRST_EXTRA_SYMBOL + NUM_LETTERS);
+  }
+  return(-1);
+}
+
+/// Returns the character for a symbol.
+inline char symbolChar(int symbol) {
+  if(symbol < NUM_LETTERS) return('A' + symbol);
+  return(FIRST_EXTRA_SYMBOL + symbol - NUM_LETTERS);
+}
+
+/// Returns the set holding just one symbol.
+inline SymbolSet symbolBit(int symbol) {
+  return((SymbolSet) 1 << symbol);
+}
+
+/// Returns the lowest symbol in a nonempty set.
+inline int lowestSymbol(SymbolSet set) {
+  return(__builtin_ctzll(set));
+}
+
+/// Returns the highest symbol in a nonempty set.
+inline int highestSymbol(SymbolSet set) {
+  return(63 - __builtin_clzll(set));
+}
+
+/// Returns how many symbols in a set come before \c symbol.
+inline int symbolRank(SymbolSet set, int symbol) {
+  return(__builtin_popcountll(set & (symbolBit(symbol) - 1)));
+}
+
+
+#endif /*__SYMBOLS_DOT_H_INCLUDED__*/
@@ -0,0 +1,188 @@
+"""
+`solvertools.manifest` keeps track of what the files in `data/pickle` were
+built from, so that they can be rebuilt when that changes, and only then.
+
+Every derived file, such as a wordlist table or a Regulus index, gets a small
+JSON manifest next to it. The manifest records the size, modification time,
+and SHA-1 hash of each source file, and a fingerprint of the code that turned
+the sources into the derived file:
+
+    >>> import os, tempfile
+    >>> source = os.path.join(tempfile.mkdtemp(), 'words.txt')
+    >>> artifact = source + '.table'
+    >>> for filename in (source, artifact):
+    ...     open(filename, 'w').write('DUCK\\n')
+    >>> write_manifest(artifact, stamp_sources([source]), 'v1')
+    >>> is_fresh(artifact, [source], 'v1')
+    True
+    >>> is_fresh(artifact, [source], 'v2')
+    False
+    >>> open(source, 'a').write('GOOSE\\n')
+    >>> is_fresh(artifact, [source], 'v1')
+    False
+
+A source file whose modification time changed is only hashed again if its
+size stayed the same, and it still counts as fresh if its contents didn't
+change.
+"""
+
+from __future__ import with_statement
+import hashlib, json, os, types
+
+MANIFEST_EXTENSION = '.manifest'
+
+# The types of global constants that are fingerprinted by their repr().
+_CONSTANT_TYPES = (str, unicode, tuple, int, long, frozenset)
+
+def manifest_name(artifact):
+    "The filename of the manifest for a derived file."
+    return artifact + MANIFEST_EXTENSION
+
+def code_fingerprint(*funcs):
+    """
+    Make a fingerprint of the code of some functions, which changes when
+    their code changes.
+
+    Other functions from `solvertools` that they refer to by name, such as
+    the helpers that a convert function calls, are included too, and so are
+    the constants they use, such as translation tables. Cached functions are
+    fingerprinted by the function they wrap.
+    """
+    hasher = hashlib.sha1()
+    seen = set()
+    for func in funcs:
+        _hash_function(func, hasher, seen)
+    return hasher.hexdigest()
+
+def _hash_function(func, hasher, seen):
+    "Add a function, and the functions it uses, to a fingerprint."
+    func = getattr(func, '__wrapped__', func)
+    if func in seen:
+        return
+    seen.add(func)
+    code = getattr(func, 'func_code', None)
+    if code is None:
+        # A builtin or a class: all we can go by is its name.
+        hasher.update(repr(getattr(func, '__name__', func)))
+        return
+    names = set()
+    _hash_code(code, hasher, names)
+    ours = _is_ours(func)
+    for name in sorted(names):
+        _hash_reference(func.func_globals.get(name), hasher, seen, ours)
+    for cell in func.func_closure or ():
+        _hash_reference(cell.cell_contents, hasher, seen, ours)
+
+def _hash_code(code, hasher, names):
+    """
+    Add a code object, including any functions defined inside it, to a
+    fingerprint, and collect the global names it uses.
+    """
+    hasher.update(code.co_code)
+    hasher.update(repr(code.co_names))
+    names.update(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _hash_code(const, hasher, names)
+        else:
+            hasher.update(repr(const))
+
+def _is_ours(value):
+    "Check whether a function comes from `solvertools`."
+    return (getattr(value, '__module__', None) or '').startswith('solvertools')
+
+def _hash_reference(value, hasher, seen, ours):
+    """
+    Add a function or constant that another function refers to, if it's one
+    of ours. Constants don't know their module, so they count as ours when
+    the function that refers to them is.
+    """
+    if isinstance(value, _CONSTANT_TYPES):
+        if ours:
+            hasher.update(repr(value))
+    elif (isinstance(value, types.FunctionType) or
+          hasattr(value, '__wrapped__')):
+        if _is_ours(value):
+            _hash_function(value, hasher, seen)
+
+def _sha1_file(filename):
+    "Get the SHA-1 hash of a file's contents."
+    hasher = hashlib.sha1()
+    with open(filename, 'rb') as infile:
+        while True:
+            block = infile.read(1 << 20)
+            if not block:
+                break
+            hasher.update(block)
+    return hasher.hexdigest()
+
+def stamp_sources(sources):
+    """
+    Describe the current state of some source files, to be saved in a
+    manifest. Do this before reading the sources, so that a source that
+    changes while it's being read looks stale afterward.
+    """
+    stamps = []
+    for source in sources:
+        stat = os.stat(source)
+        stamps.append({'path': os.path.basename(source),
+                       'size': stat.st_size,
+                       'mtime': stat.st_mtime,
+                       'sha1': _sha1_file(source)})
+    return stamps
+
+def write_manifest(artifact, stamps, code):
+    """
+    Record that a derived file was built from sources in the state described
+    by `stamps`, by code with the fingerprint `code`.
+    """
+    manifest = {'sources': stamps, 'code': code}
+    tempname = manifest_name(artifact) + '.%d.tmp' % os.getpid()
+    with open(tempname, 'w') as out:
+        json.dump(manifest, out, indent=2, sort_keys=True)
+    os.rename(tempname, manifest_name(artifact))
+
+def read_manifest(artifact):
+    "Read the manifest of a derived file, or return None if there isn't one."
+    try:
+        with open(manifest_name(artifact)) as infile:
+            return json.load(infile)
+    except (IOError, ValueError):
+        return None
+
+def is_fresh(artifact, sources, code):
+    """
+    Check whether a derived file exists and is up to date with its sources
+    and the code that builds it.
+
+    If a source file is missing, the derived file can't be rebuilt, so it's
+    used as it is.
+    """
+    if not os.path.exists(artifact):
+        return False
+    if not all(os.path.exists(source) for source in sources):
+        return True
+    manifest = read_manifest(artifact)
+    if manifest is None or manifest.get('code') != code:
+        return False
+    stamps = manifest.get('sources', [])
+    if len(stamps) != len(sources):
+        return False
+    touched = False
+    for source, stamp in zip(sources, stamps):
+        stat = os.stat(source)
+        if stat.st_size != stamp['size']:
+            return False
+        if stat.st_mtime != stamp['mtime']:
+            if _sha1_file(source) != stamp['sha1']:
+                return False
+            stamp['mtime'] = stat.st_mtime
+            touched = True
+    if touched:
+        # Only the modification time changed. Remember the new one, so the
+        # file doesn't have to be hashed again next time.
+        try:
+            write_manifest(artifact, stamps, code)
+        except (IOError, OSError):
+            pass
+    return True
@@ -10,6 +10,7 @@ from solvertools.model.numbers import number_logprob, is_numeric
 from solvertools.model.answer_reader import answer_reader
 from solvertools.util import load_pickle, save_pickle, get_picklefile, \
                              file_exists
+from solvertools.manifest import is_fresh, stamp_sources, write_manifest
 from solvertools.regex import is_regex, regex_pieces, regex_sequence
 from solvertools import wordlist
 import random, string, logging
@@ -48,9 +49,15 @@ class WordListModel(LanguageModel):
     version = 4
     def __init__(self, name, wordlist):
         pickle_name = '%s.model.%s.pickle' % (name, self.version)
-        if file_exists(get_picklefile(pickle_name)):
+        # The model is out of date if its wordlist's source or code changed.
+        sources = [wordlist.source_file()]
+        code = '%s:%s' % (self.version, wordlist.fingerprint())
+        if is_fresh(get_picklefile(pickle_name), sources, code):
             self._load_from_pickle(pickle_name)
         else:
+            stamps = None
+            if file_exists(sources[0]):
+                stamps = stamp_sources(sources)
             self.wordlist = wordlist
             letter_freq = FreqDist()        # letter unigram frequencies
             bigram_freq = FreqDist()        # letter bigram frequencies
@@ -71,6 +78,8 @@ class WordListModel(LanguageModel):
             self.word_dist = LaplaceProbDist(word_freq)
             
             self._save_pickle(pickle_name)
+            if stamps is not None:
+                write_manifest(get_picklefile(pickle_name), stamps, code)
         
     def _load_from_pickle(self, filename):
         logger.info('Loading %s' % filename)
@@ -123,19 +132,35 @@ class WordListModel(LanguageModel):
         given its appearance in a wordlist. Returns the matched word and its
         log probability as a tuple.
         """
-        if is_regex(word):
-            word, freq = self.wordlist.best_match(word)
-            word = unicode(word)
-            if not word:
-                return (u'#', MINIMUM_LOGPROB)
+        return self.word_match_logprobs([word])[0]
 
-        if is_numeric(word):
-            return (word, number_logprob(int(word)))
-        else:
-            if word in self.wordlist:
-                return (word, self.word_dist.logprob(self.wordlist.convert(word)))
-            elif word not in self.wordlist:
-                return (u'#', MINIMUM_LOGPROB)
+    def word_match_logprobs(self, words):
+        """
+        Get the matched word and log probability of each of several words or
+        regexes, as :meth:`word_match_logprob` does. The regexes are all
+        matched in a single search of the wordlist.
+        """
+        regexes = [word for word in words if is_regex(word)]
+        matches = {}
+        if regexes:
+            matches = dict(zip(regexes,
+                               self.wordlist.best_match_many(regexes)))
+        results = []
+        for word in words:
+            if is_regex(word):
+                word = unicode(matches[word][0])
+                if not word:
+                    results.append((u'#', MINIMUM_LOGPROB))
+                    continue
+
+            if is_numeric(word):
+                results.append((word, number_logprob(int(word))))
+            elif word in self.wordlist:
+                results.append((word, self.word_dist.logprob(
+                    self.wordlist.convert(word))))
+            else:
+                results.append((u'#', MINIMUM_LOGPROB))
+        return results
 
     def split_words(self, text):
         """
@@ -157,12 +182,18 @@ class WordListModel(LanguageModel):
 
         best_matches[0] = u''
         best_logprobs[0] = 0.0
+
+        # Match every span of the text at once, so that the wordlist only has
+        # to be searched once.
+        spans = [(left, right) for right in xrange(1, textlen+1)
+                 for left in xrange(right)]
+        span_matches = dict(zip(spans, self.word_match_logprobs(
+            [regex_sequence(pieces[left:right]) for left, right in spans])))
         for right in xrange(1, textlen+1):
             for left in xrange(right):
                 left_text = best_matches[left]
                 left_logprob = best_logprobs[left]
-                right_text = regex_sequence(pieces[left:right])
-                right_match, right_logprob = self.word_match_logprob(right_text)
+                right_match, right_logprob = span_matches[left, right]
                 if left_text != u'':
                     combined_text = left_text + u' ' + right_match
                     combined_logprob = (left_logprob + right_logprob
@@ -0,0 +1,258 @@
+"""
+`solvertools.pattern_search` finds the words in a word table that match a
+pattern, without the Regulus extension. A :class:`Wordlist` falls back on it
+when Regulus isn't built, so it answers the same queries as a Regulus `Dict`,
+with results that have the same `word` and `freq` attributes.
+
+The words are grouped by length, and each group is kept as a matrix of
+letters with a row for each word and a column for each position. A pattern
+made only of letters, dots and character classes, such as `.U..E..F.....`,
+fixes the length of its matches and which letters can be in each position,
+so its matches are found by looking each column up in a table of the letters
+it allows:
+
+    >>> import os, tempfile
+    >>> from solvertools.wordtable import WordTable, write_table
+    >>> filename = os.path.join(tempfile.mkdtemp(), 'example.table')
+    >>> write_table(filename, {u'DUCK': 3, u'DOCK': 2, u'DUNK': 1,
+    ...                        u'GOOSE': 2})
+    >>> search = PatternSearch(WordTable(filename))
+    >>> [match.word for match in search.grep('D[OU]CK')]
+    [u'DOCK', u'DUCK']
+
+Other patterns are narrowed down in the same way by the letters they start
+and end with, and only the words that are left are checked with the `re`
+module:
+
+    >>> search.best_match('.*O.*')
+    Match(word=u'DOCK', freq=2)
+
+As in Regulus, matching ignores spaces in the words and case in the
+patterns, and `.` matches any symbol. Words in other alphabets are spelled
+in Regulus' extra symbols by the `key` that the search is given, as a
+:class:`solvertools.symbol_table.SymbolTable` does.
+"""
+
+from collections import namedtuple
+from solvertools.util import lru_cache
+from solvertools.symbol_table import NUM_SYMBOLS, LAST_SYMBOL, symbol_index
+import numpy as np
+import heapq, re, sre_constants, sre_parse
+
+Match = namedtuple('Match', 'word freq')
+NO_MATCH = Match('', 0)
+
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+def _letter_set(op, value):
+    """
+    Get a table of the letters that a single-character piece of a parsed
+    pattern allows, or None if the piece can match more or less than one
+    character.
+    """
+    allowed = np.zeros((26,), dtype=bool)
+    if op == 'any':
+        allowed[:] = True
+    elif op == 'literal':
+        char = unichr(value).upper()
+        if char in LETTERS:
+            allowed[LETTERS.index(char)] = True
+    elif op == 'in':
+        negate = False
+        for item_op, item in value:
+            if item_op == 'negate':
+                negate = True
+            elif item_op == 'literal':
+                allowed |= _letter_set('literal', item)
+            elif item_op == 'range':
+                for code in xrange(item[0], item[1] + 1):
+                    allowed |= _letter_set('literal', code)
+            else:
+                return None
+        if negate:
+            allowed = ~allowed
+    else:
+        return None
+    return allowed
+
+@lru_cache(1000)
+def _compile(pattern):
+    """
+    Work out how to search for a pattern: the range of lengths it can match,
+    the tables of the letters it allows at the start and at the end of a
+    word, a compiled regex for checking the rest, and whether the tables
+    say everything, so that the regex isn't needed.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+        regex = re.compile('(?:%s)\\Z' % pattern, re.IGNORECASE)
+    except sre_constants.error, e:
+        raise ValueError("Invalid pattern %r: %s" % (pattern, e))
+    pieces = [_letter_set(op, value) for op, value in parsed]
+    simple = [allowed is not None for allowed in pieces]
+    if all(simple):
+        return len(pieces), len(pieces), pieces, [], regex, True
+    leading = pieces[:simple.index(False)]
+    trailing = pieces[::-1][:simple[::-1].index(False)]
+    shortest, longest = parsed.getwidth()
+    return shortest, longest, leading, trailing, regex, False
+
+class PatternSearch(object):
+    """
+    Searches the words of a :class:`WordTable` for patterns. `key` is the
+    function that spells a word in symbols and spaces for Regulus, which is
+    only needed for words that aren't just the letters A-Z.
+    """
+    def __init__(self, table, key=None):
+        self.table = table
+        self.key = key or (lambda word: word.upper())
+        offsets = table.offsets.astype(np.int64)
+        self.blob = np.frombuffer(table.data, np.uint8, int(offsets[-1]),
+                                  table.blob_start)
+        self.starts = offsets[:-1]
+        self.lengths = np.diff(offsets)
+        not_letters = np.concatenate([[0], np.cumsum(
+            (self.blob < ord('A')) | (self.blob > ord('Z')))])
+        self.plain = not_letters[offsets[1:]] == not_letters[offsets[:-1]]
+        self.max_length = int(self.lengths[self.plain].max()) \
+                          if self.plain.any() else 0
+        self._groups = {}
+        self._others = None
+
+    def _group(self, length):
+        """
+        Get the words of a given length that are just the letters A-Z, as
+        their indices in the table and a matrix of their letters from 0 to
+        25. This is built the first time each length is needed.
+        """
+        if length not in self._groups:
+            indices = np.flatnonzero(self.plain & (self.lengths == length))
+            letters = self.blob[self.starts[indices][:, np.newaxis] +
+                                np.arange(length)] - ord('A')
+            self._groups[length] = (indices, letters)
+        return self._groups[length]
+
+    def _other_words(self):
+        """
+        Get the words that aren't just the letters A-Z, as (letters, index,
+        word) triples, where `word` is what Regulus would return and
+        `letters` is that without its spaces.
+        """
+        if self._others is None:
+            others = []
+            for index in np.flatnonzero(~self.plain).tolist():
+                word = self.key(self.table.key(index))
+                others.append((word.replace(' ', ''), index, word))
+            self._others = others
+        return self._others
+
+    def _matching(self, pattern, first='A', last=LAST_SYMBOL):
+        """
+        Find the words that match a pattern, among those whose first symbol
+        is between `first` and `last`, as (word, index) pairs in
+        alphabetical order.
+        """
+        shortest, longest, leading, trailing, regex, exact = \
+            _compile(pattern)
+        first, last = symbol_index(first), symbol_index(last)
+        found = []
+        for length in xrange(max(shortest, 1),
+                             min(longest, self.max_length) + 1):
+            indices, letters = self._group(length)
+            if len(indices) == 0:
+                continue
+            keep = (letters[:, 0] >= first) & (letters[:, 0] <= last)
+            for pos, allowed in enumerate(leading):
+                keep &= allowed[letters[:, pos]]
+            for pos, allowed in enumerate(trailing):
+                keep &= allowed[letters[:, length - 1 - pos]]
+            indices = indices[keep].tolist()
+            if exact:
+                found.extend((None, index) for index in indices)
+            else:
+                for index in indices:
+                    word = self.table.key(index)
+                    if regex.match(word):
+                        found.append((word, index))
+        others = [(letters, index, word)
+                  for letters, index, word in self._other_words()
+                  if letters and first <= symbol_index(letters[0]) <= last
+                  and regex.match(letters)]
+        if others:
+            # the other words are spelled in bytes, and these are just A-Z
+            found = [(str(word or self.table.key(index)), index)
+                     for word, index in found]
+            found.extend((word, index) for letters, index, word in others)
+            found.sort(key=lambda (word, index): word.replace(' ', ''))
+        else:
+            # the table is already in alphabetical order
+            found.sort(key=lambda (word, index): index)
+        return found
+
+    def _matches(self, found):
+        "Turn (word, index) pairs into Matches."
+        freqs = self.table.freqs
+        return [Match(word or self.table.key(index), int(freqs[index]))
+                for word, index in found]
+
+    def grep(self, pattern):
+        "Get the words that match a pattern, in alphabetical order."
+        return self._matches(self._matching(pattern))
+
+    def grep_range(self, pattern, first, last):
+        """
+        Get the words that match a pattern and start with a symbol between
+        `first` and `last`, in alphabetical order.
+        """
+        return self._matches(self._matching(pattern, first, last))
+
+    def grep_freq_sorted(self, pattern):
+        """
+        Get the words that match a pattern, in descending order of
+        frequency, with ties in alphabetical order.
+        """
+        freqs = self.table.freqs
+        found = self._matching(pattern)
+        found.sort(key=lambda (word, index): -freqs[index])
+        return self._matches(found)
+
+    def grep_limit(self, pattern, limit, offset, by_freq, first='A',
+                   last=LAST_SYMBOL):
+        """
+        Get at most `limit` of the words that match a pattern, after
+        skipping the first `offset`, like Regulus' `grep_limit`.
+        """
+        found = self._matching(pattern, first, last)
+        if by_freq:
+            freqs = self.table.freqs
+            found = heapq.nsmallest(offset + limit, found,
+                                    key=lambda (word, index): -freqs[index])
+        return self._matches(found[offset:offset + limit])
+
+    def best_match(self, pattern):
+        """
+        Get the most frequent word that matches a pattern, or an empty
+        Match if there isn't one.
+        """
+        matches = self.grep_limit(pattern, 1, 0, True)
+        if not matches:
+            return NO_MATCH
+        return matches[0]
+
+    def grep_many(self, patterns):
+        "Run `grep` on each of several patterns."
+        return [self.grep(pattern) for pattern in patterns]
+
+    def best_match_many(self, patterns):
+        "Run `best_match` on each of several patterns."
+        return [self.best_match(pattern) for pattern in patterns]
+
+    def first_letter_counts(self):
+        "Count the words that start with each symbol."
+        plain = self.plain & (self.lengths > 0)
+        firsts = self.blob[self.starts[plain]] - ord('A')
+        counts = np.bincount(firsts, minlength=NUM_SYMBOLS).tolist()
+        for letters, index, word in self._other_words():
+            if letters:
+                counts[symbol_index(letters[0])] += 1
+        return counts
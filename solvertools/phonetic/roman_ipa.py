@@ -3,10 +3,9 @@ u"""
 This module implements a one-to-one mapping between approximate IPA and the
 Roman alphabet plus six characters.
 
-This allows Regulus to work with IPA without having to understand Unicode, or
-really without having to understand anything beyond "subtract 65 from the
-character code". As a bonus, it is easier to type if you happen to know the
-mapping.
+This was how Regulus worked with IPA before it could search other alphabets
+(see :mod:`solvertools.symbol_table`). It is still easier to type if you
+happen to know the mapping.
 
 Spaces are preserved, though they're presumably discarded later. On the Roman
 side, capitalization doesn't matter (the output is all caps). On the IPA side,
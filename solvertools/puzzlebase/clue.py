@@ -89,9 +89,8 @@ def associations(words, similarity_min=-1., beam=1000):
     mapping = defaultdict(lambda: defaultdict(lambda: minimum))
     words = [alphanumeric_only(w) for w in words]
     weighted = []
-    word_freqs = {}
+    word_freqs = dict(zip(words, COMBINED.get_many(words, 100)))
     for word in words:
-        word_freqs[word] = COMBINED.get(word, 100)
         weighted.append((word, word_freqs[word]**(-0.5)))
         query = DB.associations.find({'source': word})
         query2 = DB.associations.find({'target': word})
@@ -111,8 +110,10 @@ def associations(words, similarity_min=-1., beam=1000):
 
     results = defaultdict(float)
     
-    for match, strength in MATRIX.similar_to_terms(weighted, n=beam):
-        freq = COMBINED.get(match, 100)
+    similar = MATRIX.similar_to_terms(weighted, n=beam)
+    similar_freqs = COMBINED.get_many([match for match, strength in similar],
+                                      100)
+    for (match, strength), freq in zip(similar, similar_freqs):
         results[match] = strength / freq**.6 / 10
         possibilities.add(match)
 
@@ -151,9 +152,13 @@ def match_pattern(pattern, n=25):
     if pattern == '.*':
         raise ClueFormatError("I think you're asking me to iterate over the entire database. Sorry, no.")
     
-    matches = COMBINED.grep(pattern)
-    matches.sort(key=lambda x: -x[1])
-    return [(unicode(match), freq) for match, freq in matches[:n]]
+    if pattern and pattern == '.' * len(pattern):
+        # Any word of the right length will do, and the wordlist already
+        # knows the most frequent ones.
+        return [(unicode(match), freq)
+                for match, freq in COMBINED.top(n, length=len(pattern))]
+    matches = COMBINED.grep_parallel(pattern, limit=n, order='freq')
+    return [(unicode(match), freq) for match, freq in matches]
 
 def extract_words(text):
     "Get just the words out of possibly-punctuated text."
@@ -165,13 +170,15 @@ def extract_words_and_phrases(text, maxwords=4):
     Extract words and reasonable-looking phrases from text.
     """
     words = extract_words(text)
-    phrases = []
+    candidates = []
     for length in xrange(1, maxwords+1):
         for left in xrange(len(words)-length+1):
             right = left+length
             phrase = ''.join(words[left:right])
-            if len(phrase) > 5 and phrase in COMBINED:
-                phrases.append(phrase)
+            if len(phrase) > 5:
+                candidates.append(phrase)
+    known = COMBINED.contains_many(candidates)
+    phrases = [phrase for phrase, ok in zip(candidates, known) if ok]
     return _filter_too_common(words+phrases)
 
 def _filter_too_common(words, threshold=1000000000):
@@ -188,7 +195,8 @@ def _filter_too_common(words, threshold=1000000000):
         >>> _filter_too_common(['to', 'be', 'or', 'not', 'to', 'be'])
         ['to', 'be', 'or', 'not', 'to', 'be']
     """
-    result = [word for word in words if COMBINED.get(word, 100) <= threshold]
+    freqs = COMBINED.get_many(words, 100)
+    result = [word for word, freq in zip(words, freqs) if freq <= threshold]
     if result:
         return result
     else:
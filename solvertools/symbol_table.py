@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+u"""
+`solvertools.symbol_table` spells words from any alphabet in the symbols that
+Regulus searches.
+
+Regulus knows the letters A-Z, and 38 extra symbols that can stand for
+whatever a wordlist needs them to. A :class:`SymbolTable` gives the extra
+symbols to the most common characters in a wordlist that aren't A-Z, so that
+Spanish, Latin or IPA can be searched without squashing them into A-Z first:
+
+    >>> table = SymbolTable.for_words([u'año', u'niño', u'ŋ'])
+    >>> table.encode(u'niño')
+    'NI\\x80O'
+    >>> print table.decode('NI\\x80O')
+    NIÑO
+    >>> table.encode_pattern(u'.IÑ.')
+    '.I\\x80.'
+
+Words are uppercased and have their accents composed, and everything but
+their letters and spaces is dropped. A letter that doesn't get a symbol of
+its own, because there are too many, is spelled in A-Z instead:
+
+    >>> table.encode(u'Ångström')
+    'ANGSTROM'
+"""
+
+from solvertools.util import as_ascii, asciify
+from collections import defaultdict
+import string, unicodedata
+
+NUM_LETTERS = 26
+NUM_SYMBOLS = 64
+EXTRA_SYMBOLS = NUM_SYMBOLS - NUM_LETTERS
+FIRST_EXTRA_SYMBOL = 0x80
+
+_ALL_BYTES = string.maketrans('', '')
+_UPPERCASE = string.maketrans(string.ascii_lowercase, string.ascii_uppercase)
+_NOT_LETTER_OR_SPACE = _ALL_BYTES.translate(_ALL_BYTES,
+                                            string.ascii_letters + ' ')
+
+def symbol_char(index):
+    """
+    The character that stands for a Regulus symbol: 'A'-'Z' for symbols
+    0-25, and then the bytes of the extra symbols.
+    """
+    if index < NUM_LETTERS:
+        return chr(ord('A') + index)
+    return chr(FIRST_EXTRA_SYMBOL + index - NUM_LETTERS)
+
+def symbol_index(char):
+    "The Regulus symbol that a character stands for, or None."
+    code = ord(char)
+    if ord('A') <= code <= ord('Z'):
+        return code - ord('A')
+    if FIRST_EXTRA_SYMBOL <= code < FIRST_EXTRA_SYMBOL + EXTRA_SYMBOLS:
+        return code - FIRST_EXTRA_SYMBOL + NUM_LETTERS
+    return None
+
+LAST_SYMBOL = symbol_char(NUM_SYMBOLS - 1)
+
+def _ascii_letters(raw):
+    "Uppercase an ASCII bytestring and keep only its letters and spaces."
+    return raw.translate(_UPPERCASE, _NOT_LETTER_OR_SPACE)
+
+def _letters(text):
+    """
+    Uppercase Unicode text, compose its accents, and keep only its letters
+    and spaces.
+    """
+    if isinstance(text, str):
+        text = text.decode('utf-8')
+    text = unicodedata.normalize('NFC', text.upper())
+    return [char for char in text
+            if char == u' ' or unicodedata.category(char).startswith('L')]
+
+class SymbolTable(object):
+    """
+    Says which characters Regulus' extra symbols stand for. `extras` has
+    one character for each extra symbol that is used, in order.
+    """
+    def __init__(self, extras=u''):
+        if len(extras) > EXTRA_SYMBOLS:
+            raise ValueError("Regulus only has %d extra symbols"
+                             % EXTRA_SYMBOLS)
+        self.extras = extras
+        self._codes = dict((char, symbol_char(NUM_LETTERS + i))
+                           for i, char in enumerate(extras))
+        self._chars = dict((code, char)
+                           for char, code in self._codes.iteritems())
+
+    @classmethod
+    def for_words(cls, words):
+        """
+        Make a table for some words, which gives the extra symbols to the
+        letters that aren't A-Z that they use the most. The symbols go in
+        the order of their letters, so that Regulus sorts words in the same
+        order as Python does.
+        """
+        counts = defaultdict(int)
+        for word in words:
+            if as_ascii(word) is not None:
+                continue
+            for char in _letters(word):
+                if char >= u'\x80':
+                    counts[char] += 1
+        common = sorted(counts, key=lambda char: (-counts[char], char))
+        return cls(u''.join(sorted(common[:EXTRA_SYMBOLS])))
+
+    def _encode_char(self, char):
+        "Spell an uppercase letter or space in symbols."
+        if char < u'\x80':
+            return str(char)
+        code = self._codes.get(char)
+        if code is None:
+            return _ascii_letters(asciify(char))
+        return code
+
+    def encode(self, word):
+        "Spell a word in symbols, as a bytestring."
+        raw = as_ascii(word)
+        if raw is not None:
+            return _ascii_letters(raw)
+        return ''.join(self._encode_char(char) for char in _letters(word))
+
+    def encode_pattern(self, pattern):
+        """
+        Spell the letters in a pattern in symbols, as a bytestring, leaving
+        the rest of it alone.
+        """
+        raw = as_ascii(pattern)
+        if raw is not None:
+            return raw
+        if isinstance(pattern, str):
+            pattern = pattern.decode('utf-8')
+        pattern = unicodedata.normalize('NFC', pattern)
+        return ''.join(str(char) if char < u'\x80'
+                       else self._encode_char(char.upper())
+                       for char in pattern)
+
+    def decode(self, encoded):
+        """
+        Turn a word spelled in symbols back into Unicode. A word that only
+        uses A-Z comes back as it is.
+        """
+        if as_ascii(encoded) is not None:
+            return encoded
+        return u''.join(self._chars.get(char, char) for char in encoded)
+
+    def __repr__(self):
+        return 'SymbolTable(%r)' % (self.extras,)
@@ -5,11 +5,31 @@ files.
 """
 
 from __future__ import with_statement
+from contextlib import contextmanager
 import os
+import shutil
 import sys
+import tempfile
 import cPickle as pickle
+import threading
 import unicodedata
 
+def as_ascii(text):
+    """
+    Get text as an ASCII bytestring, or None if it has any non-ASCII
+    characters.
+
+    >>> as_ascii(u'Zurich'), as_ascii(u'Z\xfcrich')
+    ('Zurich', None)
+    """
+    if isinstance(text, unicode):
+        raw = text.encode('ascii', 'ignore')
+        if len(raw) == len(text):
+            return raw
+    elif not text or max(text) < '\x80':
+        return text
+    return None
+
 def asciify(text):
     u"""
     A wonderful function to remove accents from characters, and
@@ -25,6 +45,10 @@ def asciify(text):
     -
 
     """
+    # Text that's already ASCII comes out unchanged.
+    ascii_text = as_ascii(text)
+    if ascii_text is not None:
+        return ascii_text
     if not isinstance(text, unicode):
         text = text.decode('utf-8', 'ignore')
     # Deal with annoying British vowel ligatures
@@ -32,6 +56,85 @@ def asciify(text):
                .replace(u'æ', 'ae').replace(u'œ', 'oe')
     return unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore')
 
+def lru_cache(maxsize=10000):
+    """
+    A decorator that remembers the results of the `maxsize` most recently
+    used arguments of a one-argument function. The decorated function keeps
+    the name of the original, so wordlists that refer to it by name still
+    find it.
+
+        >>> @lru_cache(2)
+        ... def double(x):
+        ...     return x * 2
+        >>> double(1), double(2), double(1), double(3)
+        (2, 4, 2, 6)
+        >>> sorted(double.cache_contents())
+        [1, 3]
+
+    Arguments that can't be hashed are passed straight through. Arguments
+    are remembered along with their type, because a str and a unicode string
+    can be equal and still have different results.
+    """
+    def decorator(func):
+        # The cache is a dictionary of links in a circular doubly-linked
+        # list, ordered from least to most recently used. Each link is
+        # [prev, next, key, result], and `root` is a sentinel link.
+        cache = {}
+        root = []
+        root[:] = [root, root, None, None]
+        lock = threading.Lock()
+
+        def wrapper(arg):
+            key = (type(arg), arg)
+            try:
+                hash(key)
+            except TypeError:
+                return func(arg)
+            with lock:
+                link = cache.get(key)
+                if link is not None:
+                    link_prev, link_next, _, result = link
+                    link_prev[1] = link_next
+                    link_next[0] = link_prev
+                    last = root[0]
+                    last[1] = root[0] = link
+                    link[0] = last
+                    link[1] = root
+                    return result
+            result = func(arg)
+            with lock:
+                if key in cache:
+                    return result
+                if len(cache) >= maxsize:
+                    oldest = root[1]
+                    root[1] = oldest[1]
+                    oldest[1][0] = root
+                    del cache[oldest[2]]
+                last = root[0]
+                link = [last, root, key, result]
+                last[1] = root[0] = cache[key] = link
+            return result
+
+        def cache_clear():
+            "Forget all the remembered results."
+            with lock:
+                cache.clear()
+                root[:] = [root, root, None, None]
+
+        def cache_contents():
+            "List the arguments whose results are remembered."
+            with lock:
+                return [arg for _, arg in cache]
+
+        wrapper.__name__ = func.__name__
+        wrapper.__module__ = func.__module__
+        wrapper.__doc__ = func.__doc__
+        wrapper.__wrapped__ = func
+        wrapper.cache_clear = cache_clear
+        wrapper.cache_contents = cache_contents
+        return wrapper
+    return decorator
+
 def _build_path(parts):
     "Make a path out of the given path fragments."
     return unicode(os.path.sep.join(p for p in parts if p)).encode('utf-8')
@@ -60,9 +163,39 @@ def get_db(path):
 # Simple functions for working with pickles.
 # For more awesome pickling, see the pickledir below and lib/persist.py.
 
+# Where pickles, tables and indexes are saved. Tests point this somewhere
+# else with `pickle_dir`, so that they don't touch the real one.
+PICKLE_DIR = os.path.join(PACKAGE_DIR, 'data', 'pickle')
+
 def get_picklefile(path):
     "Get a complete path for a file in the data/pickle directory."
-    return _build_path([PACKAGE_DIR, 'data', 'pickle', path])
+    return _build_path([PICKLE_DIR, path])
+
+@contextmanager
+def pickle_dir(path):
+    """
+    Save and look for pickles in another directory, within a `with`
+    block.
+    """
+    global PICKLE_DIR
+    previous = PICKLE_DIR
+    PICKLE_DIR = path
+    try:
+        yield path
+    finally:
+        PICKLE_DIR = previous
+
+@contextmanager
+def temporary_directory(prefix='tmp'):
+    """
+    Make a temporary directory for the length of a `with` block, and remove
+    it and everything in it afterwards.
+    """
+    path = tempfile.mkdtemp(prefix=prefix)
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
 
 def load_pickle(path):
     "Load a pickled object, given its file path (instead of an open file)."
@@ -77,5 +77,7 @@ if __name__ == '__main__':
     CROSSWORD.load()
     WORDNET_DEFS.load()
 
-    app.run(host='0.0.0.0', debug=True)
+    # Regulus searches let other threads run, so requests can be served in
+    # parallel
+    app.run(host='0.0.0.0', debug=True, threaded=True)
 
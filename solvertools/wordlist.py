@@ -5,25 +5,26 @@ ensure you don't have to worry about things like capitalization and encoding.
 """
 
 from __future__ import with_statement
-from solvertools.util import get_dictfile, get_picklefile, save_pickle, \
-                             load_pickle, file_exists, asciify
+from solvertools.util import get_dictfile, get_picklefile, file_exists, \
+                             asciify, as_ascii, lru_cache
 from solvertools.regex import bare_regex
 from solvertools.alphabet import ENGLISH
+from solvertools.wordtable import WordTable, MappingTable, build_table, \
+                                  build_mapping
+from solvertools.manifest import code_fingerprint, is_fresh, stamp_sources, \
+                                 write_manifest
+from solvertools.pattern_search import PatternSearch
+from solvertools.symbol_table import SymbolTable, symbol_char
 from collections import defaultdict
-import re, codecs, unicodedata, logging
+import re, codecs, heapq, string, unicodedata, logging, marshal, os, \
+       shutil, sys, tempfile, time
+import numpy as np
 logger = logging.getLogger(__name__)
 
 def identity(text):
     "Returns what you give it."
     return text
 
-def _reverse_freq(val):
-    "If this value is a number, negate it. Otherwise, leave it alone."
-    if isinstance(val, (int, float)):
-        return -val
-    else:
-        return val
-
 def split_accents(text):
     """
     Separate accents from their base characters in Unicode text.
@@ -36,46 +37,143 @@ def ensure_unicode(text):
         return text.decode('utf-8')
     else: return text
 
+def _regulus_pattern(pattern, symbols):
+    """
+    Convert a pattern into the form that Regulus expects, spelling its
+    letters in the symbols of a :class:`SymbolTable`.
+    """
+    return symbols.encode_pattern(bare_regex(pattern.replace(' ', '')))
+
+def _regulus_patterns(patterns, symbols):
+    "Convert a sequence of patterns into a list of them for Regulus."
+    return [_regulus_pattern(p, symbols) for p in patterns]
+
+def _letter_ranges(counts, n):
+    """
+    Divide Regulus' symbols into at most `n` ranges of consecutive symbols,
+    so that about the same number of words start with each range, given how
+    many words start with each symbol. The last range runs to the last
+    symbol.
+
+        >>> _letter_ranges([1] * 26, 2)
+        [('A', 'M'), ('N', 'Z')]
+    """
+    total = sum(counts)
+    ranges = []
+    start = 0
+    seen = 0
+    for i, count in enumerate(counts):
+        seen += count
+        if seen == total:
+            ranges.append((symbol_char(start), symbol_char(len(counts) - 1)))
+            break
+        if seen * n >= total * (len(ranges) + 1):
+            ranges.append((symbol_char(start), symbol_char(i)))
+            start = i + 1
+    return ranges
+
+def _by_freq(order):
+    "Check the `order` of a grep, and tell whether it's by frequency."
+    if order not in ('alpha', 'freq'):
+        raise ValueError("The order must be 'alpha' or 'freq', not %r"
+                         % (order,))
+    return order == 'freq'
+
+def _limit(limit):
+    "Turn a limit on a number of results, or None, into one for Regulus."
+    if limit is None:
+        return sys.maxint
+    return limit
+
+_THREAD_POOL = None
+def _thread_pool():
+    "Get the pool of threads that Regulus searches are split across."
+    global _THREAD_POOL
+    if _THREAD_POOL is None:
+        from multiprocessing import cpu_count
+        from multiprocessing.pool import ThreadPool
+        _THREAD_POOL = ThreadPool(cpu_count())
+    return _THREAD_POOL
+
+# Translation tables for filtering ASCII bytestrings. `str.translate` deletes
+# the characters in its second argument and then maps the rest through the
+# table, so these uppercase and filter a string in a single pass.
+_ALL_BYTES = string.maketrans('', '')
+_UPPERCASE = string.maketrans(string.ascii_lowercase, string.ascii_uppercase)
+
+def _deleting_all_but(keep):
+    "Make a string of all the bytes that aren't in `keep`."
+    return _ALL_BYTES.translate(_ALL_BYTES, keep)
+
+_NOT_ALPHANUMERIC = _deleting_all_but(string.ascii_letters + string.digits)
+_NOT_ALPHANUMERIC_OR_SPACE = _deleting_all_but(string.ascii_letters +
+                                               string.digits + ' ')
+_NOT_LETTER = _deleting_all_but(string.ascii_letters)
+_NOT_LETTER_OR_SPACE = _deleting_all_but(string.ascii_letters + ' ')
+
+def _uppercase_filter(text, deletions):
+    """
+    Convert text to uppercase ASCII and delete the given characters. ASCII
+    text skips Unicode normalization, which is by far the slowest part.
+    """
+    raw = as_ascii(text)
+    if raw is None:
+        # Some uppercase characters decompose into lowercase letters, such
+        # as u'\xaa' into 'a'. Those are deleted, not uppercased.
+        return case_insensitive_ascii(text).translate(
+            None, deletions + string.ascii_lowercase)
+    return raw.translate(_UPPERCASE, deletions)
+
+@lru_cache()
 def case_insensitive(text):
     "Collapse case by converting everything to uppercase."
     return ensure_unicode(text).upper()
 
+@lru_cache()
 def case_insensitive_clean(text):
     "Collapse case by converting everything to uppercase."
     return split_accents(ensure_unicode(text.strip()).upper())
 
+@lru_cache()
 def case_insensitive_ascii(text):
     "Convert everything to uppercase and discard non-ASCII stuff."
+    raw = as_ascii(text)
+    if raw is not None:
+        return raw.translate(_UPPERCASE)
     return asciify(ensure_unicode(text).upper())
 
+@lru_cache()
 def alphanumeric_only(text):
     """
     Convert everything to uppercase and discard everything but letters and
     digits.
     """
-    return re.sub("[^A-Z0-9]", "", case_insensitive_ascii(text))
+    return _uppercase_filter(text, _NOT_ALPHANUMERIC)
 
+@lru_cache()
 def alphanumeric_with_spaces(text):
     """
     Convert everything to uppercase and discard everything but letters, digits,
     and spaces.
     """
-    return re.sub("[^A-Z0-9 ]", "", case_insensitive_ascii(text))
+    return _uppercase_filter(text, _NOT_ALPHANUMERIC_OR_SPACE)
 alphanumeric_and_spaces = alphanumeric_with_spaces
 
+@lru_cache()
 def letters_only(text):
     """
     Convert everything to uppercase ASCII, and discard everything but the
     letters A-Z.
     """
-    return re.sub("[^A-Z]", "", case_insensitive_ascii(text))
+    return _uppercase_filter(text, _NOT_LETTER)
 
+@lru_cache()
 def letters_and_spaces(text):
     """
     Convert everything to uppercase ASCII, and discard everything but the
     letters A-Z and spaces. This format is safe for Regulus.
     """
-    return re.sub("[^A-Z ]", "", case_insensitive_ascii(text))
+    return _uppercase_filter(text, _NOT_LETTER_OR_SPACE)
 
 def letters_only_unicode(text):
     """
@@ -249,7 +347,7 @@ class Wordlist(object):
     To load a wordlist, call this constructor with the name of
     the wordlist to load, as in `Wordlist("enable")`. Don't give an extension
     or a path, because those depend on whether it's loading from a `.txt` or
-    `.pickle` file anyway.
+    `.table` file anyway.
     
     You should also provide a `convert` function,
     representing how to convert an arbitrary string to the format the wordlist
@@ -264,19 +362,26 @@ class Wordlist(object):
     Use the `reader` function to specify how to read a word from each line.
     In most cases, this will be `identity` or `with_frequency`.
 
+    Once a wordlist has been read from its `.txt` file, it is saved as a
+    :class:`WordTable` in the pickle directory. Later, the table is
+    memory-mapped instead of being read into memory, so loading it takes no
+    time, and all processes that use the same wordlist share one copy of it.
+
     Finally, you can set `pickle=False` if you don't want the wordlist to be
-    loaded from or saved to a pickle file.
+    loaded from or saved to a table file. Its table will then be built in a
+    temporary directory, which is removed as soon as the table is mapped into
+    memory.
     """
     version = 3
     def __init__(self, filename, convert=case_insensitive, reader=identity,
                  pickle=True):
         self.filename = filename
         self.words = None
-        self.sorted_words = None
         self.convert = convert
         self.reader = reader
         self.pickle = pickle
         self.regulus = None
+        self.symbols = None
 
     def variant(self, convert=None, reader=None):
         """
@@ -296,11 +401,53 @@ class Wordlist(object):
         return Wordlist(self.filename, convert, reader, pickle=self.pickle)
 
     # load the data when necessary
+    def is_cached(self):
+        """
+        Has this wordlist already been saved as a table, and is the table up
+        to date with the `.txt` file and the code that reads it?
+        """
+        return self.pickle and is_fresh(get_picklefile(self.table_name()),
+                                        [self.source_file()],
+                                        self.fingerprint())
+
+    def source_file(self):
+        "The full path of the `.txt` file this wordlist is built from."
+        return get_dictfile(self.filename+'.txt')
+
+    def fingerprint(self):
+        """
+        A fingerprint of the code that builds this wordlist's table, which
+        changes when the convert or reader functions change, or when the
+        version is bumped.
+        """
+        return '%s:%s' % (self.version,
+                          code_fingerprint(self.convert, self.reader))
+
+    def regulus_fingerprint(self):
+        "A fingerprint of the code that builds this wordlist's Regulus index."
+        return '%s:%s' % (self.version,
+                          code_fingerprint(self.convert, self.reader,
+                                           SymbolTable.for_words,
+                                           SymbolTable.encode))
+
+    def _stamp_source(self):
+        """
+        Describe the current state of the `.txt` file, to save in the
+        manifest of something built from it, or return None if there is no
+        `.txt` file.
+        """
+        if file_exists(self.source_file()):
+            return stamp_sources([self.source_file()])
+        return None
+
     def load(self):
         "Force this wordlist to be loaded."
-        if self.pickle and file_exists(get_picklefile(self.pickle_name())):
-            return self._load_pickle()
-        elif file_exists(get_dictfile(self.filename+'.txt')):
+        if self.is_cached():
+            try:
+                return self._load_table()
+            except IOError:
+                logger.warn("Rebuilding %s" % self.table_name())
+        if file_exists(self.source_file()):
             return self._load_txt()
         else:
             raise IOError("Cannot find a dictionary named '%s'." %
@@ -308,7 +455,10 @@ class Wordlist(object):
 
     def get_regulus(self):
         """
-        Return this word list's regulus object, loading it if necessary.
+        Return this word list's regulus object, loading it if necessary. If
+        the Regulus extension isn't built, this is a
+        :class:`solvertools.pattern_search.PatternSearch` instead, which
+        answers the same queries more slowly.
         """
         if self.regulus is None:
             self.load_regulus()
@@ -318,101 +468,291 @@ class Wordlist(object):
         """
         If we need to do fast regex operations on this wordlist, we need a
         regulus object. This function ensures that such an object exists.
+
+        Regulus searches words spelled in A-Z and 38 more symbols, which go
+        to the letters other than A-Z that this wordlist uses the most, as
+        its `symbols` say.
         """
+        if not _regulus_available():
+            logger.warn("The Regulus extension isn't built; searching %s "
+                        "without it." % self.filename)
+            if self.words is None:
+                self.load()
+            self.symbols = SymbolTable.for_words(self.words)
+            self.regulus = PatternSearch(self.words, self.symbols.encode)
+            return
         logger.info("Loading %s" % self.regulus_name())
         from solvertools.extensions.regulus import regulus
+        filename = get_picklefile(self.regulus_name())
         self.regulus = regulus.Dict()
-        loaded_cache = self.regulus.read(get_picklefile(self.regulus_name()))
-        if not loaded_cache:
+        loaded_cache = (self.regulus_is_cached() and
+                        self.regulus.read(filename))
+        if loaded_cache:
+            self.symbols = SymbolTable(
+                self.regulus.get_symbols().decode('utf-8'))
+        else:
+            stamps = self._stamp_source()
             if self.words is None:
                 self.load()
             del self.regulus
             logger.info("Building %s" % self.regulus_name())
-            entries = [regulus.DictEntry(letters_and_spaces(word), freq)
+            self.symbols = SymbolTable.for_words(self.words)
+            entries = [regulus.DictEntry(self.symbols.encode(word), freq)
                        for word, freq in self.words.iteritems()]
-            self.regulus = regulus.Dict(entries)
+            self.regulus = regulus.Dict(entries,
+                                        self.symbols.extras.encode('utf-8'))
             logger.info("Saving %s" % self.regulus_name())
-            self.regulus.write(get_picklefile(self.regulus_name()))
+            self.regulus.write(filename)
+            if stamps is not None:
+                write_manifest(filename, stamps, self.regulus_fingerprint())
+
+    def regulus_is_cached(self):
+        """
+        Is there a Regulus index for this wordlist that's up to date with the
+        `.txt` file and the code that reads it?
+        """
+        return is_fresh(get_picklefile(self.regulus_name()),
+                        [self.source_file()], self.regulus_fingerprint())
+
+    def _result(self, result):
+        "Turn a result from Regulus into a (word, freq) pair."
+        return self.symbols.decode(result.word), result.freq
     
-    def grep(self, pattern):
+    def grep(self, pattern, limit=None, offset=0, order='alpha'):
         """
         Search the wordlist for results matching this pattern.
-        Requires the Regulus extension.
+
+        The results are in alphabetical order, or in descending order of
+        frequency if `order` is 'freq'. To get only some of them, skip the
+        first `offset` and take at most `limit`: Regulus then keeps only
+        those results as it searches, and in alphabetical order it stops
+        when it has them all.
+        """
+        by_freq = _by_freq(order)
+        if self.regulus is None:
+            self.load_regulus()
+        pattern = _regulus_pattern(pattern, self.symbols)
+        if limit is not None or offset:
+            results = self.regulus.grep_limit(pattern, _limit(limit),
+                                              offset, by_freq)
+        elif by_freq:
+            results = self.regulus.grep_freq_sorted(pattern)
+        else:
+            results = self.regulus.grep(pattern)
+        return [self._result(result) for result in results]
+
+    def igrep(self, pattern, batch_size=1000):
+        """
+        Iterate over the results matching this pattern, in alphabetical
+        order. Regulus searches for them in batches as they are asked for, so
+        stopping early saves the rest of the search.
+        """
+        if self.regulus is None:
+            self.load_regulus()
+        # The cursor doesn't keep the Dict it searches alive, so this
+        # generator does.
+        dictionary = self.regulus
+        pattern = _regulus_pattern(pattern, self.symbols)
+        if isinstance(dictionary, PatternSearch):
+            for result in dictionary.grep(pattern):
+                yield self._result(result)
+            return
+        from solvertools.extensions.regulus import regulus
+        cursor = regulus.GrepCursor(dictionary, pattern)
+        while True:
+            results = cursor.next(batch_size)
+            for result in results:
+                yield self._result(result)
+            if len(results) < batch_size:
+                return
+
+    def grep_parallel(self, pattern, shards=None, limit=None, offset=0,
+                      order='alpha'):
+        """
+        Search the wordlist for results matching this pattern, like `grep`,
+        but split the search into `shards` ranges of first letters that are
+        searched in a pool of threads. Regulus lets other threads run while
+        it searches, so this uses as many cores as there are shards (by
+        default, all of them).
         """
-        pattern = pattern.replace(' ', '')
+        from multiprocessing import cpu_count
+        by_freq = _by_freq(order)
         if self.regulus is None:
             self.load_regulus()
-        results = self.regulus.grep(str(bare_regex(pattern)))
-        return [(result.word, result.freq) for result in results]
+        regulus = self.regulus
+        pattern = _regulus_pattern(pattern, self.symbols)
+        ranges = _letter_ranges(regulus.first_letter_counts(),
+                                shards or cpu_count())
+        # Each range can contribute any of the results, so each one keeps
+        # as many as the whole search does.
+        keep = _limit(None if limit is None else offset + limit)
+        def search(letters):
+            first, last = letters
+            return regulus.grep_limit(pattern, keep, 0, by_freq, first, last)
+        results = [self._result(result)
+                   for shard in _thread_pool().map(search, ranges)
+                   for result in shard]
+        if by_freq:
+            # the ranges are in alphabetical order, and this sort is stable
+            results.sort(key=lambda item: -item[1])
+        if limit is None:
+            return results[offset:]
+        return results[offset:offset + limit]
 
     def best_match(self, pattern):
         """
         Search the wordlist for the best result matching this pattern.
-        Requires the Regulus extension.
         """
-        pattern = pattern.replace(' ', '')
         if not hasattr(self, 'regulus') or self.regulus is None:
             self.load_regulus()
-        result = self.regulus.best_match(str(bare_regex(pattern)))
+        result = self.regulus.best_match(_regulus_pattern(pattern,
+                                                          self.symbols))
         if result.word is None:
             return (None, 0)
-        return result.word, result.freq
+        return self._result(result)
 
-    def _load_pickle(self):
-        "Load this wordlist from a pickle."
-        picklename = self.pickle_name()
-        logger.info("Loading %s" % picklename)
-        self.words, self.sorted_words = load_pickle(picklename)
+    def grep_many(self, patterns):
+        """
+        Search the wordlist for the results matching each of several
+        patterns, returning a list of results for each one. The wordlist is
+        only searched once, so this is much faster than calling `grep` on
+        each pattern.
+        """
+        if self.regulus is None:
+            self.load_regulus()
+        results = self.regulus.grep_many(_regulus_patterns(patterns,
+                                                           self.symbols))
+        return [[self._result(result) for result in matches]
+                for matches in results]
 
-    def _load_txt(self):
-        "Load this wordlist from a plain text file."
-        self.words = {}
+    def best_match_many(self, patterns):
+        """
+        Search the wordlist for the best result matching each of several
+        patterns, searching it only once.
+        """
+        if self.regulus is None:
+            self.load_regulus()
+        results = self.regulus.best_match_many(_regulus_patterns(patterns,
+                                                                 self.symbols))
+        return [self._result(result) for result in results]
+
+    def _load_table(self):
+        "Memory-map this wordlist from its table file."
+        tablename = self.table_name()
+        logger.info("Loading %s" % tablename)
+        self.words = WordTable(get_picklefile(tablename))
+
+    def _read_entries(self):
+        """
+        Read the entries of this wordlist's `.txt` file one line at a time,
+        applying the `reader` function to each line.
+        """
         filename = get_dictfile(self.filename+'.txt')
         logger.info("Loading %s" % filename)
         with codecs.open(filename, encoding='utf-8') as wordlist:
-            entries = [self.reader(line.strip()) for line in wordlist
-                       if line.strip()]
-            for entry in entries:
-                if isinstance(entry, tuple) or isinstance(entry, list):
-                    # this word has a value attached
-                    word, val = entry
-                    self.words[self.convert(word)] = max(
-                        self.words.get(self.convert(word), 0),
-                        val
-                    )
-                else:
-                    self.words[self.convert(entry)] = 1
-
-            # Sort the words by reverse frequency if possible,
-            # then alphabetically
-
-            self.sorted_words = sorted(self.words.keys(),
-              key=lambda word: (_reverse_freq(self.words[word]), word))
-        picklename = self.pickle_name()
+            for line in wordlist:
+                line = line.strip()
+                if line:
+                    yield self.reader(line)
+
+    def _converted_entries(self, entries):
+        """
+        Apply the `convert` function to a stream of entries, yielding
+        (word, frequency) pairs. Entries without a frequency get 1.
+
+        Every word of a wordlist is usually different, so this skips the
+        convert function's cache, if it has one.
+        """
+        convert = getattr(self.convert, '__wrapped__', self.convert)
+        for entry in entries:
+            if isinstance(entry, tuple) or isinstance(entry, list):
+                # this word has a value attached
+                word, val = entry
+                yield convert(word), val
+            else:
+                yield convert(entry), 1
+
+    def _load_txt(self, entries=None, stamps=None):
+        """
+        Load this wordlist from a plain text file. If `entries` is given,
+        it should be the output of the `reader` function on each line of the
+        file, which has already been read elsewhere, and `stamps` should
+        describe the file as it was before it was read.
+
+        The file is streamed: each line is parsed and converted before the
+        next line is read, and the table is built with an external sort, so
+        only one run of it is in memory at a time.
+        """
+        if entries is None:
+            stamps = self._stamp_source()
+            entries = self._read_entries()
+        entries = self._converted_entries(entries)
         if self.pickle:
-            logger.info("Saving %s" % picklename)
-            save_pickle((self.words, self.sorted_words), picklename)
-    
+            tablename = self.table_name()
+            logger.info("Saving %s" % tablename)
+            build_table(get_picklefile(tablename), entries)
+            if stamps is not None:
+                write_manifest(get_picklefile(tablename), stamps,
+                               self.fingerprint())
+            self._load_table()
+        else:
+            self.words = self._temporary_table(build_table, WordTable,
+                                               entries)
+
+    def _temporary_table(self, build, table_class, entries):
+        """
+        Build a table for a wordlist that isn't saved, in a temporary
+        directory. The directory is removed once the table is mapped into
+        memory, which keeps the mapping valid.
+        """
+        tempdir = tempfile.mkdtemp(prefix='wordlist')
+        try:
+            filename = os.path.join(tempdir, self.table_name())
+            build(filename, entries)
+            return table_class(filename)
+        finally:
+            shutil.rmtree(tempdir, ignore_errors=True)
+
     def sorted(self):
         """
         Returns the words in the list in sorted order. The order is descending
         order by frequency, and lexicographic order after that.
+
+        This is a lazy sequence that reads words from the table as they are
+        asked for, so slicing off the start of it is fast.
         """
-        return self.sorted_words
+        if self.words is None:
+            self.load()
+        return self.words.sorted_keys()
+
+    def top(self, n, length=None):
+        """
+        Get the `n` most frequent words in the list, as (word, frequency)
+        pairs. If `length` is given, get the `n` most frequent words with that
+        many characters.
+
+            >>> [word for word, freq in Google200K.top(3, length=5)]
+            [u'ABOUT', u'OTHER', u'WHICH']
+
+        Tables keep the words sorted by frequency, and grouped by length, so
+        this only reads the words it returns.
+        """
+        if self.words is None:
+            self.load()
+        return self.words.top(n, length)
 
     # Implement the read-only dictionary methods
     def __iter__(self):
         "Yield the wordlist entries in sorted order."
         if self.words is None:
             self.load()
-        return iter(self.sorted_words)
+        return iter(self.words)
 
     def iteritems(self):
         "Yield the wordlist entries and their frequencies in sorted order."
         if self.words is None:
             self.load()
-        for word in self.sorted_words:
-            yield (word, self.words[word])
+        return self.words.iteritems()
 
     def __contains__(self, word):
         """
@@ -440,13 +780,107 @@ class Wordlist(object):
             self.load()
         return self.words.get(self.convert(word), default)
 
-    def keys(self):
+    def get_many(self, words, default=0, canonical=False):
         """
-        Get all the words in the list, in sorted order.
+        Get the frequencies of many words at once, as a NumPy array. Words
+        that are not in the list get the frequency `default`.
+
+            >>> ENABLE.get_many(['cat', 'Dog', 'zyzzlvaria'])
+            array([1, 1, 0])
+
+        This is much faster than calling :meth:`get` on each word. Each word
+        is first looked up exactly as it is given, and only the words that
+        aren't found are converted and looked up again. That's correct because
+        converting a word that's already in the list doesn't change it. If
+        you know that all the words are in canonical form already, pass
+        `canonical=True` to skip conversion entirely.
+        """
+        found, freqs = self._lookup_many(words, canonical)
+        freqs[~found] = default
+        return freqs
+
+    def contains_many(self, words, canonical=False):
+        """
+        Check whether each of many words is in the list, returning a NumPy
+        array of booleans. See :meth:`get_many`.
+        """
+        found, freqs = self._lookup_many(words, canonical)
+        return found
+
+    def _lookup_many(self, words, canonical):
+        """
+        Look up many words, returning an array saying whether each word was
+        found and an array of their frequencies.
         """
         if self.words is None:
             self.load()
-        return self.sorted_words
+        words = list(words)
+        found, freqs = self._lookup_exact(words)
+        if not canonical:
+            missing = np.flatnonzero(~found)
+            if len(missing):
+                converted = [self.convert(words[i]) for i in missing]
+                found2, freqs2 = self._lookup_exact(converted)
+                found[missing] = found2
+                freqs[missing] = freqs2
+        return found, freqs
+
+    def _lookup_exact(self, words):
+        """
+        Look up words that need no conversion. The words in a mapping have
+        no frequencies, so they count as 1.
+        """
+        indices = self.words.indices(words)
+        found = indices >= 0
+        if isinstance(self.words, WordTable):
+            freqs = np.zeros((len(words),), dtype=np.int64)
+            freqs[found] = self.words.freqs[indices[found]]
+        else:
+            freqs = found.astype(np.int64)
+        return found, freqs
+
+    def words_with_prefix(self, prefix):
+        """
+        Get the words in the list that start with `prefix`, in sorted order.
+
+            >>> ENABLE.words_with_prefix('zyz')
+            [u'ZYZZYVA', u'ZYZZYVAS']
+        """
+        return self._search(prefix, 'with_prefix')
+
+    def words_with_suffix(self, suffix):
+        """
+        Get the words in the list that end with `suffix`, in sorted order.
+        """
+        return self._search(suffix, 'with_suffix')
+
+    def words_containing(self, text):
+        """
+        Get the words in the list that contain `text`, in sorted order.
+        """
+        return self._search(text, 'containing')
+
+    def _search(self, text, method):
+        """
+        Find words using one of the searches on a table, such as
+        `with_prefix`. Tables keep indexes for these searches, so they take
+        logarithmic time.
+        """
+        if self.words is None:
+            self.load()
+        text = ensure_unicode(self.convert(text))
+        indices = getattr(self.words, method)(text)
+        if isinstance(self.words, WordTable):
+            # put them in descending order of frequency
+            order = np.lexsort((indices, -self.words.freqs[indices]))
+            indices = indices[order]
+        return [self.words.key(i) for i in indices]
+
+    def keys(self):
+        """
+        Get all the words in the list, in sorted order.
+        """
+        return self.sorted()
 
     def __repr__(self):
         return "Wordlist(%r, %s, %s)" % (self.filename, self.convert.__name__,
@@ -454,13 +888,13 @@ class Wordlist(object):
     def __str__(self):
         return repr(self)
 
-    def pickle_name(self):
+    def table_name(self):
         """
-        The filename that this wordlist will have when pickled. This is
-        determined from its base filename and the names of the functions that
-        transformed it.
+        The filename that this wordlist will have when saved as a table. This
+        is determined from its base filename and the names of the functions
+        that transformed it.
         """
-        return "%s.%s.%s.%s.pickle" % (self.filename, self.convert.__name__,
+        return "%s.%s.%s.%s.table" % (self.filename, self.convert.__name__,
         self.reader.__name__, self.version)
 
     def regulus_name(self):
@@ -491,8 +925,8 @@ class Wordlist(object):
         """
         d = dict(self.__dict__)
         d['words']=None
-        d['sorted_words']=None
         d['regulus']=None
+        d['symbols']=None
         return d
 
 class WordMapping(Wordlist):
@@ -514,41 +948,242 @@ class WordMapping(Wordlist):
                            reader=csv_rev,
                            pickle=self.pickle)
 
-    def _load_txt(self):
-        "Load this wordlist from a plain text file."
+    def __getitem__(self, word):
+        """
+        Get the list of values for a word. A word that isn't in the mapping
+        has no values.
+        """
+        if self.words is None:
+            self.load()
+        return self.words.get(self.convert(word), [])
+
+    def _load_table(self):
+        "Memory-map this mapping from its table file."
+        tablename = self.table_name()
+        logger.info("Loading %s" % tablename)
+        self.words = MappingTable(get_picklefile(tablename))
+
+    def _load_txt(self, entries=None, stamps=None):
+        """
+        Load this mapping from a plain text file, or from `entries` that
+        have already been read from it when it was in the state described by
+        `stamps`.
+
+        The values are written to disk as they stream by, and are only
+        decoded again when their key is looked up.
+        """
         # rewriting to be many-to-many
-        self.words = defaultdict(list)
-        filename = get_dictfile(self.filename+'.txt')
-        logger.info("Loading %s" % filename)
-        wordlist = codecs.open(filename, encoding='utf-8')
-        entries = [self.reader(line.strip()) for line in wordlist
-                   if line.strip()]
-        for entry in entries:
-            word, val = entry
-            self.words[self.convert(word)].append(self.convert_out(val))
-        
-        # Sort the words by reverse frequency if possible,
-        # then alphabetically
-
-        self.sorted_words = sorted(self.words.keys())
-        picklename = self.pickle_name()
+        if entries is None:
+            stamps = self._stamp_source()
+            entries = self._read_entries()
+        convert = getattr(self.convert, '__wrapped__', self.convert)
+        convert_out = getattr(self.convert_out, '__wrapped__',
+                              self.convert_out)
+        entries = ((convert(word), convert_out(val)) for word, val in entries)
         if self.pickle:
-            logger.info("Saving %s" % picklename)
-            save_pickle((self.words, self.sorted_words), picklename)
-        wordlist.close()
-    
-    def pickle_name(self):
+            tablename = self.table_name()
+            logger.info("Saving %s" % tablename)
+            build_mapping(get_picklefile(tablename), entries)
+            if stamps is not None:
+                write_manifest(get_picklefile(tablename), stamps,
+                               self.fingerprint())
+            self._load_table()
+        else:
+            self.words = self._temporary_table(build_mapping, MappingTable,
+                                               entries)
+
+    def fingerprint(self):
         """
-        The filename that this wordlist will have when pickled. This is
-        determined from its base filename and the names of the functions that
-        transformed it.
+        A fingerprint of the code that builds this mapping's table, including
+        its `convert_out` function.
+        """
+        return '%s:%s' % (self.version,
+                          code_fingerprint(self.convert, self.convert_out,
+                                           self.reader))
+
+    def table_name(self):
         """
-        return "%s.%s-%s.%s.%s.pickle" % (self.filename, self.convert.__name__,
-        self.convert_out.__name__, self.reader.__name__, self.version)
+        The filename that this mapping will have when saved as a table. This
+        is determined from its base filename and the names of the functions
+        that transformed it.
+        """
+        return "%s.%s-%s.%s.%s.mapping" % (self.filename,
+        self.convert.__name__, self.convert_out.__name__,
+        self.reader.__name__, self.version)
     
     def load_regulus(self):
         raise NotImplementedError
 
+def _weighted_value(value, weight):
+    """
+    Weight a value from a wordlist. Values that aren't numbers, such as the
+    lists in a WordMapping, count as a frequency of 1.
+    """
+    if not isinstance(value, (int, long, float)):
+        value = 1
+    return value * weight
+
+class WordlistUnion(object):
+    """
+    A read-only wordlist that combines several wordlists, each with a weight
+    that its frequencies are multiplied by, without building a combined copy
+    of them. New sources can be layered in just by making a new union.
+
+        >>> union = WordlistUnion([(ENABLE, 2000), (Google200K, 1)])
+        >>> union['zyzzyva'] == 2000 + Google200K.get('zyzzyva', 0)
+        True
+
+    A word's frequency is the combination of its weighted frequencies in the
+    sources that contain it. By default they're added up, as the puzzlebase
+    does when it adds wordlists with multipliers; pass `combine=max` to take
+    the highest one instead.
+
+    Each source applies its own `convert` function to the words it's asked
+    about. To make sure they all agree on what a word is, pass `convert`, and
+    every source that converts differently is replaced by its
+    :meth:`Wordlist.variant` with that `convert` function.
+    """
+    def __init__(self, sources, combine=sum, convert=None):
+        self.sources = []
+        self.weights = []
+        for source in sources:
+            if isinstance(source, (tuple, list)):
+                source, weight = source
+            else:
+                weight = 1
+            if convert is not None and source.convert is not convert:
+                source = source.variant(convert)
+            self.sources.append(source)
+            self.weights.append(weight)
+        self.combine = combine
+
+    def __repr__(self):
+        return "WordlistUnion(%r)" % zip(self.sources, self.weights)
+
+    def get(self, word, default=None):
+        """
+        Get the combined frequency of a word, or `default` if no source
+        contains it.
+        """
+        values = []
+        for source, weight in zip(self.sources, self.weights):
+            value = source.get(word)
+            if value is not None:
+                values.append(_weighted_value(value, weight))
+        if not values:
+            return default
+        return self.combine(values)
+
+    def __getitem__(self, word):
+        value = self.get(word)
+        if value is None:
+            raise KeyError(word)
+        return value
+
+    def __contains__(self, word):
+        return any(word in source for source in self.sources)
+
+    def get_many(self, words, default=0):
+        """
+        Get the combined frequencies of many words at once, as a NumPy array,
+        using each source's :meth:`Wordlist.get_many`.
+        """
+        words = list(words)
+        if self.combine not in (sum, max):
+            return np.array([self.get(word, default) for word in words])
+        found = np.zeros((len(words),), dtype=bool)
+        values = []
+        for source, weight in zip(self.sources, self.weights):
+            source_found, freqs = source._lookup_many(words, False)
+            found |= source_found
+            freqs = freqs * weight
+            if self.combine is max:
+                # a source that lacks the word mustn't win with 0
+                freqs = np.where(source_found, freqs, -np.inf)
+            values.append(freqs)
+        if self.combine is max:
+            result = np.max(values, axis=0)
+        else:
+            result = np.sum(values, axis=0)
+        result = np.where(found, result, default)
+        if all(isinstance(weight, (int, long)) for weight in self.weights):
+            result = result.astype(np.int64)
+        return result
+
+    def contains_many(self, words):
+        "Check whether each of many words is in any of the sources."
+        words = list(words)
+        found = np.zeros((len(words),), dtype=bool)
+        for source in self.sources:
+            found |= source.contains_many(words)
+        return found
+
+    def iteritems(self, block_size=256):
+        """
+        Yield (word, frequency) pairs in descending order of combined
+        frequency.
+
+        The sources are already in descending order of frequency, so this
+        reads them in a k-way merge, with a heap of the next entry from each
+        source. The combined frequency of each new word is looked up in all
+        the sources, and the word waits in a second heap until no word that
+        hasn't been seen yet could beat it: that is, until its frequency is
+        at least the combination of the next frequencies in each source.
+        New words are looked up in blocks of `block_size`.
+        """
+        streams = [self._weighted_stream(source, weight)
+                   for source, weight in zip(self.sources, self.weights)]
+        heads = [0] * len(streams)
+        merge = []
+        for i, stream in enumerate(streams):
+            self._advance(stream, i, heads, merge)
+        seen = set()
+        waiting = []
+        while merge:
+            # Take a block of entries from the merge, so that the new words
+            # in it can be looked up all at once.
+            new_words = []
+            for step in xrange(block_size):
+                if not merge:
+                    break
+                value, word, i = heapq.heappop(merge)
+                self._advance(streams[i], i, heads, merge)
+                if word not in seen:
+                    seen.add(word)
+                    new_words.append(word)
+            values = self.get_many(new_words).tolist()
+            for word, value in zip(new_words, values):
+                heapq.heappush(waiting, (-value, word))
+            threshold = self.combine(heads)
+            while waiting and -waiting[0][0] >= threshold:
+                value, word = heapq.heappop(waiting)
+                yield word, -value
+        while waiting:
+            value, word = heapq.heappop(waiting)
+            yield word, -value
+
+    def _weighted_stream(self, source, weight):
+        "Yield a source's words and weighted frequencies, in sorted order."
+        for word, value in source.iteritems():
+            yield word, _weighted_value(value, weight)
+
+    def _advance(self, stream, i, heads, merge):
+        """
+        Push the next entry of stream `i` onto the merge heap, and remember
+        its frequency as the most that any word not seen yet in that stream
+        can have there.
+        """
+        for word, value in stream:
+            heads[i] = value
+            heapq.heappush(merge, (-value, word, i))
+            return
+        heads[i] = 0
+
+    def __iter__(self):
+        "Yield the words in descending order of combined frequency."
+        for word, value in self.iteritems():
+            yield word
+
 # Define useful wordlists
 ENABLE = Wordlist('enable', case_insensitive)
 NPL = Wordlist('npl_allwords2', case_insensitive)
@@ -558,6 +1193,7 @@ COMBINED = Wordlist('sages_combined', letters_only, with_frequency)
 COMBINED_WORDY = Wordlist('sages_combined', alphanumeric_with_spaces, with_frequency)
 PHRASES = Wordlist('google_phrases', alphanumeric_with_spaces, with_frequency)
 LATIN = Wordlist('wikipedia_la', classical_latin_letters, with_frequency)
+SPANISH = Wordlist('wikipedia_es', letters_only_unicode, with_frequency)
 CHAOTIC = Wordlist('chaotic', letters_only, with_frequency)
 WORDNET = Wordlist('wordnet', case_insensitive)
 WIKTIONARY = Wordlist('wiktionary_english', alphanumeric_with_spaces, tsv_keys)
@@ -578,3 +1214,137 @@ MUSICBRAINZ_ARTIST_ALBUMS = WordMapping('musicbrainz_artist_album_rel',
   alphanumeric_with_spaces, tsv_weighted, tsv)
 MUSICBRAINZ_ARTIST_TRACKS = WordMapping('musicbrainz_artist_track_rel',
   alphanumeric_with_spaces, tsv_weighted, tsv)
+
+def all_wordlists():
+    "Get all the wordlists and mappings that are defined in this module."
+    return [value for name, value in sorted(globals().items())
+            if isinstance(value, Wordlist)]
+
+def build_all(wordlists=None, processes=None, regulus=True, force=False):
+    """
+    Build the tables and Regulus indexes for many wordlists at
+    once, on a pool of `processes` worker processes. By default, this
+    builds everything defined in this module that hasn't been built yet or
+    is out of date with its `.txt` file or the code that reads it (see
+    :mod:`solvertools.manifest`), using one process per CPU.
+
+    Variants that share a source file and a reader, such as COMBINED and
+    COMBINED_WORDY, are read and parsed only once. The parsed entries are
+    spooled to a temporary file, and each worker applies its own `convert`
+    function to them.
+
+    Returns a list of (artifact, seconds) pairs, which are also logged.
+    """
+    from multiprocessing import Pool
+    if wordlists is None:
+        wordlists = all_wordlists()
+    to_build = []
+    for wordlist in wordlists:
+        if not file_exists(wordlist.source_file()):
+            logger.warn("Skipping %r: no source file" % wordlist)
+        elif force or not wordlist.is_cached():
+            to_build.append(wordlist)
+    groups = defaultdict(list)
+    for wordlist in to_build:
+        groups[(wordlist.filename, wordlist.reader)].append(wordlist)
+    shared = [group for group in groups.values() if len(group) > 1]
+
+    timings = []
+    def record(name, seconds):
+        logger.info("Built %s in %.1f seconds" % (name, seconds))
+        timings.append((name, seconds))
+
+    tempdir = tempfile.mkdtemp(prefix='build_all', dir=get_picklefile(''))
+    pool = Pool(processes)
+    try:
+        # Parse each shared source file once.
+        spools = {}
+        jobs = [(group[0], tempdir) for group in shared]
+        for key, spool, name, seconds in \
+          pool.imap_unordered(_spool_source, jobs):
+            spools[key] = spool
+            record(name, seconds)
+
+        # Convert and save every variant.
+        jobs = [(wordlist, spools.get((wordlist.filename, wordlist.reader)))
+                for wordlist in to_build]
+        for name, seconds in pool.imap_unordered(_build_variant, jobs):
+            record(name, seconds)
+
+        # Build the Regulus indexes, once per distinct index file.
+        if regulus and not _regulus_available():
+            logger.warn("The Regulus extension isn't built; "
+                        "skipping Regulus indexes.")
+            regulus = False
+        if regulus:
+            jobs = {}
+            for wordlist in wordlists:
+                if isinstance(wordlist, WordMapping):
+                    continue
+                if not (wordlist.is_cached() or wordlist in to_build):
+                    continue
+                if force or not wordlist.regulus_is_cached():
+                    jobs[wordlist.regulus_name()] = wordlist
+            for name, seconds in pool.imap_unordered(_build_regulus,
+                                                     jobs.values()):
+                record(name, seconds)
+    finally:
+        pool.close()
+        pool.join()
+        shutil.rmtree(tempdir, ignore_errors=True)
+    return timings
+
+def _regulus_available():
+    "Check whether the Regulus extension can be imported."
+    try:
+        from solvertools.extensions.regulus import regulus
+        return True
+    except ImportError:
+        return False
+
+def _spool_source(args):
+    """
+    A worker for :func:`build_all` that parses a source file with its reader,
+    and saves the entries to a temporary file. The spool is returned along
+    with a description of the source file, for the manifests of the
+    wordlists built from it.
+    """
+    wordlist, tempdir = args
+    start = time.time()
+    name = '%s.%s' % (wordlist.filename, wordlist.reader.__name__)
+    spool = os.path.join(tempdir, name + '.spool')
+    stamps = wordlist._stamp_source()
+    with open(spool, 'wb') as out:
+        for entry in wordlist._read_entries():
+            marshal.dump(entry, out)
+    return ((wordlist.filename, wordlist.reader), (spool, stamps), name,
+            time.time() - start)
+
+def _read_spool(spool):
+    "Read back the entries that :func:`_spool_source` saved."
+    with open(spool, 'rb') as infile:
+        while True:
+            try:
+                yield marshal.load(infile)
+            except EOFError:
+                return
+
+def _build_variant(args):
+    """
+    A worker for :func:`build_all` that builds one wordlist, from a spool of
+    its entries if there is one.
+    """
+    wordlist, spool = args
+    start = time.time()
+    if spool is None:
+        wordlist._load_txt()
+    else:
+        path, stamps = spool
+        wordlist._load_txt(_read_spool(path), stamps)
+    return repr(wordlist), time.time() - start
+
+def _build_regulus(wordlist):
+    "A worker for :func:`build_all` that builds one Regulus index."
+    start = time.time()
+    wordlist.load_regulus()
+    return wordlist.regulus_name(), time.time() - start
@@ -0,0 +1,826 @@
+"""
+`solvertools.wordtable` stores a wordlist on disk in a compact binary format
+that can be searched without loading it.
+
+A table file contains the words of a wordlist as a sorted table of UTF-8
+strings, a parallel array of their frequencies, and a permutation of the words
+in descending order of frequency. A second permutation groups the words by
+their length in characters, each group in descending order of frequency, so
+the most common words of any length can be read off directly. It also stores
+the first 8 bytes of each word as an integer, so that lookups can be narrowed
+down with a vectorized search before comparing any strings. Opening a
+:class:`WordTable` just maps the file into memory, so it takes constant time
+no matter how big the wordlist is, and every process that opens the same table
+shares its pages through the OS page cache.
+
+Words are found by binary search over the sorted strings:
+
+    >>> import os, tempfile
+    >>> filename = os.path.join(tempfile.mkdtemp(), 'example.table')
+    >>> write_table(filename, {u'DUCK': 3, u'THE': 4, u'Z\\xdcRICH': 1})
+    >>> table = WordTable(filename)
+    >>> u'THE' in table, u'GOOSE' in table
+    (True, False)
+    >>> table[u'DUCK']
+    3
+    >>> list(table.iteritems())
+    [(u'THE', 4), (u'DUCK', 3), (u'Z\\xdcRICH', 1)]
+
+A mapping file does the same for a many-to-many mapping, such as a list of
+crossword clues for each word. The values of all the keys are stored end to
+end in one blob, and each key knows the range of values that belong to it,
+so a value is only decoded when its key is looked up:
+
+    >>> filename = os.path.join(tempfile.mkdtemp(), 'example.mapping')
+    >>> build_mapping(filename, [(u'DUCK', u'Quack'), (u'THE', u'Article'),
+    ...                          (u'DUCK', u'Bird')])
+    >>> mapping = MappingTable(filename)
+    >>> mapping[u'DUCK']
+    [u'Quack', u'Bird']
+    >>> mapping.get(u'GOOSE', [])
+    []
+
+Both kinds of file can find the keys that start with, end with, or contain a
+string, using binary search:
+
+    >>> [table.key(i) for i in table.with_prefix(u'DU')]
+    [u'DUCK']
+    >>> [table.key(i) for i in table.containing(u'H')]
+    [u'THE', u'Z\\xdcRICH']
+
+Prefixes are found in the sorted keys themselves. Suffixes and substrings
+need indexes, which are built the first time they're needed and saved next
+to the file as `.npy` arrays: a list of the keys sorted by their reversed
+bytes, and a suffix array of the positions in the keys where a character
+starts.
+"""
+
+from __future__ import with_statement
+from bisect import bisect_left, bisect_right
+import numpy as np
+import heapq, marshal, mmap, os, shutil, struct, tempfile
+
+MAGIC = 'WTable3\n'
+HEADER = struct.Struct('<8sQQQ')
+MAPPING_MAGIC = 'WMap1\n\0\0'
+MAPPING_HEADER = struct.Struct('<8sQQQQQ')
+OFFSET_PAIR = struct.Struct('<QQ')
+
+# The indexes that are saved next to a table or mapping file.
+SUFFIX_INDEX = '.suffixes.npy'
+SUBSTRING_INDEX = '.substrings.npy'
+
+# How the values in a mapping file are encoded.
+TEXT_VALUES = 0
+MARSHAL_VALUES = 1
+
+OFFSET_TYPE = np.dtype('<u8')
+FREQ_TYPE = np.dtype('<i8')
+RANK_TYPE = np.dtype('<u4')
+LENGTH_TYPE = np.dtype('<u4')
+PREFIX_TYPE = np.dtype('<u8')
+
+# How many distinct words to sort in memory before spilling them to disk, and
+# how many entries to buffer before writing them out.
+RUN_SIZE = 2000000
+CHUNK_SIZE = 100000
+
+def _encode(word):
+    "Words are stored and compared as UTF-8 bytestrings."
+    if isinstance(word, unicode):
+        return word.encode('utf-8')
+    return word
+
+def _prefixes(keys):
+    """
+    Get the first 8 bytes of each UTF-8 key as an unsigned integer, padded
+    with zero bytes. These integers are in the same order as the keys.
+    """
+    packed = ''.join(key[:8].ljust(8, '\0') for key in keys)
+    return np.frombuffer(packed, '>u8').astype(PREFIX_TYPE)
+
+def _replace(tempname, filename):
+    """
+    Move a newly written table or mapping file into place, and remove the
+    indexes that were built from the file it replaces.
+    """
+    for extension in (SUFFIX_INDEX, SUBSTRING_INDEX):
+        if os.path.exists(filename + extension):
+            os.remove(filename + extension)
+    os.rename(tempname, filename)
+
+def _align(pos):
+    "Round a file position up to a multiple of 8 bytes."
+    return (pos + 7) & ~7
+
+def write_table(filename, words):
+    """
+    Write a dictionary mapping words to their (integer) frequencies as a table
+    file.
+    """
+    build_table(filename, words.iteritems())
+
+def build_table(filename, entries, run_size=RUN_SIZE):
+    """
+    Build a table file from a stream of (word, frequency) pairs, in any order.
+    A word that appears more than once keeps its highest frequency.
+
+    The entries are consumed one at a time and sorted externally: they are
+    merged into runs of at most `run_size` distinct words, which are spilled
+    to temporary files and merged back together at the end. Apart from the
+    current run, the only thing held in memory is an array of frequencies,
+    which is needed to put the words in frequency order.
+
+    The file is written in a temporary directory next to `filename` and then
+    moved into place, so a process reading the table never sees it
+    half-written.
+    """
+    tempdir = tempfile.mkdtemp(prefix='wordtable',
+                               dir=os.path.dirname(filename))
+    try:
+        run = {}
+        runs = []
+        for word, freq in entries:
+            key = _encode(word)
+            run[key] = max(run.get(key, 0), freq)
+            if len(run) >= run_size:
+                runs.append(_spill_run(run, tempdir, len(runs)))
+                run = {}
+        if runs:
+            if run:
+                runs.append(_spill_run(run, tempdir, len(runs)))
+            merged = _merge_runs([_read_run(path) for path in runs])
+        else:
+            merged = sorted(run.iteritems())
+        del run
+        _write_sorted(filename, merged, tempdir)
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+def _spill_run(run, tempdir, number):
+    "Write a run of entries to a temporary file, in sorted order."
+    path = os.path.join(tempdir, 'run%d' % number)
+    with open(path, 'wb') as out:
+        for item in sorted(run.iteritems()):
+            marshal.dump(item, out)
+    return path
+
+def _read_run(path):
+    "Read back the entries of a run that was spilled to a file."
+    with open(path, 'rb') as infile:
+        while True:
+            try:
+                yield marshal.load(infile)
+            except EOFError:
+                return
+
+def _merge_runs(runs):
+    """
+    Merge sorted runs of (key, frequency) pairs into one sorted stream in which
+    each key appears once, with its highest frequency.
+    """
+    last_key = None
+    last_freq = None
+    for key, freq in heapq.merge(*runs):
+        if key == last_key:
+            last_freq = max(last_freq, freq)
+        else:
+            if last_key is not None:
+                yield last_key, last_freq
+            last_key, last_freq = key, freq
+    if last_key is not None:
+        yield last_key, last_freq
+
+def _flush(out, chunk, dtype):
+    "Write a list of numbers to a file as a binary array, and empty the list."
+    out.write(np.array(chunk, dtype).tostring())
+    del chunk[:]
+
+def _write_sorted(filename, items, tempdir):
+    """
+    Write a stream of (key, frequency) pairs, sorted by key, to a table file.
+    The keys, offsets, frequencies, and lengths go into separate temporary
+    files as they stream by, and are assembled into the table at the end.
+    """
+    n = 0
+    offset = 0
+    blob_path = os.path.join(tempdir, 'blob')
+    offsets_path = os.path.join(tempdir, 'offsets')
+    freqs_path = os.path.join(tempdir, 'freqs')
+    prefixes_path = os.path.join(tempdir, 'prefixes')
+    lengths_path = os.path.join(tempdir, 'lengths')
+    with open(blob_path, 'wb') as blob_out, \
+         open(offsets_path, 'wb') as offsets_out, \
+         open(freqs_path, 'wb') as freqs_out, \
+         open(prefixes_path, 'wb') as prefixes_out, \
+         open(lengths_path, 'wb') as lengths_out:
+        offsets_chunk = [0]
+        freqs_chunk = []
+        keys_chunk = []
+        lengths_chunk = []
+        for key, freq in items:
+            blob_out.write(key)
+            offset += len(key)
+            offsets_chunk.append(offset)
+            freqs_chunk.append(freq)
+            keys_chunk.append(key)
+            lengths_chunk.append(len(key.decode('utf-8')))
+            n += 1
+            if len(freqs_chunk) >= CHUNK_SIZE:
+                _flush(offsets_out, offsets_chunk, OFFSET_TYPE)
+                _flush(freqs_out, freqs_chunk, FREQ_TYPE)
+                _flush(lengths_out, lengths_chunk, LENGTH_TYPE)
+                prefixes_out.write(_prefixes(keys_chunk).tostring())
+                del keys_chunk[:]
+        _flush(offsets_out, offsets_chunk, OFFSET_TYPE)
+        _flush(freqs_out, freqs_chunk, FREQ_TYPE)
+        _flush(lengths_out, lengths_chunk, LENGTH_TYPE)
+        prefixes_out.write(_prefixes(keys_chunk).tostring())
+
+    # Sorting stably by descending frequency leaves ties in alphabetical
+    # order, because the keys are already in alphabetical order.
+    freqs = np.fromfile(freqs_path, FREQ_TYPE)
+    ranks = np.argsort(-freqs, kind='mergesort').astype(RANK_TYPE)
+    del freqs
+
+    # Then sorting the ranked words stably by length keeps each length in
+    # order of frequency. `length_starts[k]` is where the words of length k
+    # start.
+    lengths = np.fromfile(lengths_path, LENGTH_TYPE)
+    max_length = int(lengths.max()) if n else 0
+    ranked_lengths = lengths[ranks]
+    by_length = ranks[np.argsort(ranked_lengths, kind='mergesort')]
+    length_starts = np.searchsorted(lengths[by_length],
+                                    np.arange(max_length + 2))
+    del lengths, ranked_lengths
+
+    tempname = os.path.join(tempdir, 'table')
+    with open(tempname, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, n, offset, max_length))
+        for path in (offsets_path, freqs_path, prefixes_path):
+            with open(path, 'rb') as infile:
+                shutil.copyfileobj(infile, out)
+        out.write(ranks.tostring())
+        out.write(by_length.astype(RANK_TYPE).tostring())
+        out.write('\0' * (_align(out.tell()) - out.tell()))
+        out.write(length_starts.astype(OFFSET_TYPE).tostring())
+        with open(blob_path, 'rb') as infile:
+            shutil.copyfileobj(infile, out)
+    _replace(tempname, filename)
+
+def build_mapping(filename, entries, run_size=RUN_SIZE):
+    """
+    Build a mapping file from a stream of (key, value) pairs, in any order. A
+    key can appear any number of times, and its values are kept in the order
+    they appeared in.
+
+    If the values are strings, they are stored as UTF-8 text. Other values,
+    such as lists or tuples, are serialized with `marshal`. Either way, all
+    the values in a mapping must be of the same kind.
+
+    Like :func:`build_table`, this sorts the entries externally, in runs of
+    `run_size` entries.
+    """
+    tempdir = tempfile.mkdtemp(prefix='wordmapping',
+                               dir=os.path.dirname(filename))
+    try:
+        run = []
+        runs = []
+        kind = None
+        for number, (key, value) in enumerate(entries):
+            if kind is None:
+                kind = _value_kind(value)
+            run.append((_encode(key), number, _encode_value(value, kind)))
+            if len(run) >= run_size:
+                runs.append(_spill_entries(run, tempdir, len(runs)))
+                run = []
+        if runs:
+            if run:
+                runs.append(_spill_entries(run, tempdir, len(runs)))
+            merged = heapq.merge(*[_read_run(path) for path in runs])
+        else:
+            run.sort()
+            merged = run
+        _write_mapping(filename, merged, kind or TEXT_VALUES, tempdir)
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+def _value_kind(value):
+    "Decide how to store the values of a mapping, given its first value."
+    if isinstance(value, basestring):
+        return TEXT_VALUES
+    return MARSHAL_VALUES
+
+def _encode_value(value, kind):
+    "Encode a value of a mapping as a bytestring."
+    if kind == TEXT_VALUES:
+        if not isinstance(value, basestring):
+            raise TypeError("Expected a string value, got %r" % (value,))
+        return _encode(value)
+    return marshal.dumps(value)
+
+def _spill_entries(run, tempdir, number):
+    "Write a list of mapping entries to a temporary file, in sorted order."
+    run.sort()
+    path = os.path.join(tempdir, 'run%d' % number)
+    with open(path, 'wb') as out:
+        for item in run:
+            marshal.dump(item, out)
+    return path
+
+def _write_mapping(filename, items, kind, tempdir):
+    """
+    Write a stream of (key, number, value) triples, sorted by key, to a
+    mapping file.
+    """
+    n = 0
+    m = 0
+    key_offset = 0
+    value_offset = 0
+    paths = dict((name, os.path.join(tempdir, name))
+                 for name in ('keys', 'key_offsets', 'prefixes', 'starts',
+                              'value_offsets', 'values'))
+    with open(paths['keys'], 'wb') as keys_out, \
+         open(paths['key_offsets'], 'wb') as key_offsets_out, \
+         open(paths['prefixes'], 'wb') as prefixes_out, \
+         open(paths['starts'], 'wb') as starts_out, \
+         open(paths['value_offsets'], 'wb') as value_offsets_out, \
+         open(paths['values'], 'wb') as values_out:
+        key_offsets_chunk = [0]
+        starts_chunk = [0]
+        value_offsets_chunk = [0]
+        keys_chunk = []
+        last_key = None
+        for key, number, value in items:
+            if key != last_key:
+                if last_key is not None:
+                    starts_chunk.append(m)
+                keys_out.write(key)
+                key_offset += len(key)
+                key_offsets_chunk.append(key_offset)
+                keys_chunk.append(key)
+                n += 1
+                last_key = key
+            values_out.write(value)
+            value_offset += len(value)
+            value_offsets_chunk.append(value_offset)
+            m += 1
+            if len(keys_chunk) >= CHUNK_SIZE:
+                _flush(key_offsets_out, key_offsets_chunk, OFFSET_TYPE)
+                _flush(starts_out, starts_chunk, OFFSET_TYPE)
+                prefixes_out.write(_prefixes(keys_chunk).tostring())
+                del keys_chunk[:]
+            if len(value_offsets_chunk) >= CHUNK_SIZE:
+                _flush(value_offsets_out, value_offsets_chunk, OFFSET_TYPE)
+        if last_key is not None:
+            starts_chunk.append(m)
+        _flush(key_offsets_out, key_offsets_chunk, OFFSET_TYPE)
+        _flush(starts_out, starts_chunk, OFFSET_TYPE)
+        _flush(value_offsets_out, value_offsets_chunk, OFFSET_TYPE)
+        prefixes_out.write(_prefixes(keys_chunk).tostring())
+
+    tempname = os.path.join(tempdir, 'mapping')
+    with open(tempname, 'wb') as out:
+        out.write(MAPPING_HEADER.pack(MAPPING_MAGIC, n, m, key_offset,
+                                      value_offset, kind))
+        for name in ('key_offsets', 'prefixes', 'starts', 'value_offsets',
+                     'keys', 'values'):
+            with open(paths[name], 'rb') as infile:
+                shutil.copyfileobj(infile, out)
+    _replace(tempname, filename)
+
+class _SortedKeys(object):
+    """
+    The raw keys of a table in alphabetical order, as a sequence that
+    `bisect` can search.
+    """
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, index):
+        return self.table.raw_key(index)
+
+class SortedView(object):
+    """
+    A read-only sequence of the words in a table, in descending order of
+    frequency. Words are only decoded when they are asked for.
+    """
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.table.key(i) for i in self.table.ranks[index]]
+        return self.table.key(self.table.ranks[index])
+
+    def __iter__(self):
+        for index in self.table.ranks:
+            yield self.table.key(index)
+
+class _ReversedKeys(object):
+    """
+    The raw keys of a table in the order of a suffix index, each with its
+    bytes reversed, as a sequence that `bisect` can search.
+    """
+    def __init__(self, table, order):
+        self.table = table
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, index):
+        return self.table.raw_key(self.order[index])[::-1]
+
+class _Substrings(object):
+    """
+    The suffixes in a substring index, cut off after `length` bytes or at the
+    end of their key, as a sequence that `bisect` can search.
+    """
+    def __init__(self, table, positions, length):
+        self.table = table
+        self.positions = positions
+        self.length = length
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        pos = int(self.positions[index])
+        key_end = self.table.offsets[np.searchsorted(self.table.offsets, pos,
+                                                     'right')]
+        end = min(pos + self.length, int(key_end))
+        return self.table.data[self.table.blob_start + pos:
+                               self.table.blob_start + end]
+
+def _load_index(filename, build):
+    """
+    Memory-map an index that was saved as a `.npy` file, building and saving
+    it first if it doesn't exist. If it can't be saved, it's kept in memory.
+    """
+    if not os.path.exists(filename):
+        index = build()
+        tempname = filename + '.%d.tmp' % os.getpid()
+        try:
+            with open(tempname, 'wb') as out:
+                np.save(out, index)
+            os.rename(tempname, filename)
+        except (IOError, OSError):
+            return index
+    return np.load(filename, mmap_mode='r')
+
+def _suffix_array(blob, offsets):
+    """
+    Sort the positions in a blob of UTF-8 keys where a character starts, by
+    the rest of their key from that position on. This is a suffix array, cut
+    off at the end of each key.
+
+    The suffixes are sorted by prefix doubling: a suffix's rank among its
+    first 2h bytes is found by sorting the pairs of ranks of its first h
+    bytes and of the h bytes after that, so it takes a logarithmic number
+    of vectorized sorts. Bytes past the end of a key count as 0, so a key's
+    last suffixes sort before longer ones.
+    """
+    size = len(blob)
+    if size == 0:
+        return np.zeros((0,), dtype=np.uint32)
+    lengths = np.diff(offsets.astype(np.int64))
+    key_ends = np.repeat(offsets[1:].astype(np.int64), lengths)
+    rank = blob.astype(np.int64) + 1
+    positions = np.arange(size, dtype=np.int64)
+    width = 1
+    while width < lengths.max():
+        following = positions + width
+        inside = following < key_ends
+        second = np.zeros((size,), dtype=np.int64)
+        second[inside] = rank[following[inside]]
+        order = np.lexsort((second, rank))
+        first_sorted = rank[order]
+        second_sorted = second[order]
+        changed = np.ones((size,), dtype=np.int64)
+        changed[1:] = ((first_sorted[1:] != first_sorted[:-1]) |
+                       (second_sorted[1:] != second_sorted[:-1]))
+        rank = np.empty((size,), dtype=np.int64)
+        rank[order] = np.cumsum(changed)
+        width *= 2
+    order = np.argsort(rank, kind='mergesort')
+    starts = (blob[order] & 0xc0) != 0x80
+    if size < 2**32:
+        return order[starts].astype(np.uint32)
+    return order[starts].astype(np.uint64)
+
+class _KeyTable(object):
+    """
+    The parts of a memory-mapped file that find keys: a sorted blob of UTF-8
+    keys, their offsets, and their 8-byte prefixes. :class:`WordTable` and
+    :class:`MappingTable` add the values.
+    """
+    def _open(self, filename, header, magic):
+        "Map a file into memory, and return the fields of its header."
+        self.filename = filename
+        with open(filename, 'rb') as infile:
+            self.data = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) < header.size:
+            raise IOError("%s is not a %s." % (filename, self.description))
+        fields = header.unpack(self.data[:header.size])
+        if fields[0] != magic:
+            raise IOError("%s is not a %s." % (filename, self.description))
+        self.pos = header.size
+        self._sorted_keys = _SortedKeys(self)
+        self._suffixes = None
+        self._substrings = None
+        return fields[1:]
+
+    def _array(self, dtype, size):
+        "Get an array of the given type from the file, and move past it."
+        array = np.frombuffer(self.data, dtype, size, self.pos)
+        self.pos += size * dtype.itemsize
+        return array
+
+    def _blob(self, size):
+        "Find where a blob of bytes starts in the file, and move past it."
+        start = self.pos
+        self.pos += size
+        if self.pos > len(self.data):
+            raise IOError("%s is truncated." % self.filename)
+        return start
+
+    def __len__(self):
+        return self.size
+
+    def _offsets(self, n):
+        """
+        Read the array of key offsets, which has `n`+1 entries. Its position
+        is remembered so that :meth:`raw_key` can unpack two offsets at once,
+        which is much faster than indexing into a NumPy array twice.
+        """
+        self.offsets_start = self.pos
+        return self._array(OFFSET_TYPE, n+1)
+
+    def raw_key(self, index):
+        "Get the UTF-8 bytestring of the word at a given index."
+        if index < 0:
+            index += self.size
+        start, end = OFFSET_PAIR.unpack_from(self.data, self.offsets_start +
+                                             index * OFFSET_TYPE.itemsize)
+        return self.data[self.blob_start + start:self.blob_start + end]
+
+    def key(self, index):
+        "Get the word at a given index, as a Unicode string."
+        return self.raw_key(index).decode('utf-8')
+
+    def index(self, word):
+        """
+        Find the index of a word in the table, or return -1 if it is not
+        there.
+        """
+        return int(self.indices([word])[0])
+
+    def indices(self, words):
+        """
+        Find the indices of many words at once, returning a NumPy array with
+        -1 for the words that are not in the table.
+
+        A vectorized search on the 8-byte prefixes finds the range of
+        entries that each word could be in, and only that range is searched
+        by comparing strings. The range usually has one entry.
+        """
+        keys = [_encode(word) for word in words]
+        result = np.empty((len(keys),), dtype=np.int64)
+        result.fill(-1)
+        if not keys:
+            return result
+        prefixes = _prefixes(keys)
+        starts = np.searchsorted(self.prefixes, prefixes, 'left')
+        ends = np.searchsorted(self.prefixes, prefixes, 'right')
+        for i in np.flatnonzero(ends > starts):
+            key = keys[i]
+            lo = bisect_left(self._sorted_keys, key, starts[i], ends[i])
+            if lo < ends[i] and self.raw_key(lo) == key:
+                result[i] = lo
+        return result
+
+    def __contains__(self, word):
+        return self.index(word) >= 0
+
+    def bisect(self, word):
+        "Find the first index whose key is not less than `word`."
+        key = _encode(word)
+        prefix = _prefixes([key])
+        lo = np.searchsorted(self.prefixes, prefix, 'left')[0]
+        hi = np.searchsorted(self.prefixes, prefix, 'right')[0]
+        return bisect_left(self._sorted_keys, key, lo, hi)
+
+    def with_prefix(self, prefix):
+        "Get the sorted indices of the keys that start with `prefix`."
+        key = _encode(prefix)
+        # No byte of UTF-8 text is \xff, so this is past all the keys that
+        # start with `key`.
+        return np.arange(self.bisect(key), self.bisect(key + '\xff'))
+
+    def with_suffix(self, suffix):
+        "Get the sorted indices of the keys that end with `suffix`."
+        key = _encode(suffix)[::-1]
+        order = self.suffix_index()
+        reversed_keys = _ReversedKeys(self, order)
+        lo = bisect_left(reversed_keys, key)
+        hi = bisect_left(reversed_keys, key + '\xff', lo)
+        return np.sort(order[lo:hi]).astype(np.int64)
+
+    def containing(self, text):
+        "Get the sorted indices of the keys that contain `text`."
+        key = _encode(text)
+        if not key:
+            return np.arange(len(self))
+        positions = self.substring_index()
+        substrings = _Substrings(self, positions, len(key))
+        lo = bisect_left(substrings, key)
+        hi = bisect_right(substrings, key, lo)
+        found = np.searchsorted(self.offsets, positions[lo:hi], 'right') - 1
+        return np.unique(found)
+
+    def suffix_index(self):
+        """
+        Get the indices of the keys, sorted by their reversed bytes. This is
+        built the first time it's needed.
+        """
+        if self._suffixes is None:
+            self._suffixes = _load_index(self.filename + SUFFIX_INDEX,
+                                         self._build_suffix_index)
+        return self._suffixes
+
+    def _build_suffix_index(self):
+        reversed_keys = [self.raw_key(i)[::-1] for i in xrange(len(self))]
+        order = sorted(xrange(len(self)), key=reversed_keys.__getitem__)
+        return np.array(order, dtype=RANK_TYPE)
+
+    def substring_index(self):
+        """
+        Get a suffix array of the keys, which lists the positions in the keys
+        where a character starts, sorted by what comes after them. This is
+        built the first time it's needed.
+        """
+        if self._substrings is None:
+            self._substrings = _load_index(self.filename + SUBSTRING_INDEX,
+                                           self._build_substring_index)
+        return self._substrings
+
+    def _build_substring_index(self):
+        blob_size = int(self.offsets[-1])
+        blob = np.frombuffer(self.data, np.uint8, blob_size, self.blob_start)
+        return _suffix_array(blob, self.offsets)
+
+class WordTable(_KeyTable):
+    """
+    A read-only, memory-mapped mapping from words to frequencies, stored in a
+    file written by :func:`write_table`.
+
+    Words are returned as Unicode strings. Lookups expect words that are
+    already in the form the table was built with; the :class:`Wordlist` that
+    owns a table takes care of that.
+    """
+    description = 'word table'
+
+    def __init__(self, filename):
+        n, blob_size, self.max_length = self._open(filename, HEADER, MAGIC)
+        self.size = n
+        self.offsets = self._offsets(n)
+        self.freqs = self._array(FREQ_TYPE, n)
+        self.prefixes = self._array(PREFIX_TYPE, n)
+        self.ranks = self._array(RANK_TYPE, n)
+        self.by_length = self._array(RANK_TYPE, n)
+        self.pos = _align(self.pos)
+        self.length_starts = self._array(OFFSET_TYPE, self.max_length + 2)
+        self.blob_start = self._blob(blob_size)
+
+    def __getitem__(self, word):
+        index = self.index(word)
+        if index < 0:
+            raise KeyError(word)
+        return int(self.freqs[index])
+
+    def get(self, word, default=None):
+        index = self.index(word)
+        if index < 0:
+            return default
+        return int(self.freqs[index])
+
+    def sorted_keys(self):
+        "The words in descending order of frequency, as a lazy sequence."
+        return SortedView(self)
+
+    def top(self, n, length=None):
+        """
+        Get the `n` most frequent words as (word, frequency) pairs, or the
+        `n` most frequent words with `length` characters. Only those words
+        are read from the table.
+        """
+        if length is None:
+            indices = self.ranks[:n]
+        elif 0 <= length <= self.max_length:
+            start = int(self.length_starts[length])
+            end = int(self.length_starts[length+1])
+            indices = self.by_length[start:min(end, start + n)]
+        else:
+            return []
+        freqs = self.freqs[indices].tolist()
+        return [(self.key(index), freq)
+                for index, freq in zip(indices.tolist(), freqs)]
+
+    def __iter__(self):
+        return iter(self.sorted_keys())
+
+    def iteritems(self):
+        "Yield (word, frequency) pairs in descending order of frequency."
+        for start in xrange(0, self.size, CHUNK_SIZE):
+            indices = self.ranks[start:start+CHUNK_SIZE]
+            freqs = self.freqs[indices].tolist()
+            for index, freq in zip(indices.tolist(), freqs):
+                yield self.key(index), freq
+
+class MappingTable(_KeyTable):
+    """
+    A read-only, memory-mapped mapping from words to lists of values, stored
+    in a file written by :func:`build_mapping`.
+
+    Like a `defaultdict(list)`, looking up a word that isn't there gives an
+    empty list.
+    """
+    description = 'word mapping'
+
+    def __init__(self, filename):
+        n, m, blob_size, values_size, self.kind = \
+          self._open(filename, MAPPING_HEADER, MAPPING_MAGIC)
+        self.size = n
+        self.offsets = self._offsets(n)
+        self.prefixes = self._array(PREFIX_TYPE, n)
+        self.starts = self._array(OFFSET_TYPE, n+1)
+        self.value_offsets = self._array(OFFSET_TYPE, m+1)
+        self.blob_start = self._blob(blob_size)
+        self.values_start = self._blob(values_size)
+
+    def value(self, index):
+        "Decode the value at a given index."
+        start = self.values_start + int(self.value_offsets[index])
+        end = self.values_start + int(self.value_offsets[index+1])
+        raw = self.data[start:end]
+        if self.kind == TEXT_VALUES:
+            return raw.decode('utf-8')
+        return marshal.loads(raw)
+
+    def values_at(self, index):
+        "Get the list of values for the key at a given index."
+        start, end = int(self.starts[index]), int(self.starts[index+1])
+        return [self.value(i) for i in xrange(start, end)]
+
+    def __getitem__(self, word):
+        index = self.index(word)
+        if index < 0:
+            return []
+        return self.values_at(index)
+
+    def get(self, word, default=None):
+        index = self.index(word)
+        if index < 0:
+            return default
+        return self.values_at(index)
+
+    def sorted_keys(self):
+        "The words in alphabetical order, as a lazy sequence."
+        return _KeyView(self)
+
+    def __iter__(self):
+        return iter(self.sorted_keys())
+
+    def iteritems(self):
+        "Yield (word, values) pairs in alphabetical order."
+        for index in xrange(self.size):
+            yield self.key(index), self.values_at(index)
+
+class _KeyView(object):
+    "A read-only sequence of the keys of a mapping, in alphabetical order."
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.table.key(i)
+                    for i in xrange(*index.indices(len(self.table)))]
+        if index < 0:
+            index += len(self.table)
+        if not 0 <= index < len(self.table):
+            raise IndexError(index)
+        return self.table.key(index)
+
+    def __iter__(self):
+        for index in xrange(len(self.table)):
+            yield self.table.key(index)
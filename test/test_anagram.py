@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+from __future__ import with_statement
+from solvertools.wordlist import Wordlist, case_insensitive, \
+                                 alphanumeric_only, with_frequency
+from solvertools.anagram.index import AnagramIndex, alphagram_key
+from solvertools.anagram.anahash import anahash
+from solvertools.util import get_picklefile, file_exists, pickle_dir, \
+     temporary_directory
+
+TestWords = Wordlist('testwords', case_insensitive, with_frequency,
+pickle=False)
+
+def _sorted_matrix(alphas, ranks):
+    """
+    Get the letter vectors of some alphagrams and their ranks, sorted in the
+    order that the letter matrix functions expect.
+    """
+    import numpy as np
+    from solvertools.anagram.letter_matrix import letters_to_vec
+    matrix = np.vstack([letters_to_vec(alpha) for alpha in alphas])
+    ranks = np.asarray(ranks)
+    order = np.lexsort(matrix.T[::-1])
+    return matrix[order], ranks[order]
+
+def test_alphagram_key():
+    assert alphagram_key('Manic Sages') == 'AACEGIMNSS'
+    assert alphagram_key('scan-images') == 'AACEGIMNSS'
+
+def test_anagrams():
+    index = AnagramIndex(TestWords)
+    assert index.anagrams('the') == [(u'THE', 4)]
+    assert index.anagrams('K CUD') == [(u'DUCK', 3)]
+    assert index.anagrams('GOOSE') == []
+    assert not file_exists(get_picklefile(index.index_name('alphagrams')))
+
+def test_from_anahash():
+    index = AnagramIndex(TestWords)
+    entries = index.from_anahash(anahash('DUCK'), 10)
+    assert entries[0].text == u'DUCK'
+    assert entries[0].alphagram == 'CDKU'
+    assert entries[0].freq == 3
+    assert [entry.anahash for entry in entries] == \
+           sorted(entry.anahash for entry in entries)
+    assert len(index.from_anahash('', 2)) == 2
+    assert index.from_anahash('ZZZZ', 10) == []
+
+def test_cached_index():
+    with temporary_directory() as tempdir:
+        with pickle_dir(tempdir):
+            words = Wordlist('testwords', case_insensitive, with_frequency)
+            index = AnagramIndex(words)
+            index.load()
+            assert index.is_cached()
+            assert file_exists(get_picklefile(index.index_name('alphagrams')))
+            assert index.anagrams('UDKC') == [(u'DUCK', 3)]
+            assert not AnagramIndex(
+                words.variant(alphanumeric_only)).is_cached()
+
+def test_find_pairs():
+    from solvertools.anagram.letter_matrix import letters_to_vec, \
+         find_pairs, find_vector, pack_vectors
+    matrix, ranks = _sorted_matrix(
+        ['ACT', 'DGO', 'ACDGOT', 'AT', 'C', 'ACDGT', 'O'],
+        [10, 20, 30, 40, 50, 60, 70])
+    keys = pack_vectors(matrix)
+    assert find_vector(matrix, ranks, letters_to_vec('DGO'), keys) == 20
+    assert find_vector(matrix, ranks, letters_to_vec('CDGO')) == 0
+    pairs = sorted((part1, part2, rank)
+                   for rank, part1, part2 in
+                   find_pairs(matrix, ranks, letters_to_vec('DOGCAT'), keys))
+    assert pairs == [('ACDGT', 'O', 32), ('ACT', 'DGO', 6),
+                     ('DGO', 'ACT', 6), ('O', 'ACDGT', 32)]
+
+def test_top_multi():
+    from solvertools.anagram.letter_matrix import letters_to_vec, \
+         top_multi, top_pairs
+    matrix, ranks = _sorted_matrix(
+        ['ACT', 'DGO', 'ACDGOT', 'AT', 'C', 'ACDGT', 'O', 'DG'],
+        [10, 20, 30, 40, 50, 60, 70, 80])
+    vec = letters_to_vec('DOGCAT')
+    assert top_multi(matrix, ranks, vec, 10, max_parts=1) == \
+           [(30, ('ACDGOT',))]
+    pairs = top_multi(matrix, ranks, vec, 10, max_parts=2)
+    assert sorted(pairs) == sorted(
+        [(rank, (part1, part2))
+         for rank, part1, part2 in top_pairs(matrix, ranks, vec, 10)
+         if part1 > part2] + [(30, ('ACDGOT',))])
+    best = top_multi(matrix, ranks, vec, 2, max_parts=4)
+    assert best == [(32, ('O', 'ACDGT')), (30, ('ACDGOT',))]
+    splits = [tuple(sorted(parts)) for value, parts in
+              top_multi(matrix, ranks, vec, 100, max_parts=4)]
+    assert ('AT', 'C', 'DG', 'O') in splits
+    assert len(splits) == len(set(splits))
+    assert top_multi(matrix, ranks, letters_to_vec(''), 10) == []
+
+def test_letter_matrix():
+    import numpy as np
+    import os
+    from solvertools.anagram.letter_matrix import letters_to_vec, \
+         LetterMatrix
+    matrix, ranks = _sorted_matrix(
+        ['ACT', 'DGO', 'ACDGOT', 'AT', 'C', 'ACDGT', 'O', 'AAT'],
+        [10, 20, 30, 40, 50, 60, 70, 80])
+    with temporary_directory() as tempdir:
+        np.save(os.path.join(tempdir, 'vectors.npy'), matrix)
+        np.save(os.path.join(tempdir, 'ranks.npy'), ranks)
+        letters = LetterMatrix(os.path.join(tempdir, 'matrix'),
+                               source=(os.path.join(tempdir, 'vectors.npy'),
+                                       os.path.join(tempdir, 'ranks.npy')))
+        assert not letters.is_cached()
+        assert len(letters) == 8
+        assert letters.is_cached()
+        assert list(letters.alphagrams(3)) == ['AAT', 'ACT', 'DGO']
+        assert letters.rank(u'ACT') == 10
+        assert letters.rank('CAT') == 0
+        assert letters.rank('ZZZZZZZZZZ') == 0
+        counts, group_ranks = letters.group(2)
+        assert counts.tolist() == [list(letters_to_vec('AT'))]
+        assert group_ranks.tolist() == [40]
+        dense_matrix, dense_ranks, keys = \
+            LetterMatrix(os.path.join(tempdir, 'matrix')).dense()
+        assert (dense_matrix == matrix).all()
+        assert (dense_ranks == ranks).all()
+
+        # threads sharing a matrix compact and load it once between them
+        import threading
+        shared = LetterMatrix(os.path.join(tempdir, 'shared'),
+                              source=letters.source)
+        lengths = []
+        threads = [threading.Thread(target=lambda: lengths.append(len(shared)))
+                   for i in xrange(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert lengths == [8] * 4
+        assert not [name for name in os.listdir(tempdir)
+                    if name.endswith('.tmp')]
+
+def test_letter_matrix_search():
+    import os
+    from solvertools.anagram.letter_matrix import letters_to_vec, \
+         write_compact, LetterMatrix, find_pairs, find_wildcard, top_pairs, \
+         top_multi
+    alphas = ['ACT', 'DGO', 'ACDGOT', 'AT', 'C', 'ACDGT', 'O', 'AAT',
+              'ACDGOTT', 'GO', 'ACDT']
+    matrix, ranks = _sorted_matrix(alphas, range(10, 10 * len(alphas) + 1, 10))
+    with temporary_directory() as tempdir:
+        write_compact(os.path.join(tempdir, 'matrix'), matrix, ranks)
+        letters = LetterMatrix(os.path.join(tempdir, 'matrix'))
+        for text in ['DOGCAT', 'DOGCATT', 'CAT', 'GOOD']:
+            vec = letters_to_vec(text)
+            assert sorted(letters.find_pairs(vec)) == \
+                   sorted(find_pairs(matrix, ranks, vec))
+        for text, nblanks in [('CAT', 3), ('DOG', 1), ('T', 1), ('Z', 1)]:
+            vec = letters_to_vec(text)
+            assert sorted(letters.find_wildcard(vec, nblanks)) == \
+                   sorted(find_wildcard(matrix, ranks, vec, nblanks))
+        vec = letters_to_vec('DOGCAT')
+        assert letters.top_pairs(vec, 2) == top_pairs(matrix, ranks, vec, 2)
+        for text in ['DOGCAT', 'DOGCATT', 'ZZZ']:
+            vec = letters_to_vec(text)
+            assert letters.top_multi(vec, 10) == \
+                   top_multi(matrix, ranks, vec, 10)
+        assert letters._dense is None
+
+def test_multi_part_anagram():
+    import os
+    from solvertools.anagram.letter_matrix import write_compact, LetterMatrix
+    from solvertools.anagram.mixmaster import multi_part_anagram
+    # CDEHKTU has no text in the index, so it can't be part of an anagram
+    matrix, ranks = _sorted_matrix(['EHT', 'CDKU', 'CHIRUZ', 'CDEHKTU'],
+                                   [4, 3, 1, 100])
+    with temporary_directory() as tempdir:
+        write_compact(os.path.join(tempdir, 'matrix'), matrix, ranks)
+        letters = LetterMatrix(os.path.join(tempdir, 'matrix'))
+        index = AnagramIndex(TestWords)
+        assert multi_part_anagram('Duck, the', letters=letters,
+                                  index=index) == [(u'THE DUCK', 1)]
+        assert multi_part_anagram('the duck', max_parts=1, letters=letters,
+                                  index=index) == []
+        assert multi_part_anagram('the goose', letters=letters,
+                                  index=index) == []
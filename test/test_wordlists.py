@@ -1,10 +1,25 @@
 # -*- coding: utf-8 -*-
+from __future__ import with_statement
+import functools
+from nose.plugins.skip import SkipTest
 from solvertools.wordlist import *
+from solvertools.wordlist import _regulus_available
 from solvertools.util import *
 
 TestWords = Wordlist('testwords', case_insensitive, with_frequency,
 pickle=False)
 
+def requires_regulus(test):
+    "Skip a test when the Regulus extension isn't built."
+    @functools.wraps(test)
+    def wrapper():
+        if not _regulus_available():
+            raise SkipTest("the Regulus extension isn't built")
+        return test()
+    # keep nose running the tests in the order they're written in
+    wrapper.compat_co_firstlineno = test.func_code.co_firstlineno
+    return wrapper
+
 def test_wordlists():
     assert 'THE' in TestWords
     assert 'the' in TestWords
@@ -21,6 +36,355 @@ def test_order():
     iterator = iter(TestWords)
     assert iterator.next() == 'THE'
 
+def test_top():
+    assert [word for word, freq in TestWords.top(2)] == TestWords.sorted()[:2]
+    assert TestWords.top(1, length=4) == [('DUCK', 3)]
+    assert TestWords.top(5, length=6) == [(u'ZÜRICH', TestWords[u'ZÜRICH'])]
+    assert TestWords.top(5, length=40) == []
+
 def test_no_pickle():
-    assert not file_exists(get_picklefile('testwords.alphanumeric_only.with_frequency.pickle'))
-    assert not file_exists(get_picklefile('testwords.asciify.with_frequency.pickle'))
+    for convert in (alphanumeric_only, asciify):
+        variant = TestWords.variant(convert)
+        variant.load()
+        assert variant.words is not None
+        assert not file_exists(get_picklefile(variant.table_name()))
+    assert TestWords.variant(alphanumeric_only).table_name() == \
+           'testwords.alphanumeric_only.with_frequency.3.table'
+
+def test_table():
+    import os
+    from solvertools.wordtable import WordTable, write_table
+    with temporary_directory() as tempdir:
+        filename = os.path.join(tempdir, 'testwords.table')
+        TestWords.load()
+        write_table(filename, TestWords.words)
+        table = WordTable(filename)
+        assert len(table) == 3
+        assert u'ZÜRICH' in table
+        assert 'ZYZZLVARIA' not in table
+        assert table.get('DUCK') == 3
+        assert list(table) == list(TestWords)
+        assert list(table.iteritems()) == list(TestWords.iteritems())
+
+def test_external_sort():
+    import os
+    from solvertools.wordtable import WordTable, build_table
+    with temporary_directory() as tempdir:
+        filename = os.path.join(tempdir, 'external.table')
+        entries = [('B', 2), ('A', 1), ('C', 5), ('A', 7), ('D', 5), ('B', 1)]
+        build_table(filename, iter(entries), run_size=2)
+        table = WordTable(filename)
+        assert list(table.iteritems()) == [('A', 7), ('C', 5), ('D', 5), ('B', 2)]
+
+def test_mapping():
+    import os
+    from solvertools.wordtable import MappingTable, build_mapping
+    with temporary_directory() as tempdir:
+        filename = os.path.join(tempdir, 'external.mapping')
+        entries = [(u'ZÜRICH', (u'city', 2)), ('DUCK', (u'bird', 1)),
+                   ('DUCK', (u'cricket score', 3)), ('THE', (u'article', 4))]
+        build_mapping(filename, iter(entries), run_size=2)
+        mapping = MappingTable(filename)
+        assert len(mapping) == 3
+        assert mapping['DUCK'] == [(u'bird', 1), (u'cricket score', 3)]
+        assert mapping[u'ZÜRICH'] == [(u'city', 2)]
+        assert mapping['GOOSE'] == []
+        assert list(mapping) == ['DUCK', 'THE', u'ZÜRICH']
+
+def test_word_searches():
+    import os
+    from solvertools.wordtable import WordTable, build_table
+    with temporary_directory() as tempdir:
+        filename = os.path.join(tempdir, 'searches.table')
+        words = [u'CAT', u'CATCH', u'SCATTER', u'ATTIC', u'ZÜRICH', u'RICH']
+        build_table(filename, [(word, 1) for word in words])
+        table = WordTable(filename)
+        def found(indices):
+            return sorted(table.key(i) for i in indices)
+        assert found(table.with_prefix('CAT')) == [u'CAT', u'CATCH']
+        assert found(table.with_suffix('RICH')) == [u'RICH', u'ZÜRICH']
+        assert found(table.with_suffix(u'ÜRICH')) == [u'ZÜRICH']
+        assert found(table.containing('AT')) == [u'ATTIC', u'CAT', u'CATCH',
+                                                 u'SCATTER']
+        assert found(table.containing(u'Ü')) == [u'ZÜRICH']
+        assert found(table.containing('TCHX')) == []
+        # the indexes are saved, and removed when the table is rebuilt
+        assert os.path.exists(filename + '.substrings.npy')
+        build_table(filename, [(u'TICK', 1)])
+        assert not os.path.exists(filename + '.substrings.npy')
+        table = WordTable(filename)
+        assert found(table.containing('IC')) == [u'TICK']
+
+        assert TestWords.words_containing('u') == [u'DUCK']
+        assert TestWords.words_containing(u'ü') == [u'ZÜRICH']
+        assert TestWords.words_with_suffix('e') == [u'THE']
+
+def test_get_many():
+    freqs = TestWords.get_many(['the', u'ZÜRICH', 'goose', 'DUCK'])
+    assert list(freqs) == [4, 1, 0, 3]
+    assert list(TestWords.contains_many(['the', 'THE', 'the'], canonical=True)) == [False, True, False]
+
+def test_converters():
+    # ASCII and non-ASCII text, as bytestrings and as Unicode
+    assert letters_only('Zürich 2') == letters_only(u'zürich') == 'ZURICH'
+    assert alphanumeric_only(u'Œdipus Rex 1') == 'OEDIPUSREX1'
+    assert alphanumeric_with_spaces('the End!') == 'THE END'
+    assert letters_and_spaces(u'R2-D2 and C-3PO') == 'RD AND CPO'
+    assert case_insensitive_ascii('straße') == 'STRAE'
+    # characters that decompose into lowercase letters are dropped
+    assert letters_only(u'\xaa') == ''
+    assert alphanumeric_only(u'n\xba 5') == 'N5'
+    assert letters_only.__name__ == 'letters_only'
+
+def test_converter_cache_types():
+    # '\x1c' == u'\x1c', but only the Unicode one is whitespace, so the
+    # cached results have to be kept apart by type
+    case_insensitive_clean.cache_clear()
+    assert case_insensitive_clean('\x1c') == u'\x1c'
+    assert case_insensitive_clean(u'\x1c') == u''
+    case_insensitive_clean.cache_clear()
+    assert case_insensitive_clean(u'\x1c') == u''
+    assert case_insensitive_clean('\x1c') == u'\x1c'
+
+def test_manifest():
+    from solvertools.manifest import code_fingerprint, read_manifest, \
+                                     write_manifest
+    assert code_fingerprint(letters_only) != code_fingerprint(alphanumeric_only)
+    assert code_fingerprint(letters_only) == code_fingerprint(letters_only)
+    # the constants that a convert function uses are part of its code
+    import solvertools.wordlist
+    before = code_fingerprint(letters_only)
+    not_letter = solvertools.wordlist._NOT_LETTER
+    solvertools.wordlist._NOT_LETTER = not_letter.replace('1', '')
+    try:
+        assert code_fingerprint(letters_only) != before
+    finally:
+        solvertools.wordlist._NOT_LETTER = not_letter
+    assert code_fingerprint(letters_only) == before
+
+    import os
+    with temporary_directory() as tempdir:
+        with pickle_dir(tempdir):
+            cached = Wordlist('testwords', case_insensitive, with_frequency)
+            cached.load()
+            tablename = get_picklefile(cached.table_name())
+            assert os.path.dirname(tablename) == tempdir
+            manifest = read_manifest(tablename)
+            assert manifest['code'] == cached.fingerprint()
+            assert manifest['sources'][0]['path'] == 'testwords.txt'
+            assert cached.is_cached()
+            assert not cached.variant(alphanumeric_only).is_cached()
+
+            # a table built by different code is stale
+            write_manifest(tablename, manifest['sources'], 'something else')
+            assert not cached.is_cached()
+
+def test_build_all():
+    with temporary_directory() as tempdir:
+        with pickle_dir(tempdir):
+            words = Wordlist('testwords', case_insensitive, with_frequency)
+            ascii = words.variant(alphanumeric_only)
+            built = [name for name, seconds in
+                     build_all([words, ascii], processes=2)]
+            # the shared source file is only parsed once
+            assert built[0] == 'testwords.with_frequency'
+            assert repr(words) in built and repr(ascii) in built
+            assert words.is_cached() and ascii.is_cached()
+
+            fresh = Wordlist('testwords', alphanumeric_only, with_frequency)
+            fresh.load()
+            assert list(fresh.iteritems()) == [('THE', 4), ('DUCK', 3),
+                                               ('ZURICH', 1)]
+            if _regulus_available():
+                assert words.regulus_is_cached()
+                assert fresh.grep('D...') == [('DUCK', 3)]
+            assert build_all([words, ascii], processes=2) == []
+
+def test_union():
+    import itertools
+    union = WordlistUnion([(TestWords, 10), (ENABLE, 1)])
+    assert union['the'] == 41
+    assert union.get(u'zürich') == 10
+    assert union.get('zyzzlvaria') is None
+    assert list(union.get_many(['duck', 'zyzzyva', 'zyzzlvaria'])) == [31, 1, 0]
+    top = list(itertools.islice(union.iteritems(), 4))
+    assert top[:3] == [(u'THE', 41), (u'DUCK', 31), (u'ZÜRICH', 10)]
+    assert top[3][1] == 1
+
+    highest = WordlistUnion([(TestWords, 10), (ENABLE, 100)], combine=max)
+    assert highest['the'] == 100
+    assert list(highest.get_many(['the', u'zürich', 'zyzzlvaria'])) == [100, 10, 0]
+
+@requires_regulus
+def test_grep_many():
+    patterns = ['/ZYZ.*/', '/C(A|O)T/', '/XX/', '/.*QU.Z/']
+    assert ENABLE.grep_many(patterns) == [ENABLE.grep(p) for p in patterns]
+    best = ENABLE.best_match_many(patterns)
+    assert best[0] == ('ZYZZYVA', 1)
+    assert best[1] == ('CAT', 1)
+    assert best[2] == ('', 0)
+
+@requires_regulus
+def test_grep_parallel():
+    for pattern in ['/.*QU.Z/', '/C(A|O)T/', '/XX/']:
+        for shards in (1, 3, 26):
+            assert ENABLE.grep_parallel(pattern, shards) == ENABLE.grep(pattern)
+
+@requires_regulus
+def test_grep_limit():
+    import itertools
+    everything = ENABLE.grep('/QUI.*/')
+    assert len(everything) > 10
+    assert ENABLE.grep('/.*QU.*Z/', limit=2) == [('QUARTZ', 1), ('QUIZ', 1)]
+    assert ENABLE.grep('/QUI.*/', limit=5, offset=3) == everything[3:8]
+    assert ENABLE.grep('/QUI.*/', offset=1, order='freq') == everything[1:]
+    assert ENABLE.grep_parallel('/QUI.*/', 3, limit=5, offset=3) == everything[3:8]
+    assert list(itertools.islice(ENABLE.igrep('/QUI.*/', 2), 3)) == everything[:3]
+    assert list(ENABLE.igrep('/QUI.*/', 2)) == everything
+
+@requires_regulus
+def test_best_match_pruning():
+    patterns = ['/.*QU.*/', '/S....E/', '/.A.E.*/', '/X.*/', '/.*ZZ/']
+    for pattern in patterns:
+        everything = sorted(Google200K.grep(pattern),
+                            key=lambda (word, freq): (-freq, word))
+        assert Google200K.grep(pattern, order='freq') == everything
+        assert Google200K.grep(pattern, limit=7, order='freq') == everything[:7]
+        assert Google200K.best_match(pattern) == everything[0]
+    assert Google200K.best_match_many(patterns) == \
+        [Google200K.best_match(p) for p in patterns]
+
+@requires_regulus
+def test_grep_lengths():
+    import re
+    patterns = {'/(QU|X)......./': '(QU|X).......',
+                '/A?B?.....ZZ/': 'A?B?.....ZZ',
+                '/..(..)*Q/': '..(..)*Q',
+                '/.............Y(ING)?/': '.............Y(ING)?'}
+    for pattern, regex in patterns.items():
+        regex = re.compile(regex + '$')
+        expected = sorted(word for word in ENABLE if regex.match(word))
+        assert expected
+        assert [word for word, freq in ENABLE.grep(pattern)] == expected
+        assert [word for word, freq in ENABLE.igrep(pattern)] == expected
+    assert ENABLE.grep_many(patterns.keys()) == \
+        [ENABLE.grep(p) for p in patterns]
+
+@requires_regulus
+def test_pattern_cache():
+    from solvertools.extensions.regulus import regulus
+    dictionary = regulus.Dict([regulus.DictEntry('DUCK', 3),
+                               regulus.DictEntry('GOOSE', 2)])
+    assert dictionary.best_match('D...').word == 'DUCK'
+    assert (dictionary.cache_hits(), dictionary.cache_misses()) == (0, 1)
+    assert [entry.word for entry in dictionary.grep('D...')] == ['DUCK']
+    assert len(dictionary.best_match_many(['D...', 'G.*'])) == 2
+    assert (dictionary.cache_hits(), dictionary.cache_misses()) == (2, 2)
+
+    dictionary.set_cache_size(0)
+    dictionary.grep('D...')
+    dictionary.grep('D...')
+    assert (dictionary.cache_hits(), dictionary.cache_misses()) == (2, 4)
+
+@requires_regulus
+def test_deterministic_patterns():
+    import re
+    patterns = {'/(A|E|I|O|U)(R|S|T).....(ING|ED|ERS)/':
+                    '(A|E|I|O|U)(R|S|T).....(ING|ED|ERS)',
+                '/.*(AB|BA).*(ER|RE)S/': '.*(AB|BA).*(ER|RE)S',
+                '/(S|ST|STR)(A|E)+(T|TS)?/': '(S|ST|STR)(A|E)+(T|TS)?'}
+    ENABLE.load_regulus()
+    try:
+        for states in (0, 2, 256):
+            ENABLE.regulus.set_dfa_states(states)
+            for pattern, regex in patterns.items():
+                regex = re.compile(regex + '$')
+                expected = sorted(word for word in ENABLE if regex.match(word))
+                assert expected
+                assert [word for word, freq in ENABLE.grep(pattern)] == expected
+                assert [word for word, freq in ENABLE.igrep(pattern)] == expected
+    finally:
+        ENABLE.regulus.set_dfa_states(256)
+
+def test_pattern_search():
+    import re
+    from solvertools.pattern_search import PatternSearch
+    Google200K.load()
+    search = PatternSearch(Google200K.words, letters_and_spaces)
+    for pattern in ['.U..E..', 'S[AEIOU][BCD]..', '.*QU.Z', '(CAT|DOG)S?',
+                    'q.*', '[^AEIOU][^AEIOU]R.*']:
+        regex = re.compile(pattern + '$', re.IGNORECASE)
+        expected = sorted((word, freq) for word, freq in Google200K.iteritems()
+                          if regex.match(word))
+        assert expected
+        assert [tuple(match) for match in search.grep(pattern)] == expected
+        by_freq = sorted(expected, key=lambda (word, freq): (-freq, word))
+        assert [tuple(match) for match in search.grep_freq_sorted(pattern)] \
+            == by_freq
+        assert [tuple(match) for match in
+                search.grep_limit(pattern, 3, 1, True)] == by_freq[1:4]
+        assert tuple(search.best_match(pattern)) == by_freq[0]
+    assert tuple(search.best_match('.*XQZ')) == ('', 0)
+
+def test_unicode_patterns():
+    import re
+    from solvertools.pattern_search import PatternSearch
+    SPANISH.load()
+    SPANISH.load_regulus()
+    symbols = SPANISH.symbols
+    search = PatternSearch(SPANISH.words, symbols.encode)
+    for pattern in [u'NI.O', u'.*ñ.*', u'CORAZ[ÓO]N', u'E.*CIÓN']:
+        regex = re.compile(pattern + u'$', re.IGNORECASE | re.UNICODE)
+        expected = sorted(word for word in SPANISH if regex.match(word))
+        assert expected
+        assert sorted(word for word, freq in SPANISH.grep(pattern)) \
+            == expected
+        matches = search.grep(symbols.encode_pattern(pattern))
+        assert sorted(symbols.decode(match.word) for match in matches) \
+            == expected
+    assert SPANISH.best_match(u'CORAZ.N')[0] == u'CORAZÓN'
+
+@requires_regulus
+def test_ipa_symbols():
+    import os
+    from solvertools.symbol_table import SymbolTable
+    from solvertools.extensions.regulus import regulus
+    words = [u'ɪŋglɪʃ', u'spitʃ', u'θɪŋk', u'ðə', u'kæt']
+    symbols = SymbolTable.for_words(words)
+    dictionary = regulus.Dict([regulus.DictEntry(symbols.encode(word), 1)
+                               for word in words],
+                              symbols.extras.encode('utf-8'))
+    with temporary_directory() as tempdir:
+        filename = os.path.join(tempdir, 'ipa.regulus')
+        dictionary.write(filename)
+        dictionary = regulus.Dict()
+        assert dictionary.read(filename)
+        symbols = SymbolTable(dictionary.get_symbols().decode('utf-8'))
+        def grep(pattern):
+            return [symbols.decode(entry.word) for entry in
+                    dictionary.grep(symbols.encode_pattern(pattern))]
+        assert grep(u'.*ɪŋ.*') == [u'ɪŋglɪʃ'.upper(), u'θɪŋk'.upper()]
+        assert grep(u'[ðθ].*') == [u'ðə'.upper(), u'θɪŋk'.upper()]
+        assert grep(u'.*tʃ') == [u'spitʃ'.upper()]
+
+@requires_regulus
+def test_regulus_file():
+    import os
+    from solvertools.extensions.regulus import regulus
+    with temporary_directory() as directory:
+        filename = os.path.join(directory, 'birds.regulus')
+        regulus.Dict([regulus.DictEntry('DUCK', 3),
+                      regulus.DictEntry('GOOSE', 2)]).write(filename)
+        dictionary = regulus.Dict()
+        assert dictionary.read(filename)
+        # Writing the file again replaces it, instead of changing the file
+        # that the Dict has mapped.
+        regulus.Dict([regulus.DictEntry('SWAN', 1)]).write(filename)
+        assert [entry.word for entry in dictionary.grep('.*')] == ['DUCK', 'GOOSE']
+        assert os.listdir(directory) == ['birds.regulus']
+
+        # A file that isn't a whole Dict leaves the Dict as it was.
+        open(filename, 'r+b').truncate(os.path.getsize(filename) - 8)
+        assert not dictionary.read(filename)
+        assert not dictionary.read(os.path.join(directory, 'missing.regulus'))
+        assert dictionary.best_match('.*').word == 'DUCK'